@@ -1,5 +1,6 @@
 
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, Response, g, render_template, jsonify, request
+from flask.json.provider import DefaultJSONProvider
 import requests
 import folium
 from folium import plugins
@@ -10,20 +11,151 @@ import json
 import branca.colormap as cm
 from threading import Lock
 import time
+import atexit
+import functools
+import logging
+import os
+
+from archive import EventArchive
+from countries import REGIONS, country_lookup, parse_countries
+from eonet_client import CircuitOpenError, EONETClient
+from event_feed import (decode_cursor, encode_cursor, parse_fields, parse_limit, stream_json,
+                        stream_ndjson)
+from event_export import MEDIA_TYPES, export_events, parse_format
+from event_index import EventIndex
+from event_stream import DeltaLog, summary_delta
+from geo import CLUSTER_MAX_ZOOM, bbox_mask, grid_clusters, parse_bbox, parse_point
+from http_cache import EncodedBody, choose_encoding, data_etag, gzip_stream, normalized_query
+from metrics import LogSampler, Registry, current_route, resident_memory_bytes
+from result_cache import ResultCache, cached_method
+from rollup import SEVERITY_POINTS, Rollup, downsample_points, epoch_day
+from shared_snapshot import SharedSnapshotStore
+from snapshot import (EventSnapshot, SnapshotRefresher, SnapshotStore, last_geometry_date,
+                      merge_events)
+from time_series import ANOMALY_Z, ROLLING_WINDOWS, parse_categories, parse_period, trend_series
+from tracks import tolerance_for_zoom
+
+DEFAULT_SNAPSHOT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                     'data', 'eonet_snapshot.pkl')
+DEFAULT_SHARED_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'shared')
+DEFAULT_ARCHIVE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'archive')
+
+# Parts of the analysis data, each also served on its own
+ANALYSIS_FACETS = ('trends', 'categories', 'geographic', 'countries', 'severity', 'severity_levels',
+                   'weekday')
+
+# enable logging for the app's own loggers only, repeats of a message are
+# sampled down to one per interval; the root logger is left to the host
+APP_LOGGERS = (__name__, 'snapshot')
+_log_handler = logging.StreamHandler()
+_log_handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+_log_handler.addFilter(LogSampler(float(os.environ.get('EONET_LOG_SAMPLE_INTERVAL', 60))))
+LOG_LEVEL = os.environ.get('EONET_LOG_LEVEL', 'INFO').upper()
+for _name in APP_LOGGERS:
+    _logger = logging.getLogger(_name)
+    _logger.setLevel(LOG_LEVEL)
+    _logger.addHandler(_log_handler)
+    _logger.propagate = False
+log = logging.getLogger(__name__)
+
+# Prometheus metrics, EONET_METRICS=0 turns recording into a no-op
+metrics = Registry(enabled=os.environ.get('EONET_METRICS', '1').lower() not in ('0', 'false', 'no'))
+STAGE_SECONDS = metrics.histogram(
+    'eonet_stage_duration_seconds',
+    'Time spent per processing stage (fetch, decode, index, filter, map, aggregate, serialize)',
+    ('stage', 'route'))
+REQUEST_SECONDS = metrics.histogram(
+    'eonet_request_duration_seconds', 'Time to handle a request', ('route', 'status'))
+UPSTREAM_ERRORS = metrics.counter(
+    'eonet_upstream_errors_total', 'Failed requests to the EONET API', ('endpoint', 'reason'))
+
+
+def timed(stage):
+    """Time a block as one processing stage of the current route"""
+    return STAGE_SECONDS.time(stage=stage, route=current_route.get())
+
+
+def upstream_error_reason(error):
+    """Low-cardinality label for a failed upstream request"""
+    if isinstance(error, CircuitOpenError):
+        return 'circuit_open'
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        return f"http_{error.response.status_code // 100}xx"
+    if isinstance(error, requests.Timeout):
+        return 'timeout'
+    if isinstance(error, requests.ConnectionError):
+        return 'connection'
+    if isinstance(error, ValueError):
+        return 'decode'
+    return 'other'
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """jsonify with its encoding time recorded as the serialize stage"""
+
+    def response(self, *args, **kwargs):
+        with timed('serialize'):
+            return super().response(*args, **kwargs)
+
 
-# enable logging
 app = Flask(__name__)
-app.logger.setLevel('DEBUG')
+app.json = TimedJSONProvider(app)
+app.logger.setLevel(LOG_LEVEL)  # same logger as log, named after the module
 
 class EONETData:
     def __init__(self):
-        self.EONET_API = "https://eonet.gsfc.nasa.gov/api/v3"
-        self.events_cache = None
-        self.categories_cache = None
-        self.last_update = None
+        self.EONET_API = os.environ.get('EONET_API', "https://eonet.gsfc.nasa.gov/api/v3")
+        # Pooled client; full pulls are split into date shards fetched concurrently
+        self.client = EONETClient(
+            self.EONET_API,
+            timeout=(3.05, float(os.environ.get('EONET_TIMEOUT', 30))),
+            shard_days=int(os.environ.get('EONET_SHARD_DAYS', 30)),
+            max_workers=int(os.environ.get('EONET_FETCH_WORKERS', 4)),
+            timer=timed,
+            on_error=lambda endpoint, e: UPSTREAM_ERRORS.inc(endpoint=endpoint,
+                                                             reason=upstream_error_reason(e)))
+        # Also shard by category, for upstreams that are slow on large windows
+        self.shard_categories = os.environ.get('EONET_SHARD_CATEGORIES', '').lower() in ('1', 'true', 'yes')
+        self.snapshot = EventSnapshot()
         self.update_interval = 300  # 5 minutes
-        self.data_lock = Lock()
+        self.update_jitter = 0.1
+        self.data_lock = Lock()  # serializes writers only, readers use self.snapshot
+        self.refresher = SnapshotRefresher(self.refresh, self.update_interval, self.update_jitter)
+        self.sync_overlap = timedelta(days=2)  # re-read this much before the last sync
+        self.full_sync_interval = 24 * 3600  # periodic full pull to catch upstream removals
+        self.last_full_sync = None
+        self.sync_days = None
+        self.last_ingest = None
         self.initialized = False
+        # Results keyed by data version and normalized parameters
+        self.result_cache = ResultCache(maxsize=256, ttl=self.update_interval)
+
+        # Local snapshot for network-free startup, EONET_SNAPSHOT='' disables it
+        snapshot_path = os.environ.get('EONET_SNAPSHOT', DEFAULT_SNAPSHOT_PATH)
+        self.snapshot_store = SnapshotStore(snapshot_path) if snapshot_path else None
+        # Every event ever fetched, partitioned by month on disk, for queries
+        # reaching back before the in-memory window; EONET_ARCHIVE='' disables it
+        archive_path = os.environ.get('EONET_ARCHIVE', DEFAULT_ARCHIVE_DIR)
+        self.archive = EventArchive(archive_path) if archive_path else None
+        # Offline mode serves the stored snapshot and never touches the network
+        self.offline = os.environ.get('EONET_OFFLINE', '').lower() in ('1', 'true', 'yes')
+
+        # Multi-process serving: one 'fetcher' publishes a memory-mappable snapshot
+        # that every 'worker' maps read-only; 'standalone' does both in one process
+        self.role = os.environ.get('EONET_ROLE', 'standalone')
+        if self.role not in ('standalone', 'fetcher', 'worker'):
+            raise ValueError(f"EONET_ROLE must be standalone, fetcher or worker, not {self.role!r}")
+        self.shared_store = None
+        if self.role != 'standalone':
+            self.shared_store = SharedSnapshotStore(os.environ.get('EONET_SHARED_DIR') or DEFAULT_SHARED_DIR)
+        self.shared_name = None
+        # Names the data of this process in validators, apart from earlier runs
+        self.process_tag = os.urandom(8).hex()
+        self.shared_poll_interval = float(os.environ.get('EONET_SHARED_POLL', 2))
+
+        # What each refresh changed, for /api/stream clients; larger refreshes only say reload
+        self.delta_log = DeltaLog(int(os.environ.get('EONET_STREAM_BACKLOG', 64)))
+        self.max_delta_events = int(os.environ.get('EONET_STREAM_MAX_EVENTS', 2000))
 
         # Initialize colormap for events
         self.colormap = cm.LinearColormap(
@@ -36,107 +168,549 @@ class EONETData:
         self.initialize()
 
     def initialize(self):
-        """Initialize data"""
-        print("Starting initial data load...")
+        """Initialize data, from the local snapshot when there is one"""
+        if self.role == 'worker':
+            self.initialized = self.load_shared()
+            if not self.initialized:
+                log.warning("No shared snapshot in %s yet, waiting for the fetcher",
+                            self.shared_store.root)
+            return self.initialized
+        if self.load_snapshot():
+            if self.role == 'fetcher':
+                self.publish_shared()
+            log.info("Loaded snapshot v%s (%d events)", self.data_version, len(self.events_index))
+            self.initialized = True
+            return True
+        if self.offline:
+            log.warning("Offline mode and no snapshot available, starting empty")
+            return False
+
+        log.info("Starting initial data load...")
         try:
             self.fetch_categories()
             self.fetch_events()
             self.initialized = True
-            print("Initial data load completed successfully")
+            log.info("Initial data load completed successfully")
             return True
         except Exception as e:
-            print(f"Error during initial data load: {e}")
+            log.error("Error during initial data load: %s", e)
             return False
 
-    def fetch_events(self, days=365):
-        """Fetch events from EONET API"""
+    @property
+    def events_cache(self):
+        return self.snapshot.events
+
+    @property
+    def events_index(self):
+        return self.snapshot.index
+
+    @property
+    def categories_cache(self):
+        return self.snapshot.categories
+
+    @property
+    def last_update(self):
+        return self.snapshot.last_update
+
+    @property
+    def data_version(self):
+        return self.snapshot.version
+
+    @property
+    def data_tag(self):
+        """Identity of the served data, shared by the workers mapping the same snapshot"""
+        if self.role == 'worker' and self.shared_name:
+            return self.shared_name
+        return f"{self.process_tag}.{self.data_version}"
+
+    def snapshot_age(self):
+        """Seconds since the current snapshot was fetched"""
+        return self.snapshot.age()
+
+    def publish(self, **changes):
+        """Atomically swap in a new snapshot with the given fields replaced"""
+        with self.data_lock:
+            version = self.snapshot.version
+            if 'events' in changes or 'categories' in changes:
+                version += 1
+            self.snapshot = self.snapshot.replace(version=version, **changes)
+            return self.snapshot
+
+    def load_snapshot(self):
+        """Install the snapshot stored on disk, if any"""
+        if self.snapshot_store is None:
+            return False
+        snapshot, extra = self.snapshot_store.load()
+        if snapshot is None or not snapshot.events:
+            return False
+        with self.data_lock:
+            self.snapshot = snapshot
+            self.last_full_sync = extra.get('last_full_sync')
+            self.sync_days = extra.get('sync_days')
+        return True
+
+    def save_snapshot(self):
+        """Persist the current snapshot for the next startup, and for workers when fetching for them"""
+        if self.role == 'fetcher':
+            self.publish_shared()
+        if self.snapshot_store is None or not self.snapshot.events:
+            return False
         try:
-            end_date = datetime.now(timezone.utc)
-            start_date = end_date - timedelta(days=days)
+            self.snapshot_store.save(self.snapshot, last_full_sync=self.last_full_sync,
+                                     sync_days=self.sync_days)
+            return True
+        except Exception as e:
+            log.error("Error saving snapshot: %s", e)
+            return False
 
-            params = {
-                'start': start_date.strftime('%Y-%m-%d'),
-                'end': end_date.strftime('%Y-%m-%d'),
-                'status': 'all'
-            }
+    def publish_shared(self):
+        """Write the current snapshot as the version workers map next"""
+        if not self.snapshot.events:
+            return False
+        try:
+            self.shared_name = self.shared_store.write(self.snapshot)
+            return True
+        except Exception as e:
+            log.error("Error publishing shared snapshot: %s", e)
+            return False
 
-            response = requests.get(f"{self.EONET_API}/events", params=params)
-            response.raise_for_status()
+    def load_shared(self):
+        """Map the fetcher's latest shared snapshot, if it differs from the one in use"""
+        current = self.shared_store.current()
+        if current is None:
+            return False
+        if current['name'] == self.shared_name:
+            if current.get('fetched_at') != self.snapshot.fetched_at:
+                self.publish(fetched_at=current.get('fetched_at'))
+            return True
 
-            with self.data_lock:
-                self.events_cache = response.json()
-                self.last_update = datetime.now()
+        snapshot = self.shared_store.load(current)
+        if snapshot is None:
+            return False
+        with self.data_lock:
+            if snapshot.version <= self.snapshot.version:
+                # A restarted fetcher may count versions from scratch, cache keys must not repeat
+                snapshot = snapshot.replace(version=self.snapshot.version + 1)
+            self.snapshot = snapshot
+            self.shared_name = current['name']
+        self.initialized = True
+        log.info("Mapped shared snapshot %s (%d events)", current['name'], len(snapshot.index))
+        return True
+
+    def refresh(self):
+        """Re-fetch categories and events, keeping the old snapshot on failure"""
+        if self.role == 'worker':
+            return self.load_shared()
+        self.fetch_categories()
+        return self.fetch_events()
+
+    def start_refresher(self, delay=None):
+        """Start refreshing in the background every update_interval seconds
+
+        By default the first refresh runs once the current snapshot is due, so a
+        stale snapshot loaded from disk is refreshed right away. Workers
+        instead check for a new shared snapshot every shared_poll_interval.
+        """
+        if self.role == 'worker':
+            self.refresher.interval = self.shared_poll_interval
+            self.refresher.jitter = self.update_jitter
+            self.refresher.start(self.shared_poll_interval if delay is None else delay)
+            return
+        if self.offline:
+            return
+        if delay is None:
+            age = self.snapshot_age()
+            delay = 0 if age is None else max(0, self.update_interval - age)
+        self.refresher.interval = self.update_interval
+        self.refresher.jitter = self.update_jitter
+        self.refresher.start(delay)
+
+    def stop_refresher(self):
+        """Stop the background refresher"""
+        self.refresher.stop()
+
+    def fetch_events(self, days=365, incremental=True):
+        """Fetch events from EONET API, only the recent window once fully synced"""
+        if self.offline or self.role == 'worker':
+            return False
+        try:
+            started = time.time()
+            end_date = datetime.now(timezone.utc)
+            start_date = end_date - timedelta(days=days)
 
+            snapshot = self.snapshot
+            delta = (incremental and snapshot.events is not None
+                     and snapshot.fetched_at is not None
+                     and self.sync_days == days
+                     and self.last_full_sync is not None
+                     and started - self.last_full_sync < self.full_sync_interval)
+
+            window_start = start_date
+            if delta:
+                since = datetime.fromtimestamp(snapshot.fetched_at, timezone.utc) - self.sync_overlap
+                window_start = max(since, start_date)
+
+            categories = None
+            if self.shard_categories and self.categories_cache:
+                categories = [c['id'] for c in self.categories_cache.get('categories', [])]
+            payload, fetch_stats = self.client.events(window_start.date(), end_date.date(),
+                                                      status='all', categories=categories)
+
+            rollup = None
+            removed = []
+            deleted = []
+            if delta:
+                merged, stats, changes = merge_events(snapshot.events.get('events', []),
+                                                      payload.get('events', []),
+                                                      cutoff=start_date.strftime('%Y-%m-%d'))
+                events = dict(payload, events=merged)
+                # Only the changed events are re-aggregated
+                with timed('aggregate'):
+                    rollup = snapshot.rollup.updated(
+                        removed=[old for old, _ in changes['updated']] + changes['evicted'],
+                        added=changes['added'] + [new for _, new in changes['updated']])
+            else:
+                events = payload
+                previous = snapshot.events.get('events', []) if snapshot.events else []
+                _, stats, changes = merge_events(previous, events.get('events', []))
+                removed = list({e.get('id') for e in previous}
+                               - {e.get('id') for e in events.get('events', [])})
+                stats['evicted'] = len(removed)
+                # Gone although still inside the fetched window: deleted upstream
+                gone = set(removed)
+                deleted = [e.get('id') for e in previous if e.get('id') in gone
+                           and (last_geometry_date(e) or '') >= start_date.strftime('%Y-%m-%d')]
+
+            changed = stats['added'] + stats['updated'] + stats['evicted']
+            if delta and not changed:
+                # Nothing moved upstream, keep the data version and caches
+                self.publish(fetched_at=time.time())
+                if self.role == 'fetcher':
+                    self.shared_store.mark_fetched(self.snapshot.fetched_at)
+            else:
+                # Build the columnar index once per refresh, before the swap
+                with timed('index'):
+                    index = EventIndex(events.get('events', []))
+                if rollup is None:
+                    with timed('aggregate'):
+                        rollup = Rollup(events.get('events', []))
+                # Archived before the swap, so no reader sees data the archive lacks
+                self.archive_events(events.get('events', []) if not delta
+                                    else changes['added'] + [new for _, new in changes['updated']],
+                                    deleted)
+                self.publish(events=events, index=index, rollup=rollup, fetched_at=time.time())
+                if snapshot.events:
+                    removed += [event.get('id') for event in changes['evicted']]
+                    self.announce(snapshot, changes, removed)
+
+            if not delta:
+                self.last_full_sync = started
+                self.sync_days = days
+            if changed or not delta:
+                self.save_snapshot()
+
+            self.last_ingest = dict(stats, mode='delta' if delta else 'full',
+                                    start=window_start.strftime('%Y-%m-%d'),
+                                    end=end_date.strftime('%Y-%m-%d'),
+                                    shards=fetch_stats['shards'], bytes=fetch_stats['bytes'],
+                                    decoded_bytes=fetch_stats['decoded_bytes'],
+                                    duplicates=fetch_stats['duplicates'], changed=changed,
+                                    events=len(events.get('events', [])),
+                                    duration=round(time.time() - started, 3))
+            log.info("Ingested %(events)d events (%(mode)s, %(changed)d changed) in %(duration).2fs",
+                     self.last_ingest)
             return True
         except Exception as e:
-            print(f"Error fetching events: {e}")
+            log.error("Error fetching events: %s", e)
             return False
 
+    def archive_events(self, events, deleted=()):
+        """Upsert fetched events into the archive and drop the deleted ids
+
+        A failing disk only leaves the archive behind.
+        """
+        if self.archive is None or not (events or deleted):
+            return
+        try:
+            with timed('archive'):
+                self.archive.append(events)
+                if deleted:
+                    self.archive.remove(deleted)
+        except OSError as e:
+            log.warning("Could not archive events: %s", e)
+
+    def uses_archive(self, start_date):
+        """Whether a query from start_date reaches back before the in-memory window"""
+        if self.archive is None or not start_date:
+            return False
+        window_start = datetime.now(timezone.utc) - timedelta(days=self.sync_days or 365)
+        return str(start_date)[:10] < window_start.strftime('%Y-%m-%d') and bool(self.archive.manifest())
+
+    def rollup_between(self, start_date=None, end_date=None):
+        """Rollup of the events first dated between the dates, from the archive when needed"""
+        start_day = epoch_day(start_date) if start_date else None
+        end_day = epoch_day(end_date) if end_date else None
+        if self.uses_archive(start_date):
+            return self.archive.rollup(start_day, end_day)
+        if start_day is None and end_day is None:
+            return self.snapshot.rollup
+        return Rollup.combine([self.snapshot.rollup], start_day, end_day)
+
+    def announce(self, old, changes, removed):
+        """Log what a refresh changed since the old snapshot for /api/stream
+
+        changes is as returned by merge_events, removed the ids no longer
+        present. Events are sent as map features, closed ones apart from
+        other updates; refreshes changing more than max_delta_events events
+        only carry the summary and ask clients to reload.
+        """
+        new = self.snapshot
+        summary = summary_delta(old.rollup.summary_statistics(), new.rollup.summary_statistics())
+        delta = {'version': new.version, 'fetched_at': new.fetched_at, 'summary': summary}
+        if len(changes['added']) + len(changes['updated']) + len(removed) > self.max_delta_events:
+            self.delta_log.append(dict(delta, reload=True))
+            return
+
+        closed = [event for previous, event in changes['updated']
+                  if event.get('closed') and not previous.get('closed')]
+        closed_ids = {event.get('id') for event in closed}
+        updated = [event for _, event in changes['updated'] if event.get('id') not in closed_ids]
+        delta.update(added=self._delta_features(new.index, changes['added']),
+                     updated=self._delta_features(new.index, updated),
+                     closed=self._delta_features(new.index, closed),
+                     removed=[])
+        for event_id in removed:
+            row = old.index.row_of(event_id)
+            if row is not None:
+                code = old.index.category_codes[row]
+                category_id = old.index.category_ids[code] if code >= 0 else None
+                delta['removed'].append({'id': event_id, 'properties': {'category_id': category_id}})
+        self.delta_log.append(delta)
+
+    def _delta_features(self, index, events):
+        """Map features of changed events, with their category id and closing date"""
+        features = []
+        for event in events:
+            row = index.row_of(event.get('id'))
+            if row is None:
+                continue
+            feature = self._point_feature(index, row)
+            if np.isnan(index.lons[row]):
+                feature['geometry'] = None
+            code = index.category_codes[row]
+            feature['properties'].update(category_id=index.category_ids[code] if code >= 0 else None,
+                                         title=event.get('title'), closed=event.get('closed'))
+            features.append(feature)
+        return features
+
     def fetch_categories(self):
         """Fetch categories from EONET API"""
+        if self.offline or self.role == 'worker':
+            return False
         try:
-            response = requests.get(f"{self.EONET_API}/categories")
-            response.raise_for_status()
-            self.categories_cache = response.json()
+            categories = self.client.categories()
+            if categories != self.categories_cache:
+                self.publish(categories=categories)
+                if self.role == 'fetcher' and self.snapshot.events:
+                    self.publish_shared()
             return True
         except Exception as e:
-            print(f"Error fetching categories: {e}")
+            log.error("Error fetching categories: %s", e)
             return False
 
+    @cached_method('filtered_events')
     def get_filtered_events(self, start_date=None, end_date=None, event_type=None,
-                        min_magnitude=None, max_magnitude=None):
-        """Get filtered events based on criteria"""
-        if not self.events_cache:
+                        min_magnitude=None, max_magnitude=None, bbox=None, near=None,
+                        radius_km=None, country=None):
+        """Get filtered events based on criteria
+
+        bbox is (west, south, east, north); near is (lat, lon) and matches events
+        with any geometry point within radius_km great-circle kilometres;
+        country is a tuple of ISO alpha-3 codes, matching events with any
+        geometry point in one of them. A start_date before the in-memory
+        window is answered from the archive, ValueError when more than
+        archive.MAX_EVENTS events match.
+        """
+        if self.uses_archive(start_date):
+            with timed('filter'):
+                return {"events": self.archive.filtered_events(
+                    start_date=start_date, end_date=end_date, event_type=event_type,
+                    min_magnitude=min_magnitude, max_magnitude=max_magnitude, bbox=bbox,
+                    near=near, radius_km=radius_km, country=country)}
+        if not self.snapshot.events:
             return {"events": []}
-
-        filtered_events = []
-        for event in self.events_cache.get('events', []):
-            try:
-                # Apply date and type filters
-                if start_date and event['geometry'][0]['date'][:10] < start_date:
-                    continue
-                if end_date and event['geometry'][0]['date'][:10] > end_date:
-                    continue
-                if event_type and event['categories'][0]['id'] != event_type:
+        index, rows = self.get_filtered_rows(start_date=start_date, end_date=end_date,
+                                             event_type=event_type, min_magnitude=min_magnitude,
+                                             max_magnitude=max_magnitude, bbox=bbox, near=near,
+                                             radius_km=radius_km, country=country)
+        return {"events": index.take(rows)}
+
+    @cached_method('filtered_rows')
+    def get_filtered_rows(self, start_date=None, end_date=None, event_type=None,
+                          min_magnitude=None, max_magnitude=None, bbox=None, near=None,
+                          radius_km=None, country=None):
+        """Get (index, rows) of the filtered events in memory, rows in upstream order"""
+        index = self.snapshot.index
+        with timed('filter'):
+            rows = index.filter_rows(start_date=start_date, end_date=end_date,
+                                     event_type=event_type, min_magnitude=min_magnitude,
+                                     max_magnitude=max_magnitude, bbox=bbox, near=near,
+                                     radius_km=radius_km, country=country)
+        log.debug("Filtered %d of %d events", len(rows), len(index))
+        return index, rows
+
+    def page_events(self, limit=None, after=None, **filters):
+        """(parts, next page key) of the filtered events, parts being (index, rows) pairs
+
+        Without limit and after the rows are in upstream order, otherwise one
+        page as cut by EventIndex.page. A start_date before the in-memory
+        window reads the archive one partition at a time: a page indexes only
+        its own events, a whole result one partition's events at a time.
+        """
+        if self.uses_archive(filters.get('start_date')):
+            if limit is None and after is None:
+                indexes = map(EventIndex, self.archive.iter_filtered(**filters))
+                return ((index, np.arange(len(index))) for index in indexes), None
+            with timed('filter'):
+                events, next_key = self.archive.page(limit, after, **filters)
+                index = EventIndex(events)
+            return [(index, np.arange(len(index)))], next_key
+        index, rows = self.get_filtered_rows(**filters)
+        next_key = None
+        if limit is not None or after is not None:
+            rows, next_key = index.page(rows, limit, after)
+        return [(index, rows)], next_key
+
+    def iter_events(self, categories=(), **filters):
+        """Iterator over the filtered events of any of the categories, all when empty
+
+        Filtering happens now; the events are produced one at a time as the
+        iterator is consumed, rebuilt from the index or read one archive
+        partition at a time, so they are never all held at once.
+        """
+        if self.uses_archive(filters.get('start_date')):
+            partitions = self.archive.iter_filtered(event_type=tuple(categories), **filters)
+            return (event for events in partitions for event in events)
+        if not self.snapshot.events:
+            return iter(())
+        index, rows = self.get_filtered_rows(**filters)
+        if categories:
+            codes = [index.category_code(category_id) for category_id in categories]
+            rows = rows[np.isin(index.category_codes[rows], codes)]
+        return (index.events[row] for start in range(0, len(rows), 1000)
+                for row in rows[start:start + 1000].tolist())
+
+    @cached_method('map')
+    def get_map_html(self, start_date=None, end_date=None, event_type=None,
+                     min_magnitude=None, max_magnitude=None):
+        """Get the rendered map HTML for filtered events"""
+        events = self.get_filtered_events(start_date=start_date, end_date=end_date,
+                                          event_type=event_type, min_magnitude=min_magnitude,
+                                          max_magnitude=max_magnitude)
+        with timed('map'):
+            return self.create_map(events)
+
+    @cached_method('map_features')
+    def get_map_features(self, bbox=None, zoom=3, start_date=None, end_date=None,
+                         event_type=None, min_magnitude=None, max_magnitude=None):
+        """Get compact GeoJSON for the map, grid-clustered below CLUSTER_MAX_ZOOM"""
+        with timed('map'):
+            return self._map_features(bbox, zoom, start_date=start_date, end_date=end_date,
+                                      event_type=event_type, min_magnitude=min_magnitude,
+                                      max_magnitude=max_magnitude)
+
+    def _map_features(self, bbox, zoom, **filters):
+        index = self.snapshot.index
+        mask = index.mask(**filters)
+        mask &= ~np.isnan(index.lons)
+        mask &= bbox_mask(index.lons, index.lats, bbox)
+        rows = np.flatnonzero(mask)
+
+        features = []
+        clustered = zoom < CLUSTER_MAX_ZOOM
+        if clustered:
+            lons, lats, counts, max_magnitudes, first_rows = grid_clusters(
+                index.lons[rows], index.lats[rows], index.magnitudes[rows], zoom)
+            for i in range(len(counts)):
+                if counts[i] == 1:
+                    features.append(self._point_feature(index, rows[first_rows[i]]))
                     continue
+                features.append({
+                    'type': 'Feature',
+                    'geometry': {'type': 'Point',
+                                 'coordinates': [round(float(lons[i]), 4), round(float(lats[i]), 4)]},
+                    'properties': {
+                        'cluster': True,
+                        'count': int(counts[i]),
+                        'max_magnitude': None if np.isnan(max_magnitudes[i]) else float(max_magnitudes[i])
+                    }
+                })
+        else:
+            features = [self._point_feature(index, row) for row in rows]
 
-                # Initialize magnitude as None
-                magnitude = None
-
-                # Try to get magnitude from event root
-                if 'magnitudeValue' in event:
-                    try:
-                        mag_value = event.get('magnitudeValue')
-                        if mag_value is not None and str(mag_value).strip():
-                            magnitude = float(mag_value)
-                    except (ValueError, TypeError):
-                        pass
-
-                # Try to get magnitude from geometry if not found in root
-                if magnitude is None and event.get('geometry'):
-                    for geo in event['geometry']:
-                        try:
-                            mag_value = geo.get('magnitudeValue')
-                            if mag_value is not None and str(mag_value).strip():
-                                magnitude = float(mag_value)
-                                break
-                        except (ValueError, TypeError):
-                            continue
-
-                # Apply magnitude filters if magnitude exists
-                if magnitude is not None and (min_magnitude is not None or max_magnitude is not None):
-                    if min_magnitude and magnitude < float(min_magnitude):
-                        continue
-                    if max_magnitude and magnitude > float(max_magnitude):
-                        continue
-
-                filtered_events.append(event)
-
-            except Exception as e:
-                print(f"Error filtering event: {str(e)}")
-                continue
+        return {'type': 'FeatureCollection', 'zoom': zoom, 'clustered': clustered,
+                'total': int(len(rows)), 'features': features}
 
-        return {"events": filtered_events}
+    def _point_feature(self, index, row):
+        """GeoJSON feature for one event, details are fetched on demand by id"""
+        magnitude = index.magnitudes[row]
+        return {
+            'type': 'Feature',
+            'id': str(index.ids[row]) or None,
+            'geometry': {'type': 'Point',
+                         'coordinates': [round(float(index.lons[row]), 4), round(float(index.lats[row]), 4)]},
+            'properties': {
+                'category': index.category_title(row),
+                'date': str(index.dates[row]),
+                'magnitude': None if np.isnan(magnitude) else float(magnitude)
+            }
+        }
+
+    def get_event(self, event_id):
+        """Get a single raw event by id, or None"""
+        index = self.snapshot.index
+        row = index.row_of(event_id)
+        return index.events[row] if row is not None else None
+
+    @cached_method('track')
+    def get_track(self, event_id, zoom=None):
+        """Get the track of one event as a GeoJSON feature, or None"""
+        index = self.snapshot.index
+        row = index.row_of(event_id)
+        if row is None:
+            return None
+        with timed('map'):
+            return self._track_feature(index, row, index.tracks.line(row, zoom))
+
+    @cached_method('tracks')
+    def get_tracks(self, bbox, zoom=None, start_date=None, end_date=None, event_type=None,
+                   min_magnitude=None, max_magnitude=None):
+        """Get the tracks of the filtered events passing through a bbox"""
+        index = self.snapshot.index
+        with timed('map'):
+            rows = index.filter_rows(start_date=start_date, end_date=end_date,
+                                     event_type=event_type, min_magnitude=min_magnitude,
+                                     max_magnitude=max_magnitude, bbox=bbox)
+            features = [self._track_feature(index, row, track)
+                        for row, track in zip(rows.tolist(), index.tracks.lines(rows, zoom))]
+        return {'type': 'FeatureCollection', 'zoom': zoom,
+                'tolerance': tolerance_for_zoom(zoom), 'total': len(features),
+                'features': features}
+
+    def _track_feature(self, index, row, track):
+        """GeoJSON feature for the whole path of one event"""
+        return {
+            'type': 'Feature',
+            'id': str(index.ids[row]) or None,
+            'geometry': track['geometry'],
+            'properties': {
+                'category': index.category_title(row),
+                'times': track['times'],
+                'magnitudes': track['magnitudes'],
+                'points': track['points'],
+                'vertices': len(track['times'])
+            }
+        }
 
     def create_map(self, events):
         """Create enhanced Folium map with events"""
@@ -230,257 +804,132 @@ class EONETData:
         }
         return icons.get(category, 'info-circle')
 
+    @cached_method('summary')
     def get_summary_statistics(self):
-        """Generate summary statistics"""
-        stats = {
-            'event_count': 0,
-            'categories': {},
-            'magnitudes': {
-                'low': 0,    # 0-1.5
-                'medium': 0, # 1.5-5
-                'high': 0    # 5+
-            },
-            'daily_counts': {}
-        }
-
-        if not self.events_cache:
-            return stats
-
-        stats['event_count'] = len(self.events_cache['events'])
-
-        for event in self.events_cache['events']:
-            try:
-                # Category statistics
-                category = event['categories'][0]['title']
-                stats['categories'][category] = stats['categories'].get(category, 0) + 1
-
-                # Daily counts
-                date = event['geometry'][0]['date'][:10]
-                stats['daily_counts'][date] = stats['daily_counts'].get(date, 0) + 1
-
-                # Magnitude statistics
-                # Check for magnitude in both possible locations
-                magnitude = None
-                mag_id = None
-
-                # Check in event root
-                if 'magnitudeValue' in event and 'magnitudeUnit' in event:
-                    magnitude = float(event['magnitudeValue'])
-                    mag_id = event.get('magnitudeUnit')
-
-                # Check in geometry
-                elif event.get('geometry', []):
-                    for geo in event['geometry']:
-                        if 'magnitudeValue' in geo and 'magnitudeUnit' in geo:
-                            magnitude = float(geo['magnitudeValue'])
-                            mag_id = geo.get('magnitudeUnit')
-                            break
-
-                # Categorize magnitude if found
-                if magnitude is not None:
-                    print(f"Processing magnitude: {magnitude}, Unit: {mag_id}")  # Debug print
-                    if magnitude < 1.5:
-                        stats['magnitudes']['low'] += 1
-                    elif magnitude < 5.0:
-                        stats['magnitudes']['medium'] += 1
-                    else:
-                        stats['magnitudes']['high'] += 1
-                else:
-                    # If no magnitude found, count as low
-                    stats['magnitudes']['low'] += 1
-
-            except Exception as e:
-                print(f"Error processing event: {e}")
-                continue
-
-        # Debug print
-        print("Magnitude statistics:", stats['magnitudes'])
-
-        return stats
-
-    def get_trend_analysis(self, category=None, period='monthly'):
-        """Analyze trends in event frequency"""
-        events = self.get_filtered_events(event_type=category)
-
-        # Group events by period
-        periods = {}
-        for event in events['events']:
-            date = datetime.strptime(event['geometry'][0]['date'][:10], '%Y-%m-%d')
-            if period == 'monthly':
-                key = date.strftime('%Y-%m')
-            elif period == 'weekly':
-                key = date.strftime('%Y-W%W')
-            else:
-                key = date.strftime('%Y-%m-%d')
-
-            periods[key] = periods.get(key, 0) + 1
-
-        # Calculate trends
-        counts = list(periods.values())
-        if len(counts) > 1:
-            trend = (counts[-1] - counts[0]) / len(counts)
-        else:
-            trend = 0
-
+        """Generate summary statistics from the pre-aggregated rollup"""
+        snapshot = self.snapshot
+        if not snapshot.events:
+            return {
+                'event_count': 0,
+                'categories': {},
+                'magnitudes': {'low': 0, 'medium': 0, 'high': 0},
+                'daily_counts': {}
+            }
+        # Magnitude bands: low 0-1.5, medium 1.5-5, high 5+
+        with timed('aggregate'):
+            return snapshot.rollup.summary_statistics()
+
+    @cached_method('trends')
+    def get_trend_analysis(self, category=None, period='monthly', window=None, threshold=ANOMALY_Z,
+                           start_date=None, end_date=None):
+        """Analyze trends in event frequency
+
+        category is one id, comma separated ids or a tuple of them, all events
+        when empty. Every series shares one gap-filled calendar; the top-level
+        counts and statistics are those of the first one. Dates limit the
+        events by first geometry date, reading the archive for older ones.
+        """
+        if isinstance(category, str) or category is None:
+            category = parse_categories([category])
+        category = tuple(category) or (None,)
+        window = window or ROLLING_WINDOWS.get(period, 3)
+        with timed('aggregate'):
+            rollup = self.rollup_between(start_date, end_date)
+            periods, matrix = rollup.trend_matrix(category, period)
+            names = [('all', 'All categories') if category_id is None
+                     else (category_id, rollup.category_titles.get(category_id, category_id))
+                     for category_id in category]
+            series = trend_series(periods, matrix, names, window, threshold)
+
+        first = series[names[0][0]]
         return {
-            'periods': list(periods.keys()),
-            'counts': counts,
-            'trend': trend,
-            'average': sum(counts) / len(counts) if counts else 0,
-            'max': max(counts) if counts else 0,
-            'min': min(counts) if counts else 0
+            'period': period,
+            'window': window,
+            'periods': periods,
+            'counts': first['counts'],
+            'trend': first['slope'],
+            'average': first['average'],
+            'max': first['max'],
+            'min': first['min'],
+            'series': series
         }
 
    
     #ANALYSIS
-    def get_analysis_data(self, period=30):
-        """Get comprehensive analysis data"""
-        try:
-            # Calculate date range
-            end_date = datetime.now(timezone.utc)
-            start_date = (end_date - timedelta(days=int(period))).strftime('%Y-%m-%d')
-            
-            # Get filtered events
+    @cached_method('analysis_rollup')
+    def analysis_rollup(self, period=30):
+        """(rollup, start date) shared by every analysis facet of a period
+
+        Periods longer than the in-memory window are folded from the archive
+        once per data version rather than once per facet.
+        """
+        start_date = (datetime.now(timezone.utc) - timedelta(days=int(period))).strftime('%Y-%m-%d')
+        if self.uses_archive(start_date):
+            with timed('aggregate'):
+                return self.archive.rollup(epoch_day(start_date)), start_date
+        return self.snapshot.rollup, start_date
+
+    @cached_method('analysis_facet')
+    def get_analysis_facet(self, facet, period=30, region=None, max_points=SEVERITY_POINTS):
+        """One of ANALYSIS_FACETS for the events of the last period days
+
+        Severity series are thinned to max_points per group, and periods
+        reaching into the archive have at most SEVERITY_POINTS; the geographic
+        counts are those of one macro-region, and the countries those in it,
+        when region is set and not 'all'.
+        """
+        rollup, start_date = self.analysis_rollup(period)
+        start_day = epoch_day(start_date)
+        with timed('aggregate'):
+            if facet == 'severity':
+                return {group: downsample_points(points, max_points)
+                        for group, points in rollup.analysis_severity(start_day).items()}
+            if facet == 'countries' and region not in (None, '', 'all'):
+                return rollup.analysis_countries(start_day, region)
+            data = getattr(rollup, f"analysis_{facet}")(start_day)
+        if facet == 'geographic' and region not in (None, '', 'all'):
+            return {region: data.get(region, 0)}
+        return data
+
+    @cached_method('analysis')
+    def get_analysis_data(self, period=30, include=None):
+        """Get comprehensive analysis data
+
+        include names the ANALYSIS_FACETS to return and 'events' for the raw
+        events of the period, all of them when None.
+        """
+        include = ANALYSIS_FACETS + ('events',) if include is None else include
+        events = None
+        if 'events' in include:
+            # ValueError for archived periods with too many events to return whole
+            _, start_date = self.analysis_rollup(period)
             events = self.get_filtered_events(start_date=start_date)
-            print(f"Total events fetched: {len(events.get('events', []))}")  # Debug log
-            
-            data = {
-                'trends': {'labels': [], 'values': []},
-                'categories': {'labels': [], 'values': []},
-                'geographic': {},
-                'severity': {
-                    'wildfires': [],
-                    'storms': [],
-                    'volcanoes': [],
-                    'earthquakes': []
-                },
-                'weekday': {
-                    'labels': ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'],
-                    'values': [0] * 7
-                }
-            }
-            
-            category_counts = {}
-            dates_count = {}
-            
-            # Debug counters
-            severity_counts = {
-                'wildfires': 0,
-                'storms': 0,
-                'volcanoes': 0,
-                'earthquakes': 0
-            }
-
-            trending_data= {
-
-            }
-
-            for event in events.get('events', []):
-                try:
-                    date = event['geometry'][0]['date'][:10]
-                    categories = [cat['title'] for cat in event['categories']]
-
-
-                    
-                    # Process basic counts
-                    for category in categories:
-                        category_counts[category] = category_counts.get(category, 0) + 1
-                    dates_count[date] = dates_count.get(date, 0) + 1
-
-                    # Geographic and weekday processing
-                    if event['geometry']:
-                        coords = event['geometry'][0]['coordinates']
-                        region = self.get_region_name(coords[1])
-                        data['geographic'][region] = data['geographic'].get(region, 0) + 1
-                        
-                        weekday = datetime.strptime(date, '%Y-%m-%d').weekday()
-                        data['weekday']['values'][weekday] += 1
-
-                    # Process magnitude/severity
-                    magnitude_value = None
-                    magnitude_unit = None
-
-                    # Check for magnitude in event root
-                    if 'magnitudeValue' in event:
-                        magnitude_value = event['magnitudeValue']
-                        magnitude_unit = event.get('magnitudeUnit', '')
-                    
-                    # Check for magnitude in geometries
-                    if not magnitude_value and event.get('geometry'):
-                        for geo in event['geometry']:
-                            if 'magnitudeValue' in geo:
-                                magnitude_value = geo['magnitudeValue']
-                                magnitude_unit = geo.get('magnitudeUnit', '')
-                                break
-
-                    # Debug print
-                    print(f"Event: {event.get('title')} - Categories: {categories}")
-                    print(f"Magnitude: {magnitude_value}, Unit: {magnitude_unit}")
-
-                    if magnitude_value is not None:
-                        try:
-                            magnitude_value = float(magnitude_value)
-                            event_data = {
-                                'date': date,
-                                'magnitude': magnitude_value,
-                                'unit': magnitude_unit,
-                                'title': event.get('title', ''),
-                                'description': event.get('description', '')
-                            }
-
-                            # Categorize based on event categories
-                            if any('Wildfires' in cat for cat in categories):
-                                data['severity']['wildfires'].append(event_data)
-                                severity_counts['wildfires'] += 1
-                                
-                            elif any(storm_type in cat for cat in categories 
-                                for storm_type in ['Severe Storms', 'Tropical Cyclones']):
-                                data['severity']['storms'].append(event_data)
-                                severity_counts['storms'] += 1
-                                
-                            elif any('Volcanoes' in cat for cat in categories):
-                                data['severity']['volcanoes'].append(event_data)
-                                severity_counts['volcanoes'] += 1
-                                
-                            elif any('Earthquakes' in cat for cat in categories):
-                                data['severity']['earthquakes'].append(event_data)
-                                severity_counts['earthquakes'] += 1
-
-                        except (ValueError, TypeError) as e:
-                            print(f"Error converting magnitude value: {e}")
-                            continue
-
-                except Exception as e:
-                    print(f"Error processing event: {e}")
-                    continue
-
-            # Debug print severity counts
-            print("Severity counts:", severity_counts)
-
-            # Sort and prepare trend data
-            sorted_dates = sorted(dates_count.keys())
-            data['trends']['labels'] = sorted_dates
-            data['trends']['values'] = [dates_count[date] for date in sorted_dates]
-
-            # Prepare category data
-            data['categories']['labels'] = list(category_counts.keys())
-            data['categories']['values'] = list(category_counts.values())
-            data['events'] = events
+        try:
+            # Counts come from the rollup, only the raw events are filtered
+            data = {facet: self.get_analysis_facet(facet, period)
+                    for facet in ANALYSIS_FACETS if facet in include}
+            if events is not None:
+                data['events'] = events
 
             return data
 
         except Exception as e:
-            print(f"Error in analysis data: {e}")
+            log.exception("Error in analysis data: %s", e)
             return {
                 'trends': {'labels': [], 'values': []},
                 'categories': {'labels': [], 'values': []},
                 'geographic': {},
+                'countries': {'labels': [], 'codes': [], 'regions': [], 'values': []},
                 'severity': {
                     'wildfires': [],
                     'storms': [],
                     'volcanoes': [],
                     'earthquakes': []
                 },
+                'severity_levels': {
+                    group: {'low': 0, 'medium': 0, 'high': 0}
+                    for group in ('wildfires', 'storms', 'volcanoes', 'earthquakes')
+                },
                 'weekday': {
                     'labels': ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'],
                     'values': [0] * 7
@@ -490,17 +939,91 @@ class EONETData:
         """Convert acres to square kilometers"""
         return acres * 0.00404686
 
-    def get_region_name(self, lat):
-        """Get region name based on latitude"""
-        if lat > 66.5: return 'Arctic'
-        elif lat > 23.5: return 'Northern Hemisphere'
-        elif lat > 0: return 'Tropics (North)'
-        elif lat > -23.5: return 'Tropics (South)'
-        elif lat > -66.5: return 'Southern Hemisphere'
-        else: return 'Antarctic'
+    def get_region_name(self, lon, lat):
+        """Get the macro-region of a point from the bundled country boundaries"""
+        lookup = country_lookup()
+        return REGIONS[int(lookup.regions(lookup.countries([lon], [lat]))[0])]
 
 # Initialize EONET data handler
 eonet_data = EONETData()
+eonet_data.start_refresher()
+atexit.register(eonet_data.stop_refresher)
+# Encoded data responses per (data, day, path, query), compressed once each
+response_cache = ResultCache(maxsize=128, ttl=eonet_data.update_interval)
+
+metrics.gauge('eonet_snapshot_age_seconds', 'Seconds since the served data was fetched',
+              eonet_data.snapshot_age)
+metrics.gauge('eonet_events', 'Events in the served snapshot', lambda: len(eonet_data.events_index))
+metrics.gauge('eonet_data_version', 'Version of the served snapshot', lambda: eonet_data.data_version)
+metrics.gauge('process_resident_memory_bytes', 'Resident memory size in bytes', resident_memory_bytes)
+
+@app.before_request
+def start_request_timer():
+    """Label stage timings with the matched route, not the raw path"""
+    current_route.set(request.url_rule.rule if request.url_rule else 'unmatched')
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def observe_request(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        REQUEST_SECONDS.observe(time.perf_counter() - started, route=current_route.get(),
+                                status=response.status_code)
+    return response
+
+@app.after_request
+def add_data_headers(response):
+    """Expose the data version and snapshot age on every response"""
+    response.headers['X-Data-Version'] = str(eonet_data.data_version)
+    age = eonet_data.snapshot_age()
+    if age is not None:
+        response.headers['X-Snapshot-Age'] = f"{age:.0f}"
+    return response
+
+class UncachedResponse(Exception):
+    """Carries a response that must not be stored, such as a 400 for bad input"""
+
+    def __init__(self, response):
+        super().__init__(response.status)
+        self.response = response
+
+def encode_view(view, args, kwargs):
+    response = app.make_response(view(*args, **kwargs))
+    if response.status_code != 200:
+        raise UncachedResponse(response)
+    return EncodedBody(response.get_data(), response.content_type)
+
+def conditional(view):
+    """Serve a data route with a strong ETag, 304 revalidation and precompressed bodies
+
+    The ETag names the data, the day (analysis periods count back from it),
+    the path and the normalized query, so a 304 is answered before the view
+    runs or response_cache is consulted. Otherwise the view only runs the
+    first time the path and query is asked for with that data.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        key = (eonet_data.data_tag, datetime.now(timezone.utc).date().isoformat(), request.path,
+               normalized_query(request.args))
+        etag = data_etag(*key)
+        if request.if_none_match.contains_weak(etag):
+            response = Response(status=304)
+        else:
+            try:
+                body = response_cache.get_or_compute(key, lambda: encode_view(view, args, kwargs))
+            except UncachedResponse as e:
+                return e.response
+            encoding = choose_encoding(request.accept_encodings, len(body.body))
+            response = Response(body.encoded(encoding), content_type=body.content_type)
+            if encoding != 'identity':
+                response.headers['Content-Encoding'] = encoding
+        response.set_etag(etag)
+        response.vary.add('Accept-Encoding')
+        # Clients may store the body but must revalidate, which is a 304 until the data changes
+        response.cache_control.public = True
+        response.cache_control.no_cache = True
+        return response
+    return wrapper
 
 @app.route('/')
 def main():
@@ -511,28 +1034,97 @@ def main():
 @app.route('/dashboard')
 def index():
     """Main dashboard route"""
-    events = eonet_data.get_filtered_events()
-    map_html = eonet_data.create_map(events)
-    return render_template('index.html', map_html=map_html)
+    # The map is drawn client-side from /api/map/features
+    return render_template('index.html')
 
 @app.route('/trends')
 def trends():
     """Trends analysis route"""
     return render_template('trends.html')
 
+# Parameters that switch /api/events to the streamed, pageable response
+STREAM_PARAMS = ('fields', 'limit', 'cursor', 'format')
+
 @app.route('/api/events')
 def get_events():
-    """API endpoint for events"""
+    """API endpoint for events
+
+    Plain requests get the whole result as one cached document. With fields=,
+    limit=, cursor= or format=ndjson, or a start_date reaching into the
+    archive, the result is streamed in chunks instead.
+    """
+    if (any(request.args.get(name) for name in STREAM_PARAMS)
+            or eonet_data.uses_archive(request.args.get('start_date'))):
+        return stream_events()
+    return get_all_events()
+
+def event_filters(args=None):
+    """Filter parameters shared by the /api/events modes, ValueError when malformed"""
+    args = request.args if args is None else args
     params = {
-        'start_date': request.args.get('start_date'),
-        'end_date': request.args.get('end_date'),
-        'event_type': request.args.get('event_type'),
-        'min_magnitude': request.args.get('min_magnitude'),
-        'max_magnitude': request.args.get('max_magnitude')
+        'start_date': args.get('start_date'),
+        'end_date': args.get('end_date'),
+        'event_type': args.get('event_type'),
+        'min_magnitude': args.get('min_magnitude'),
+        'max_magnitude': args.get('max_magnitude'),
+        'country': parse_countries(args.get('country'))
     }
+    params.update(spatial_params(args))
+    return params
+
+@conditional
+def get_all_events():
+    try:
+        params = event_filters()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     return jsonify(eonet_data.get_filtered_events(**params))
 
+def stream_events():
+    """Stream events as a JSON document or NDJSON, optionally projected and paged
+
+    Pages (limit= or cursor=) are ordered newest first by first geometry date
+    and id; the cursor names the last event returned, so it stays valid when
+    the data is refreshed between pages.
+    """
+    try:
+        params = event_filters()
+        fields = parse_fields(request.args.get('fields'))
+        limit = parse_limit(request.args.get('limit'))
+        after = decode_cursor(request.args.get('cursor'))
+        output = request.args.get('format') or 'json'
+        if output not in ('json', 'ndjson'):
+            raise ValueError('format must be json or ndjson')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    parts, next_key = eonet_data.page_events(limit, after, **params)
+    next_cursor = encode_cursor(next_key) if next_key is not None else None
+
+    if output == 'ndjson':
+        response = Response(stream_ndjson(parts, fields), mimetype='application/x-ndjson')
+    else:
+        response = Response(stream_json(parts, fields, next_cursor), mimetype='application/json')
+    if next_cursor is not None:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
+
+def spatial_params(args=None):
+    """Parse bbox= and near=lat,lon&radius_km= query parameters"""
+    args = request.args if args is None else args
+    params = {'bbox': parse_bbox(args.get('bbox'))}
+    near = parse_point(args.get('near'))
+    if near is not None:
+        if not args.get('radius_km'):
+            raise ValueError('radius_km is required with near')
+        radius_km = float(args['radius_km'])
+        if radius_km < 0:
+            raise ValueError('radius_km must not be negative')
+        params.update(near=near, radius_km=radius_km)
+    return params
+
 @app.route('/api/map')
+@conditional
 def get_map():
     """API endpoint for map"""
     params = {
@@ -542,25 +1134,142 @@ def get_map():
         'min_magnitude': request.args.get('min_magnitude'),
         'max_magnitude': request.args.get('max_magnitude')
     }
-    events = eonet_data.get_filtered_events(**params)
-    return eonet_data.create_map(events)
+    try:
+        return eonet_data.get_map_html(**params)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/api/map/features')
+@conditional
+def get_map_features():
+    """API endpoint for map features as GeoJSON, clustered at low zoom"""
+    try:
+        bbox = parse_bbox(request.args.get('bbox'))
+        zoom = int(request.args.get('zoom', 3))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    params = {
+        'start_date': request.args.get('start_date'),
+        'end_date': request.args.get('end_date'),
+        'event_type': request.args.get('event_type'),
+        'min_magnitude': request.args.get('min_magnitude'),
+        'max_magnitude': request.args.get('max_magnitude')
+    }
+    return jsonify(eonet_data.get_map_features(bbox=bbox, zoom=zoom, **params))
+
+@app.route('/api/events/<event_id>')
+@conditional
+def get_event(event_id):
+    """API endpoint for a single event, used for lazy map popups"""
+    event = eonet_data.get_event(event_id)
+    if event is None:
+        return jsonify({'error': 'event not found'}), 404
+    return jsonify(event)
+
+def track_zoom():
+    """Optional zoom= of the track routes, None for full tracks"""
+    zoom = request.args.get('zoom')
+    return int(zoom) if zoom else None
+
+@app.route('/api/events/<event_id>/track')
+@conditional
+def get_event_track(event_id):
+    """API endpoint for the full path of one event, simplified for zoom="""
+    try:
+        zoom = track_zoom()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    track = eonet_data.get_track(event_id, zoom)
+    if track is None:
+        return jsonify({'error': 'event not found'}), 404
+    return jsonify(track)
+
+@app.route('/api/tracks')
+@conditional
+def get_tracks():
+    """API endpoint for the paths of the filtered events passing through bbox="""
+    try:
+        bbox = parse_bbox(request.args.get('bbox'))
+        zoom = track_zoom()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if bbox is None:
+        return jsonify({'error': 'bbox is required'}), 400
+    params = {
+        'start_date': request.args.get('start_date'),
+        'end_date': request.args.get('end_date'),
+        'event_type': request.args.get('event_type'),
+        'min_magnitude': request.args.get('min_magnitude'),
+        'max_magnitude': request.args.get('max_magnitude')
+    }
+    return jsonify(eonet_data.get_tracks(bbox, zoom, **params))
+
+@app.route('/api/stream')
+def get_stream():
+    """Server-Sent Events with the changes of every refresh, for one or more category= ids
+
+    Resumes after Last-Event-ID. Worker processes have no refreshes of
+    their own, the fetcher's StreamHub serves them (EONET_STREAM_PORT).
+    """
+    if eonet_data.role == 'worker':
+        return jsonify({'error': 'the event stream is served by the fetcher'}), 503
+    categories = parse_categories(request.args.getlist('category'))
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('lastEventId')
+    return Response(eonet_data.delta_log.stream(last_event_id, categories),
+                    mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 @app.route('/api/summary')
+@conditional
 def get_summary():
     """API endpoint for summary statistics"""
     return jsonify(eonet_data.get_summary_statistics())
 
+@app.route('/api/status')
+def get_status():
+    """API endpoint for data freshness"""
+    last_update = eonet_data.last_update
+    return jsonify({
+        'initialized': eonet_data.initialized,
+        'data_version': eonet_data.data_version,
+        'snapshot_age': eonet_data.snapshot_age(),
+        'last_update': last_update.isoformat() if last_update else None,
+        'event_count': len(eonet_data.events_index),
+        'refreshing': eonet_data.refresher.is_running(),
+        'last_ingest': eonet_data.last_ingest,
+        'cache': eonet_data.result_cache.stats(),
+        'response_cache': response_cache.stats()
+    })
+
+@app.route('/metrics')
+def get_metrics():
+    """Prometheus metrics in the text exposition format"""
+    return Response(metrics.render(), content_type=Registry.CONTENT_TYPE)
+
 @app.route('/api/categories')
+@conditional
 def get_categories():
     """API endpoint for categories"""
     return jsonify(eonet_data.categories_cache or {'categories': []})
 
 @app.route('/api/trends')
+@conditional
 def get_trends():
-    """API endpoint for trend analysis"""
-    category = request.args.get('category')
-    period = request.args.get('period', 'monthly')
-    return jsonify(eonet_data.get_trend_analysis(category, period))
+    """API endpoint for trend analysis of one or more comma separated categories"""
+    try:
+        category = parse_categories(request.args.getlist('category'))
+        period = parse_period(request.args.get('period'))
+        window = int(request.args.get('window') or 0) or None
+        if window is not None and window < 1:
+            raise ValueError('window must be positive')
+        threshold = float(request.args.get('z') or ANOMALY_Z)
+        dates = {name: request.args.get(name) or None for name in ('start_date', 'end_date')}
+        for name, value in dates.items():
+            if value is not None and epoch_day(value) is None:
+                raise ValueError(f"{name} must be YYYY-MM-DD")
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(eonet_data.get_trend_analysis(category, period, window, threshold, **dates))
 
 
 # Add these new routes to your existing Flask app
@@ -569,12 +1278,92 @@ def analysis():
     """Analysis dashboard route"""
     return render_template('analysis.html')
 
+def analysis_period():
+    """Days back of period=, 365 when missing, ValueError when malformed"""
+    period = int(request.args.get('period') or 365)
+    if period < 1:
+        raise ValueError('period must be a positive number of days')
+    return period
+
 @app.route('/api/analysis/data')
+@conditional
 def get_analysis_data():
-    """Get all analysis data"""
-    period = request.args.get('period',365)
-    data = eonet_data.get_analysis_data(period=int(period))
+    """Get all analysis data, or only the comma separated include= facets"""
+    try:
+        period = analysis_period()
+        include = None
+        if request.args.get('include'):
+            include = tuple(part.strip() for part in request.args['include'].split(',') if part.strip())
+            unknown = set(include) - set(ANALYSIS_FACETS + ('events',))
+            if unknown:
+                raise ValueError(f"unknown include: {', '.join(sorted(unknown))}")
+        data = eonet_data.get_analysis_data(period=period, include=include)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     return jsonify(data)
 
+@app.route(f"/api/analysis/<any({', '.join(ANALYSIS_FACETS)}):facet>")
+@conditional
+def get_analysis_facet(facet):
+    """One analysis facet, as found under its name in /api/analysis/data"""
+    try:
+        period = analysis_period()
+        points = int(request.args.get('points') or SEVERITY_POINTS)
+        if points < 2:
+            raise ValueError('points must be at least 2')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(eonet_data.get_analysis_facet(facet, period, request.args.get('region'), points))
+
+def export_params():
+    """(format, category ids, filters) of an export request, ValueError when malformed
+
+    The /api/events filters come from the query string or a JSON body of
+    {"format": ..., "filters": {...}}. The analysis page's "type",
+    "timePeriod" (days back) and "categories" are accepted as well, and
+    event_type, category and categories all add to one set of categories.
+    """
+    values = dict(request.args.items())
+    body = request.get_json(silent=True) if request.method == 'POST' else None
+    if isinstance(body, dict):
+        filters = body.get('filters') or {}
+        if not isinstance(filters, dict):
+            raise ValueError('filters must be an object')
+        values.update((name, value) for name, value in body.items() if name != 'filters')
+        values.update(filters)
+    for name in ('bbox', 'near'):
+        if isinstance(values.get(name), (list, tuple)):
+            values[name] = ','.join(str(part) for part in values[name])
+
+    output = parse_format(values.get('format') or values.get('type'))
+    filters = event_filters(values)
+    if values.get('timePeriod') and not filters['start_date']:
+        start = datetime.now(timezone.utc) - timedelta(days=int(values['timePeriod']))
+        filters['start_date'] = start.strftime('%Y-%m-%d')
+    categories = values.get('categories') or []
+    if isinstance(categories, str):
+        categories = [categories]
+    categories = parse_categories([filters.pop('event_type'), values.get('category')] + list(categories))
+    return output, categories, filters
+
+@app.route('/api/analysis/export', methods=['GET', 'POST'])
+def export_analysis():
+    """Stream the filtered events as CSV, NDJSON, GeoJSON or Parquet, one row per geometry point
+
+    Text formats are gzipped on the fly for clients that accept it.
+    """
+    try:
+        output, categories, filters = export_params()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    chunks = export_events(eonet_data.iter_events(categories, **filters), output)
+    headers = {'Content-Disposition': f'attachment; filename="eonet-events.{output}"',
+               'Vary': 'Accept-Encoding'}
+    if output != 'parquet' and request.accept_encodings.quality('gzip') > 0:
+        chunks = gzip_stream(chunks)
+        headers['Content-Encoding'] = 'gzip'
+    return Response(chunks, content_type=MEDIA_TYPES[output], headers=headers)
+
 if __name__ == '__main__':
     app.run(debug=True)
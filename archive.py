@@ -0,0 +1,346 @@
+import json
+import os
+import pickle
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from event_index import EventIndex, parse_day
+from rollup import Rollup
+from shared_snapshot import encode_event
+
+# Events a filtered_events answer may hold, longer histories are paged or streamed
+MAX_EVENTS = 50_000
+
+
+def first_day(event):
+    """Day number of an event's first geometry date, or None"""
+    try:
+        day = parse_day(event['geometry'][0]['date'])
+    except (KeyError, IndexError, TypeError):
+        return None
+    return None if day is None else int(day.astype(np.int64))
+
+
+def event_key(event):
+    """Id an event is archived under"""
+    return str(event.get('id') or '')
+
+
+def partition_key(day):
+    """YYYY-MM partition of a day number"""
+    return str(np.datetime64(day, 'D').astype('datetime64[M]'))
+
+
+class EventArchive:
+    """Every event ever fetched, one compact file per month of first geometry date
+
+    A partition is an .npz of columns (ids, category ids, first days) and the
+    events as one JSON blob with offsets, next to a pickled, summarized
+    Rollup of its events. MANIFEST lists the partitions with their day span and event
+    count, so queries open only the partitions overlapping their range, and
+    aggregates load only the rollups. Refreshes upsert changed events by id
+    into their partition; events evicted from the in-memory window stay.
+    Undated events are not archived, no date-ranged query could match them.
+
+    Partition files are written under a new generation name and MANIFEST is
+    replaced atomically, so readers in other processes see whole partitions.
+    MANIFEST is parsed again only when the file is replaced. The month of
+    every archived id is read off the partitions' id columns once, then
+    again only for the partitions a write replaced, so an event whose first
+    date moves to another month leaves its old partition.
+    Rollups pickled by an older Rollup.VERSION are rebuilt from the events on load.
+    """
+
+    FORMAT = 1
+    MANIFEST = 'MANIFEST'
+
+    def __init__(self, root):
+        self.root = root
+        self._manifest = (None, {})  # (MANIFEST stat, parsed partitions)
+        self._partition_ids = {}     # month -> (partition file, ids) read into _id_months
+        self._id_months = {}         # id -> month of the archived events
+        self._write_lock = threading.Lock()
+
+    def manifest(self):
+        """{month: {'file', 'events', 'first_day', 'last_day'}} of the stored partitions"""
+        try:
+            stat = os.stat(os.path.join(self.root, self.MANIFEST))
+        except OSError:
+            return {}
+        key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        cached_key, partitions = self._manifest
+        if key != cached_key:
+            partitions = self._read_manifest().get('partitions', {})
+            self._manifest = (key, partitions)
+        return partitions
+
+    def _read_manifest(self):
+        try:
+            with open(os.path.join(self.root, self.MANIFEST)) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return manifest if manifest.get('format') == self.FORMAT else {}
+
+    def _months(self, partitions):
+        """{id: month} of the archived events, reading the ids of the partitions not read yet"""
+        for month, (name, ids) in list(self._partition_ids.items()):
+            if partitions.get(month, {}).get('file') != name:
+                for key in ids:
+                    if self._id_months.get(key) == month:
+                        del self._id_months[key]
+                del self._partition_ids[month]
+        for month, partition in sorted(partitions.items()):
+            if month not in self._partition_ids:
+                with self._open(partition) as data:
+                    ids = data['ids'].tolist()
+                self._partition_ids[month] = (partition['file'], ids)
+                self._id_months.update(dict.fromkeys(ids, month))
+        return self._id_months
+
+    def __len__(self):
+        return sum(partition['events'] for partition in self.manifest().values())
+
+    def first_day(self):
+        """Earliest first-geometry day archived, or None when empty"""
+        days = [partition['first_day'] for partition in self.manifest().values()]
+        return min(days) if days else None
+
+    def partitions(self, start_day=None, end_day=None):
+        """Partition entries overlapping [start_day, end_day], newest month first"""
+        selected = []
+        for month, partition in sorted(self.manifest().items(), reverse=True):
+            if start_day is not None and partition['last_day'] < start_day:
+                continue
+            if end_day is not None and partition['first_day'] > end_day:
+                continue
+            selected.append(dict(partition, month=month))
+        return selected
+
+    def append(self, events):
+        """Upsert events into their month partitions, returning the number archived
+
+        An event already archived under another month is dropped from it.
+        """
+        by_month = {}
+        for event in events:
+            day = first_day(event)
+            if day is not None:
+                by_month.setdefault(partition_key(day), []).append(event)
+        if not by_month:
+            return 0
+
+        os.makedirs(self.root, exist_ok=True)
+        with self._write_lock:
+            partitions = self.manifest()
+            months = self._months(partitions)
+            dropped = {}
+            for month, incoming in by_month.items():
+                for event in incoming:
+                    key = event_key(event)
+                    if months.get(key, month) != month:
+                        dropped.setdefault(months[key], set()).add(key)
+            self._rewrite(partitions, by_month, dropped)
+        return sum(len(incoming) for incoming in by_month.values())
+
+    def remove(self, ids):
+        """Drop events from the archive by id, e.g. ones deleted upstream, returning the number removed"""
+        with self._write_lock:
+            partitions = self.manifest()
+            if not partitions:
+                return 0
+            months = self._months(partitions)
+            dropped = {}
+            for key in {str(event_id or '') for event_id in ids}:
+                if key in months:
+                    dropped.setdefault(months[key], set()).add(key)
+            if dropped:
+                self._rewrite(partitions, {}, dropped)
+        return sum(len(keys) for keys in dropped.values())
+
+    def _rewrite(self, partitions, by_month, dropped):
+        """Write the partitions gaining the by_month events or losing the dropped ids, then MANIFEST"""
+        partitions = dict(partitions)
+        replaced = []
+        for month in set(by_month) | set(dropped):
+            stored = self._load_events(partitions[month]) if month in partitions else []
+            merged = {event_key(event): event for event in stored}
+            for key in dropped.get(month, ()):
+                merged.pop(key, None)
+            merged.update((event_key(event), event) for event in by_month.get(month, ()))
+            if month in partitions:
+                replaced.append(partitions.pop(month)['file'])
+            if merged:
+                partitions[month] = self._write_partition(month, list(merged.values()))
+
+        self._write_manifest(partitions)
+        self._months(self.manifest())
+        # Readers holding the previous MANIFEST may still open the old files
+        # for a moment; they are removed on the next write of the partition
+        for name in replaced:
+            self._remove_older(name)
+
+    def _write_partition(self, month, events):
+        """Write one partition's files, newest first, returning its manifest entry"""
+        days = np.array([first_day(event) for event in events], dtype=np.int64)
+        order = np.argsort(-days, kind='stable')
+        events = [events[row] for row in order]
+        days = days[order]
+
+        blobs = [encode_event(event) for event in events]
+        offsets = np.zeros(len(blobs) + 1, dtype=np.int64)
+        np.cumsum([len(blob) for blob in blobs], out=offsets[1:])
+        category_ids = [((event.get('categories') or [{}])[0] or {}).get('id') or '' for event in events]
+
+        name = f"{month}.{time.time_ns():x}"
+        self._atomic_write(f"{name}.npz", lambda f: np.savez_compressed(
+            f, ids=np.array([event_key(event) for event in events], dtype=str),
+            category_ids=np.array(category_ids, dtype=str), days=days, offsets=offsets,
+            blob=np.frombuffer(b''.join(blobs), dtype=np.uint8)))
+        self._atomic_write(f"{name}.rollup", lambda f: pickle.dump(
+            Rollup(events).summarized(), f, protocol=pickle.HIGHEST_PROTOCOL))
+        return {'file': name, 'events': len(events),
+                'first_day': int(days.min()), 'last_day': int(days.max())}
+
+    def _atomic_write(self, name, write):
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                write(f)
+            os.replace(tmp_path, os.path.join(self.root, name))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def _write_manifest(self, partitions):
+        data = json.dumps({'format': self.FORMAT, 'partitions': partitions}, sort_keys=True).encode()
+        self._atomic_write(self.MANIFEST, lambda f: f.write(data))
+        self._manifest = (None, {})
+
+    def _remove_older(self, name):
+        """Delete the generations of a partition older than name"""
+        month = name.split('.')[0]
+        for entry in os.scandir(self.root):
+            generation = entry.name.rsplit('.', 1)[0]
+            if entry.name.startswith(month + '.') and generation < name:
+                os.unlink(entry.path)
+
+    def _open(self, partition):
+        return np.load(os.path.join(self.root, partition['file'] + '.npz'))
+
+    def _load_events(self, partition, rows=None):
+        with self._open(partition) as data:
+            blob, offsets = data['blob'].tobytes(), data['offsets']
+        rows = range(len(offsets) - 1) if rows is None else rows
+        return [json.loads(blob[offsets[row]:offsets[row + 1]]) for row in rows]
+
+    def rollup(self, start_day=None, end_day=None):
+        """Rollup of the archived events first dated in [start_day, end_day]
+
+        Partition rollups are loaded one at a time as they are combined, so
+        memory holds buckets rather than events however many years are asked for.
+        """
+        return Rollup.combine((self._load_rollup(partition)
+                               for partition in self.partitions(start_day, end_day)),
+                              start_day, end_day)
+
+    def _load_rollup(self, partition):
+        name = partition['file'] + '.rollup'
+        with open(os.path.join(self.root, name), 'rb') as f:
+            rollup = pickle.load(f)
+        if getattr(rollup, 'version', 1) != Rollup.VERSION:
+            rollup = Rollup(self._load_events(partition)).summarized()
+            self._atomic_write(name, lambda f: pickle.dump(rollup, f, protocol=pickle.HIGHEST_PROTOCOL))
+        return rollup
+
+    def filtered_events(self, start_date=None, end_date=None, event_type=None,
+                        min_magnitude=None, max_magnitude=None, bbox=None, near=None,
+                        radius_km=None, country=None, max_events=MAX_EVENTS):
+        """Archived events matching the same filters as EventIndex.filter_rows, newest first
+
+        Raises ValueError when more than max_events match, ranges that large
+        are read with page or iter_filtered instead.
+        """
+        found = []
+        for events in self.iter_filtered(start_date=start_date, end_date=end_date,
+                                         event_type=event_type, min_magnitude=min_magnitude,
+                                         max_magnitude=max_magnitude, bbox=bbox, near=near,
+                                         radius_km=radius_km, country=country):
+            found.extend(events)
+            if len(found) > max_events:
+                raise ValueError(f"more than {max_events} archived events match, "
+                                 f"page them with limit= and cursor=")
+        return found
+
+    def page(self, limit=None, after=None, **filters):
+        """(events, key) of one page of the filtered events, newest first by (first day, id)
+
+        Pages are ordered and keyed like EventIndex.page: after is the
+        (day number, id) key of the last event already returned, and key is
+        that of the page's last event when more follow, otherwise None.
+        Partitions are read newest first, one at a time, and no further than
+        the page needs, so memory holds one partition and the page.
+        """
+        if after is not None:
+            # Partitions after the cursor's day cannot hold the page
+            end_day = self._day(filters.get('end_date'))
+            if end_day is None or after[0] < end_day:
+                filters['end_date'] = str(np.datetime64(after[0], 'D'))
+        page = []
+        for events in self.iter_filtered(**filters):
+            keyed = [((first_day(event), event_key(event)), event) for event in events]
+            keyed.sort(key=lambda pair: pair[0], reverse=True)
+            page.extend(event for key, event in keyed if after is None or key < after)
+            if limit is not None and len(page) > limit:
+                page = page[:limit]
+                last = page[-1]
+                return page, (first_day(last), event_key(last))
+        return page, None
+
+    def iter_filtered(self, start_date=None, end_date=None, event_type=None,
+                      min_magnitude=None, max_magnitude=None, bbox=None, near=None,
+                      radius_km=None, country=None):
+        """Yield the matching events of one partition at a time, newest partition first
+
+        event_type is one category id or a tuple of them. Partitions outside
+        the date range are never opened; inside one, only the rows whose
+        first day and category match are decoded, and indexed only when
+        magnitude, spatial or country filters remain.
+        """
+        start_day, end_day = self._day(start_date), self._day(end_date)
+        if isinstance(event_type, str):
+            event_type = (event_type,)
+        # The date and category columns are exact; the rest needs an index
+        refine = any(value not in (None, '', ()) for value in
+                     (min_magnitude, max_magnitude, bbox, near, country))
+        for partition in self.partitions(start_day, end_day):
+            # Only the small columns are read until some row can match
+            with self._open(partition) as data:
+                days = data['days']
+                candidates = np.ones(len(days), dtype=bool)
+                if start_day is not None:
+                    candidates &= days >= start_day
+                if end_day is not None:
+                    candidates &= days <= end_day
+                if event_type:
+                    candidates &= np.isin(data['category_ids'], event_type)
+            rows = np.flatnonzero(candidates)
+            if not len(rows):
+                continue
+            events = self._load_events(partition, rows)
+            if refine:
+                index = EventIndex(events)
+                rows = index.filter_rows(min_magnitude=min_magnitude, max_magnitude=max_magnitude,
+                                         bbox=bbox, near=near, radius_km=radius_km,
+                                         country=country)
+                events = [events[row] for row in rows.tolist()]
+            if events:
+                yield events
+
+    @staticmethod
+    def _day(value):
+        day = parse_day(value) if value else None
+        return None if day is None else int(day.astype(np.int64))
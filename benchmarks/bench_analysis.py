@@ -0,0 +1,75 @@
+"""Analysis payload sizes and cold latencies, the monolithic payload versus facets
+
+    python -m benchmarks.bench_analysis --events 10000 100000 --period 365
+"""
+import argparse
+import gzip
+import json
+import os
+import statistics
+import time
+
+os.environ.setdefault('EONET_OFFLINE', '1')
+os.environ.setdefault('EONET_SNAPSHOT', '')
+os.environ.setdefault('EONET_ARCHIVE', '')
+os.environ.setdefault('EONET_LOG_LEVEL', 'WARNING')
+
+from app import ANALYSIS_FACETS, app, eonet_data, response_cache  # noqa: E402
+from rollup import epoch_day  # noqa: E402
+from synthetic import generate_categories, generate_events  # noqa: E402
+
+# What the analysis page asks for
+PAGE_INCLUDE = 'trends,categories,geographic,severity_levels,weekday'
+
+
+def cold(fetch, repeat):
+    """(body bytes, median ms) of fetch with every cache emptied before each call"""
+    timings = []
+    for _ in range(repeat):
+        eonet_data.result_cache.clear()
+        response_cache.clear()
+        started = time.perf_counter()
+        body = fetch()
+        timings.append((time.perf_counter() - started) * 1000)
+    return body, statistics.median(timings)
+
+
+def monolithic(period):
+    """The payload /api/analysis/data sent before facets: every severity point and the raw events"""
+    _, start_date = eonet_data.analysis_rollup(period)
+    rollup = eonet_data.snapshot.rollup
+    data = {facet: getattr(rollup, f"analysis_{facet}")(epoch_day(start_date)) for facet in ANALYSIS_FACETS}
+    data['events'] = eonet_data.get_filtered_events(start_date=start_date)
+    return json.dumps(data).encode()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--events', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--period', type=int, default=365)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    client = app.test_client()
+    get = lambda url: client.get(url, headers={'Accept-Encoding': 'identity'}).data
+    for count in args.events:
+        eonet_data.publish(events=generate_events(count, seed=1), categories=generate_categories(),
+                           fetched_at=time.time())
+        period = args.period
+        cases = [('monolithic, as before', lambda: monolithic(period)),
+                 ('data, every facet and events', lambda: get(f"/api/analysis/data?period={period}")),
+                 ('data, include= of the page',
+                  lambda: get(f"/api/analysis/data?period={period}&include={PAGE_INCLUDE}"))]
+        cases += [(f"/api/analysis/{facet}", lambda facet=facet: get(f"/api/analysis/{facet}?period={period}"))
+                  for facet in ANALYSIS_FACETS]
+
+        print(f"events: {count}, period {period} days")
+        print(f"  {'payload':<32}{'KB':>10}{'gzip KB':>10}{'cold ms':>10}")
+        for name, fetch in cases:
+            body, elapsed = cold(fetch, args.repeat)
+            print(f"  {name:<32}{len(body) / 1e3:>10.1f}{len(gzip.compress(body, 6)) / 1e3:>10.1f}"
+                  f"{elapsed:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
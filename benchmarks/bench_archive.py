@@ -0,0 +1,87 @@
+"""Multi-year queries from the partitioned archive, time and peak memory per query
+
+    python -m benchmarks.bench_archive --events 50000 --years 10
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+os.environ.setdefault('EONET_OFFLINE', '1')
+os.environ.setdefault('EONET_SNAPSHOT', '')
+os.environ.setdefault('EONET_ARCHIVE', '')
+os.environ.setdefault('EONET_LOG_LEVEL', 'WARNING')
+
+from app import eonet_data  # noqa: E402
+from archive import EventArchive  # noqa: E402
+from event_index import EventIndex  # noqa: E402
+from rollup import Rollup  # noqa: E402
+from synthetic import generate_categories, generate_events  # noqa: E402
+
+
+def measure(function):
+    """(result, seconds, peak traced MB), timed on an untraced first call"""
+    started = time.perf_counter()
+    result = function()
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--events', type=int, default=50000)
+    parser.add_argument('--years', type=int, default=10)
+    args = parser.parse_args()
+
+    events = generate_events(args.events, seed=1, days=args.years * 365)['events']
+    today = datetime.now(timezone.utc)
+    day = lambda n: (today - timedelta(days=n)).strftime('%Y-%m-%d')
+    recent = [e for e in events if e['geometry'][0]['date'][:10] >= day(365)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        archive = EventArchive(tmp)
+        started = time.perf_counter()
+        archive.append(events)
+        elapsed = time.perf_counter() - started
+        size = sum(entry.stat().st_size for entry in os.scandir(tmp))
+        print(f"events: {args.events} over {args.years} years, {len(archive.manifest())} partitions, "
+              f"{size / 1e6:.1f} MB on disk, archived in {elapsed:.1f}s")
+
+        # What serving the whole history from memory would hold instead
+        _, _, held = measure(lambda: (EventIndex(events), Rollup(events)))
+        print(f"  index and rollup of every event in memory: {held:.0f} MB")
+
+        eonet_data.archive = archive
+        eonet_data.sync_days = 365
+        eonet_data.result_cache = None
+        eonet_data.publish(events={'events': recent}, categories=generate_categories(),
+                           fetched_at=time.time())
+        history = args.years * 365
+        queries = [
+            ('analysis, every year', lambda: eonet_data.get_analysis_data(period=history)),
+            ('trends weekly, every year',
+             lambda: eonet_data.get_trend_analysis(None, 'weekly', start_date=day(history))),
+            ('trends monthly, 2 categories',
+             lambda: eonet_data.get_trend_analysis('wildfires,severeStorms', 'monthly',
+                                                   start_date=day(history))),
+            ('events, one month 5 years ago',
+             lambda: eonet_data.get_filtered_events(start_date=day(5 * 365 + 30), end_date=day(5 * 365))),
+            ('events, one category 3 years',
+             lambda: eonet_data.get_filtered_events(start_date=day(3 * 365), event_type='volcanoes')),
+        ]
+        print(f"  {'query':<32}{'ms':>8}{'peak MB':>9}{'events':>8}")
+        for name, query in queries:
+            result, elapsed, peak = measure(query)
+            found = result['events']['events'] if 'weekday' in result else result.get('events')
+            print(f"  {name:<32}{elapsed * 1000:>8.0f}{peak:>9.1f}"
+                  f"{'-' if found is None else len(found):>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""Country lookups of a synthetic year of tracks, points per second
+
+    python -m benchmarks.bench_countries --events 50000 --max-points 24
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+
+os.environ.setdefault('EONET_LOG_LEVEL', 'WARNING')
+
+from countries import CountryLookup  # noqa: E402
+from event_index import EventIndex, geometry_point  # noqa: E402
+from rollup import Rollup  # noqa: E402
+from synthetic import generate_events  # noqa: E402
+
+
+def python_lookup(lookup):
+    """Per-point lookup in plain Python over every ring's box and edges, the approach replaced"""
+    rings = []
+    for ring in range(len(lookup.boxes)):
+        edges = slice(lookup.ring_starts[ring], lookup.ring_starts[ring + 1])
+        rings.append((int(lookup.ring_countries[ring]), lookup.boxes[ring].tolist(),
+                      list(zip(lookup.x0[edges].tolist(), lookup.y0[edges].tolist(),
+                               lookup.y1[edges].tolist(), lookup.slopes[edges].tolist()))))
+
+    def locate(lon, lat):
+        parity = {}
+        for country, (west, south, east, north), edges in rings:
+            if west <= lon <= east and south <= lat <= north:
+                inside = False
+                for x0, y0, y1, slope in edges:
+                    if (y0 > lat) != (y1 > lat) and lon < x0 + (lat - y0) * slope:
+                        inside = not inside
+                parity[country] = parity.get(country, False) ^ inside
+        return next((country for country, inside in parity.items() if inside), -1)
+    return locate
+
+
+def rate(count, function, repeat=3):
+    """(points per second, result) of the fastest of repeat calls"""
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - started)
+    return count / best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--events', type=int, default=50000)
+    parser.add_argument('--max-points', type=int, default=24)
+    parser.add_argument('--sample', type=int, default=5000,
+                        help='points looked up by the plain Python loop')
+    args = parser.parse_args()
+
+    events = generate_events(args.events, seed=1, days=365, max_points=args.max_points)['events']
+    points = [geometry_point(geo) for event in events for geo in event['geometry']]
+    lons, lats = (np.array(values) for values in zip(*points))
+    lookup = CountryLookup.load()
+    print(f"{len(events)} events, {len(lons)} points over a year; {len(lookup)} countries, "
+          f"{len(lookup.boxes)} rings, {len(lookup.x0)} edges")
+
+    def cold():
+        lookup._cache = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int16))
+        return lookup.countries(lons, lats)
+
+    sample = min(args.sample, len(lons))
+    locate = python_lookup(lookup)
+    python_rate, expected = rate(sample, lambda: [locate(lon, lat) for lon, lat in
+                                                  zip(lons[:sample].tolist(), lats[:sample].tolist())], 1)
+    cold_rate, codes = rate(len(lons), cold)
+    warm_rate, _ = rate(len(lons), lambda: lookup.countries(lons, lats))
+    assert expected == lookup.locate(lons[:sample], lats[:sample]).tolist()
+
+    print(f"  {'lookup':<36}{'points/s':>12}")
+    print(f"  {'plain Python, one point at a time':<36}{python_rate:>12,.0f}")
+    print(f"  {'vectorized, empty cache':<36}{cold_rate:>12,.0f}")
+    print(f"  {'vectorized, cached':<36}{warm_rate:>12,.0f}")
+    print(f"  {len(np.unique(lookup._keys(lons, lats)))} distinct rounded points, "
+          f"{(codes >= 0).mean():.0%} on land")
+
+    # The lookups of a refresh, from the process-wide lookup's empty cache
+    started = time.perf_counter()
+    EventIndex(events)
+    Rollup(events)
+    print(f"  index and rollup of every event: {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""Wall-clock time of a full EONETData ingest, one request versus sharded and concurrent
+
+    python -m benchmarks.bench_ingest --events 20000 --latency 0.3 --error-rate 0.1
+
+Upstream time grows with the size of the response (--per-event), which is
+what sharding wins back. The stub runs in this process, so its JSON encoding
+competes with the client for the GIL and the gain is understated.
+"""
+import argparse
+import os
+import statistics
+import time
+
+os.environ.setdefault('EONET_OFFLINE', '1')
+os.environ.setdefault('EONET_SNAPSHOT', '')
+os.environ.setdefault('EONET_ARCHIVE', '')
+
+from app import EONETData  # noqa: E402
+from eonet_stub import EONETStub  # noqa: E402
+from synthetic import generate_categories, generate_events  # noqa: E402
+
+
+def time_ingest(stub, env, repeat):
+    """Run a full fetch_events under env, returning wall-clock times and the last ingest"""
+    saved = {key: os.environ.get(key) for key in env}
+    os.environ.update(env, EONET_API=stub.url, EONET_OFFLINE='0', EONET_SNAPSHOT='')
+    try:
+        data = EONETData()
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            assert data.fetch_events(incremental=False)
+            timings.append(time.perf_counter() - started)
+        return timings, data.last_ingest
+    finally:
+        for key, value in saved.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--events', type=int, default=10000)
+    parser.add_argument('--latency', type=float, default=0.25,
+                        help='seconds of simulated upstream latency per request')
+    parser.add_argument('--per-event', type=float, default=2e-4,
+                        help='extra seconds of upstream latency per event returned')
+    parser.add_argument('--error-rate', type=float, default=0.05,
+                        help='share of upstream requests failing with 503')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--shard-days', type=int, default=30)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    payload = generate_events(args.events, seed=1)
+    variants = (('single request', {'EONET_SHARD_DAYS': '366', 'EONET_FETCH_WORKERS': '1'}),
+                ('sharded', {'EONET_SHARD_DAYS': str(args.shard_days),
+                             'EONET_FETCH_WORKERS': str(args.workers)}))
+
+    print(f"events: {args.events}, upstream latency: {args.latency * 1000:.0f} ms "
+          f"+ {args.per_event * 1e6:.0f} us/event, error rate: {args.error_rate:.0%}")
+    for label, env in variants:
+        with EONETStub(payload['events'], generate_categories(), latency=args.latency,
+                       latency_per_event=args.per_event, error_rate=args.error_rate,
+                       seed=2) as stub:
+            timings, ingest = time_ingest(stub, env, args.repeat)
+            requests = sum(1 for path, _ in stub.requests if path.endswith('/events'))
+        print(f"  {label:<15} median {statistics.median(timings) * 1000:9.1f} ms"
+              f"   min {min(timings) * 1000:9.1f} ms   shards {ingest['shards']:3d}"
+              f"   requests {requests:4d}   events {ingest['events']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,269 @@
+"""Load test the Flask routes with a dashboard-like request mix against a local EONET stub
+
+    python -m benchmarks.bench_load --events 10000 --concurrency 8 --duration 30
+
+The stub serves synthetic events, the app runs in its own process with
+EONET_API pointed at the stub, and client threads replay the mix in ROUTES
+back to back. Halfway through (--refresh-at) the stub switches to a new
+event set and the app is told to refresh, so the report shows latency
+before, during and after ingest next to the server's CPU and RSS. The
+clients run on the same machine, so with few cores they compete with the
+server and the throughput is a lower bound.
+"""
+import argparse
+import os
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+import requests
+
+from eonet_stub import EONETStub
+from synthetic import CATEGORIES, PROFILES, generate_categories, generate_events
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CLOCK_TICKS = os.sysconf('SC_CLK_TCK')
+
+
+def _days_ago(days):
+    return (date.today() - timedelta(days=days)).isoformat()
+
+
+def _busy_category(rng):
+    return rng.choice([cid for cid in PROFILES])
+
+
+def _any_category(rng):
+    return rng.choice(CATEGORIES)[0]
+
+
+# (route, weight, path builder); the builders draw from a few values per
+# parameter so repeat requests hit the response cache about as often as the
+# dashboard's own do
+ROUTES = [
+    ('/dashboard', 5, lambda rng: '/dashboard'),
+    ('/api/map', 4, lambda rng: f"/api/map?event_type={_busy_category(rng)}"
+                                f"&start_date={_days_ago(rng.choice((7, 30)))}"),
+    ('/api/events', 8, lambda rng: f"/api/events?event_type={_any_category(rng)}"
+                                   f"&start_date={_days_ago(rng.choice((30, 90, 365)))}"),
+    ('/api/events?limit', 4, lambda rng: "/api/events?fields=id,date,category,magnitude&limit=100"
+                                         f"&event_type={_busy_category(rng)}"),
+    ('/api/summary', 10, lambda rng: '/api/summary'),
+    ('/api/trends', 6, lambda rng: f"/api/trends?period={rng.choice(('daily', 'weekly', 'monthly'))}"
+                                   f"&category={rng.choice(['', _busy_category(rng)])}"),
+    ('/api/analysis/data', 4, lambda rng: f"/api/analysis/data?period={rng.choice((30, 90, 365))}"),
+]
+
+
+def serve(full_refresh):
+    """App process: serve on a free port, refresh from the stub on SIGUSR1"""
+    from werkzeug.serving import make_server
+    from app import app, eonet_data
+
+    def refresh():
+        eonet_data.fetch_categories()
+        eonet_data.fetch_events(incremental=not full_refresh)
+
+    signal.signal(signal.SIGUSR1, lambda *_: threading.Thread(target=refresh, daemon=True).start())
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    print(server.port, flush=True)
+    server.serve_forever()
+
+
+def process_usage(pid):
+    """(CPU seconds, RSS MB) of a process so far"""
+    with open(f'/proc/{pid}/stat') as f:
+        fields = f.read().rpartition(')')[2].split()
+    cpu = (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+    with open(f'/proc/{pid}/statm') as f:
+        rss = int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1e6
+    return cpu, rss
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(q / 100 * len(ordered)) - 1))]
+
+
+class Driver:
+    """Closed-loop clients sending the weighted route mix until a deadline"""
+
+    def __init__(self, url, concurrency, think=0.0, seed=0):
+        self.url = url
+        self.concurrency = concurrency
+        self.think = think
+        self.seed = seed
+        self.samples = []  # (route, started, finished, ok) relative to the run start
+        self._lock = threading.Lock()
+
+    def run(self, duration, record=True):
+        start = time.perf_counter()
+        deadline = start + duration
+        names = [name for name, _, _ in ROUTES]
+        weights = [weight for _, weight, _ in ROUTES]
+        builders = {name: build for name, _, build in ROUTES}
+
+        def client(offset):
+            session = requests.Session()
+            rng = random.Random(self.seed * 1000 + offset)
+            while time.perf_counter() < deadline:
+                name = rng.choices(names, weights)[0]
+                started = time.perf_counter()
+                try:
+                    ok = session.get(self.url + builders[name](rng), timeout=120).status_code < 400
+                except requests.RequestException:
+                    ok = False
+                finished = time.perf_counter()
+                if record:
+                    with self._lock:
+                        self.samples.append((name, started - start, finished - start, ok))
+                if self.think:
+                    time.sleep(rng.expovariate(1 / self.think))
+
+        threads = [threading.Thread(target=client, args=(i,)) for i in range(self.concurrency)]
+        for thread in threads:
+            thread.start()
+        return start, threads
+
+
+def report(samples, duration, window, usage):
+    """Print per-route throughput, errors and latency, split around the refresh window"""
+    def during(sample):
+        return window is not None and sample[1] < window[1] and sample[2] > window[0]
+
+    print(f"  {'route':<22}{'req/s':>7}{'err %':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+          f"{'refresh p99':>13}{'n':>7}")
+    rows = [(name, [s for s in samples if s[0] == name]) for name, _, _ in ROUTES]
+    rows.append(('all', samples))
+    for name, group in rows:
+        if not group:
+            continue
+        latencies = [(s[2] - s[1]) * 1000 for s in group]
+        errors = sum(not s[3] for s in group)
+        spiked = [(s[2] - s[1]) * 1000 for s in group if during(s)]
+        print(f"  {name:<22}{len(group) / duration:>7.1f}{errors / len(group):>7.1%}"
+              f"{percentile(latencies, 50):>9.1f}{percentile(latencies, 95):>9.1f}"
+              f"{percentile(latencies, 99):>9.1f}"
+              f"{percentile(spiked, 99) if spiked else float('nan'):>13.1f}{len(group):>7}")
+
+    cpu = (usage[-1][1] - usage[0][1]) / (usage[-1][0] - usage[0][0])
+    rss = [sample[2] for sample in usage]
+    print(f"  server CPU {cpu:.0%} of one core, RSS mean {sum(rss) / len(rss):.0f} MB, "
+          f"peak {max(rss):.0f} MB")
+    if window is not None:
+        print(f"  refresh took {window[1] - window[0]:.2f}s from {window[0]:.1f}s into the run")
+        print(f"  {'phase':<22}{'req/s':>7}{'p50 ms':>9}{'p99 ms':>9}{'CPU':>7}{'RSS MB':>9}")
+        phases = (('before', 0, window[0]), ('during', window[0], window[1]),
+                  ('after', window[1], duration))
+        for label, begin, end in phases:
+            group = [(s[2] - s[1]) * 1000 for s in samples if begin <= s[2] < end]
+            points = [u for u in usage if begin <= u[0] <= end]
+            if not group or end <= begin:
+                continue
+            phase_cpu = ((points[-1][1] - points[0][1]) / (points[-1][0] - points[0][0])
+                         if len(points) > 1 and points[-1][0] > points[0][0] else float('nan'))
+            print(f"  {label:<22}{len(group) / (end - begin):>7.1f}{percentile(group, 50):>9.1f}"
+                  f"{percentile(group, 99):>9.1f}{phase_cpu:>7.0%}"
+                  f"{max((u[2] for u in points), default=float('nan')):>9.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--events', type=int, default=10000)
+    parser.add_argument('--concurrency', type=int, default=8, help='client threads')
+    parser.add_argument('--duration', type=float, default=30.0)
+    parser.add_argument('--warmup', type=float, default=3.0, help='unrecorded seconds first')
+    parser.add_argument('--think', type=float, default=0.0,
+                        help='mean seconds each client waits between requests')
+    parser.add_argument('--refresh-at', type=float, default=0.5,
+                        help='fraction of the run at which to refresh, negative to skip')
+    parser.add_argument('--full-refresh', action='store_true',
+                        help='refetch the whole year instead of the incremental window')
+    parser.add_argument('--latency', type=float, default=0.05,
+                        help='seconds of simulated upstream latency per request')
+    parser.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.serve:
+        return serve(args.full_refresh)
+
+    payload = generate_events(args.events, seed=1)
+    with tempfile.TemporaryDirectory() as tmp, \
+            EONETStub(payload['events'], generate_categories(), latency=args.latency,
+                      latency_per_event=2e-5) as stub:
+        env = dict(os.environ, EONET_API=stub.url, EONET_OFFLINE='0', EONET_ROLE='standalone',
+                   EONET_SNAPSHOT=os.path.join(tmp, 'snapshot.pkl'),
+                   EONET_ARCHIVE=os.path.join(tmp, 'archive'), EONET_LOG_LEVEL='WARNING')
+        command = [sys.executable, '-m', 'benchmarks.bench_load', '--serve']
+        if args.full_refresh:
+            command.append('--full-refresh')
+        process = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.PIPE,
+                                   stderr=subprocess.DEVNULL, text=True)
+        try:
+            url = f"http://127.0.0.1:{int(process.stdout.readline())}"
+            run(args, stub, process, url, payload)
+        finally:
+            process.terminate()
+            process.wait()
+
+
+def run(args, stub, process, url, payload):
+    driver = Driver(url, args.concurrency, args.think)
+    _, threads = driver.run(args.warmup, record=False)
+    for thread in threads:
+        thread.join()
+
+    usage = []
+    window = [None, None]
+    start, threads = driver.run(args.duration)
+    finished = threading.Event()
+
+    def sample_usage():
+        while not finished.is_set():
+            usage.append((time.perf_counter() - start, *process_usage(process.pid)))
+            finished.wait(0.25)
+
+    def refresh():
+        time.sleep(args.duration * args.refresh_at)
+        # New events and changed tracks, like a day of upstream activity
+        changed = generate_events(max(1, args.events // 20), seed=2, days=2)['events']
+        stub.set_events(payload['events'] + changed)
+        # last_update moves when the refresh is published, whether or not data changed
+        last_update = requests.get(url + '/api/status').json()['last_update']
+        window[0] = time.perf_counter() - start
+        process.send_signal(signal.SIGUSR1)
+        while not finished.is_set():
+            if requests.get(url + '/api/status').json()['last_update'] != last_update:
+                window[1] = time.perf_counter() - start
+                return
+            time.sleep(0.05)
+
+    sampler = threading.Thread(target=sample_usage, daemon=True)
+    sampler.start()
+    refresher = None
+    if args.refresh_at >= 0:
+        refresher = threading.Thread(target=refresh, daemon=True)
+        refresher.start()
+    for thread in threads:
+        thread.join()
+    finished.set()
+    sampler.join()
+    if refresher is not None:
+        refresher.join()
+
+    print(f"events: {args.events}, {args.concurrency} clients, {args.duration:.0f}s, "
+          f"upstream latency {args.latency * 1000:.0f} ms, {os.cpu_count()} cpus")
+    complete = window if window[1] is not None else None
+    if args.refresh_at >= 0 and complete is None:
+        print("  refresh did not finish within the run")
+    report(driver.samples, args.duration, complete, usage)
+
+
+if __name__ == '__main__':
+    main()
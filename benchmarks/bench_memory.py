@@ -0,0 +1,68 @@
+"""Memory held by a year of events as decoded JSON dicts versus the compact EventStore
+
+    python -m benchmarks.bench_memory --events 20000
+
+Events go through a JSON round trip first, so strings are not shared the way
+the generator shares them and the dicts look like a decoded upstream response.
+"""
+import argparse
+import gc
+import json
+import pickle
+import time
+import tracemalloc
+
+from event_index import EventIndex
+from event_store import EventStore
+from synthetic import generate_events
+
+
+def traced(build):
+    """(result, bytes still allocated by build once it returns)"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = build()
+        gc.collect()
+        size = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return result, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--events', type=int, default=20000)
+    parser.add_argument('--days', type=int, default=365)
+    args = parser.parse_args()
+
+    body = json.dumps(generate_events(args.events, seed=1, days=args.days)['events'])
+    raw, raw_bytes = traced(lambda: json.loads(body))
+    store, store_bytes = traced(lambda: EventStore(raw))
+    index, index_bytes = traced(lambda: EventIndex(raw))
+    points = len(store.lons)
+
+    started = time.perf_counter()
+    store.take(range(len(store)))
+    bulk = time.perf_counter() - started
+    started = time.perf_counter()
+    for row in range(min(len(store), 1000)):
+        store[row]
+    single = (time.perf_counter() - started) / min(len(store), 1000)
+
+    print(f"events: {args.events} over {args.days} days, {points} geometry points")
+    print(f"  {'decoded JSON dicts':<24}{raw_bytes / 1e6:>9.1f} MB"
+          f"{raw_bytes / args.events:>9.0f} B/event")
+    print(f"  {'EventStore':<24}{store_bytes / 1e6:>9.1f} MB"
+          f"{store_bytes / args.events:>9.0f} B/event")
+    print(f"  {'EventIndex with store':<24}{index_bytes / 1e6:>9.1f} MB"
+          f"{index_bytes / args.events:>9.0f} B/event")
+    print(f"  pickled: dicts {len(pickle.dumps(raw, pickle.HIGHEST_PROTOCOL)) / 1e6:.1f} MB, "
+          f"store {len(pickle.dumps(store, pickle.HIGHEST_PROTOCOL)) / 1e6:.1f} MB")
+    print(f"  rebuilding dicts: all at once {bulk * 1000:.0f} ms ({bulk / args.events * 1e6:.1f} us/event), "
+          f"one at a time {single * 1e6:.0f} us/event")
+    assert index.events[0] == raw[0]
+
+
+if __name__ == '__main__':
+    main()
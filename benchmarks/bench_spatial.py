@@ -0,0 +1,60 @@
+"""Query time of the spatial grid against a full vectorized scan as events grow
+
+    python -m benchmarks.bench_spatial --sizes 10000 100000 300000 1000000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from geo import SpatialGrid, bbox_mask, haversine_km
+
+POINTS_PER_EVENT = 3
+
+
+def median_ms(func, queries):
+    timings = []
+    for query in queries:
+        started = time.perf_counter()
+        func(*query)
+        timings.append(time.perf_counter() - started)
+    return np.median(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 300000, 1000000])
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--radius-km', type=float, default=250.0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'events':>9} {'points':>9} {'build ms':>9} | {'bbox grid':>9} {'bbox scan':>9}"
+          f" | {'near grid':>9} {'near scan':>9}")
+    for size in args.sizes:
+        count = size * POINTS_PER_EVENT
+        lons = rng.uniform(-180, 180, count)
+        lats = rng.uniform(-70, 75, count)
+        rows = np.repeat(np.arange(size), POINTS_PER_EVENT)
+
+        started = time.perf_counter()
+        grid = SpatialGrid(lons, lats, rows)
+        build_ms = (time.perf_counter() - started) * 1000
+
+        centers = list(zip(rng.uniform(-60, 60, args.queries), rng.uniform(-170, 170, args.queries)))
+        boxes = [((lon - 2.5, lat - 2.5, lon + 2.5, lat + 2.5),) for lat, lon in centers]
+        circles = [(lat, lon, args.radius_km) for lat, lon in centers]
+
+        bbox_grid = median_ms(grid.query_bbox, boxes)
+        bbox_scan = median_ms(lambda bbox: np.unique(rows[bbox_mask(lons, lats, bbox)]), boxes)
+        near_grid = median_ms(grid.query_radius, circles)
+        near_scan = median_ms(
+            lambda lat, lon, radius: np.unique(rows[haversine_km(lat, lon, lats, lons) <= radius]),
+            circles)
+
+        print(f"{size:>9} {count:>9} {build_ms:>9.1f} | {bbox_grid:>9.3f} {bbox_scan:>9.3f}"
+              f" | {near_grid:>9.3f} {near_scan:>9.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""Compare EONETData startup from the network with startup from the local snapshot
+
+    python -m benchmarks.bench_startup --events 20000 --latency 0.3
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+os.environ.setdefault('EONET_OFFLINE', '1')
+os.environ.setdefault('EONET_SNAPSHOT', '')
+os.environ.setdefault('EONET_ARCHIVE', '')
+
+from app import EONETData  # noqa: E402
+from eonet_stub import EONETStub  # noqa: E402
+from synthetic import generate_categories, generate_events  # noqa: E402
+
+
+def time_startup(env, repeat):
+    """Construct EONETData under env and return the per-run wall-clock times"""
+    saved = {key: os.environ.get(key) for key in env}
+    os.environ.update(env)
+    try:
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            data = EONETData()
+            timings.append(time.perf_counter() - started)
+            assert data.initialized
+        return timings
+    finally:
+        for key, value in saved.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--events', type=int, default=10000)
+    parser.add_argument('--latency', type=float, default=0.25,
+                        help='seconds of simulated upstream latency per request')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    payload = generate_events(args.events, seed=1)
+    with tempfile.TemporaryDirectory() as tmp, \
+            EONETStub(payload['events'], generate_categories(), latency=args.latency) as stub:
+        path = os.path.join(tmp, 'snapshot.pkl')
+        cold = []
+        for _ in range(args.repeat):
+            if os.path.exists(path):
+                os.unlink(path)
+            cold += time_startup({'EONET_API': stub.url, 'EONET_OFFLINE': '0',
+                                  'EONET_SNAPSHOT': path}, 1)
+        warm = time_startup({'EONET_API': stub.url, 'EONET_OFFLINE': '0',
+                             'EONET_SNAPSHOT': path}, args.repeat)
+        size = os.path.getsize(path)
+
+    print(f"events: {args.events}, upstream latency: {args.latency * 1000:.0f} ms, "
+          f"snapshot: {size / 1e6:.1f} MB")
+    for label, timings in (('cold network', cold), ('snapshot', warm)):
+        print(f"  {label:<13} median {statistics.median(timings) * 1000:9.1f} ms"
+              f"   min {min(timings) * 1000:9.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""Fan-out latency of /api/stream deltas to many open connections on the StreamHub
+
+    python -m benchmarks.bench_stream --clients 500 --deltas 20 --changes 50
+"""
+import argparse
+import selectors
+import socket
+import statistics
+import threading
+import time
+
+from event_stream import DeltaLog, StreamHub
+from metrics import resident_memory_bytes
+
+
+def change(version, count):
+    features = [{'type': 'Feature', 'id': f"EONET_{version}_{i}",
+                 'geometry': {'type': 'Point', 'coordinates': [i * 0.1, i * 0.05]},
+                 'properties': {'category_id': 'wildfires', 'category': 'Wildfires',
+                                'date': '2024-01-01T00:00:00Z', 'magnitude': 1.0}}
+                for i in range(count)]
+    return {'version': version, 'summary': {'event_count': version}, 'added': features,
+            'updated': [], 'closed': [], 'removed': []}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--clients', type=int, default=500)
+    parser.add_argument('--deltas', type=int, default=20)
+    parser.add_argument('--changes', type=int, default=50, help='events per delta')
+    args = parser.parse_args()
+
+    log = DeltaLog()
+    threads = threading.active_count()
+    rss = resident_memory_bytes()
+    hub = StreamHub(log, host='127.0.0.1', port=0).start()
+
+    selector = selectors.DefaultSelector()
+    buffers = {}
+    for _ in range(args.clients):
+        sock = socket.create_connection(('127.0.0.1', hub.port))
+        sock.sendall(b'GET /api/stream HTTP/1.1\r\nHost: bench\r\n\r\n')
+        sock.setblocking(False)
+        selector.register(sock, selectors.EVENT_READ)
+        buffers[sock] = b''
+
+    def read_until(marker):
+        """Seconds until every client has received marker"""
+        started = time.perf_counter()
+        waiting = set(buffers)
+        while waiting:
+            for key, _ in selector.select(10):
+                sock = key.fileobj
+                buffers[sock] = buffers[sock][-256:] + sock.recv(1 << 20)
+                if marker in buffers[sock]:
+                    waiting.discard(sock)
+        return time.perf_counter() - started
+
+    read_until(b'event: ready')
+    latencies = []
+    for version in range(args.deltas):
+        entry = log.append(change(version, args.changes))
+        latencies.append(read_until(entry.event_id.encode()))
+    size = len(log.entries[-1].encode())
+
+    print(f"clients: {args.clients}, {args.deltas} deltas of {args.changes} events ({size / 1e3:.1f} kB)")
+    print(f"  all clients have a delta after: median {statistics.median(latencies) * 1000:.1f} ms, "
+          f"max {max(latencies) * 1000:.1f} ms")
+    print(f"  server threads added: {threading.active_count() - threads}, "
+          f"RSS growth {(resident_memory_bytes() - rss) / 1e6:.1f} MB (clients included)")
+    hub.stop()
+
+
+if __name__ == '__main__':
+    main()
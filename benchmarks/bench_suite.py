@@ -0,0 +1,189 @@
+"""Benchmark EONETData hot paths on synthetic data, against a JSON baseline
+
+    python -m benchmarks.bench_suite --sizes 1000 10000 100000 --save baseline.json
+    python -m benchmarks.bench_suite --sizes 1000 10000 100000 --compare baseline.json
+
+Every case runs with the result cache disabled, so it measures the work
+behind a cache miss. With --compare the run exits with status 1 when a case
+is slower, or peaks at more memory, than the baseline by more than the
+allowed regression. Baselines are only comparable on the same machine.
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+os.environ.setdefault('EONET_OFFLINE', '1')
+os.environ.setdefault('EONET_SNAPSHOT', '')
+os.environ.setdefault('EONET_ARCHIVE', '')
+os.environ.setdefault('EONET_LOG_LEVEL', 'WARNING')
+
+import numpy as np  # noqa: E402
+
+from app import EONETData  # noqa: E402
+from synthetic import generate_categories, generate_events  # noqa: E402
+
+SIZES = [1000, 10000, 100000, 1000000]
+
+
+def filter_values():
+    """One value per get_filtered_events filter, dates relative to today like the data"""
+    today = date.today()
+    return {
+        'start_date': (today - timedelta(days=90)).isoformat(),
+        'end_date': (today - timedelta(days=30)).isoformat(),
+        'event_type': 'wildfires',
+        'min_magnitude': '5',
+        'max_magnitude': '5000',
+    }
+
+
+def cases(data, size, map_max_events):
+    """(name, callable) for every benchmarked call at this size"""
+    values = filter_values()
+    names = list(values)
+    for r in range(len(names) + 1):
+        for combination in itertools.combinations(names, r):
+            params = {name: values[name] for name in combination}
+            label = '+'.join(combination) or 'none'
+            yield f"filter:{label}", lambda params=params: data.get_filtered_events(**params)
+    yield 'filter:bbox', lambda: data.get_filtered_events(bbox=(-30.0, -40.0, 60.0, 40.0))
+    yield 'filter:near', lambda: data.get_filtered_events(near=(48.85, 2.35), radius_km=500.0)
+    yield 'filter:bbox+event_type', lambda: data.get_filtered_events(
+        bbox=(-30.0, -40.0, 60.0, 40.0), event_type='wildfires')
+
+    if size <= map_max_events:
+        events = data.get_filtered_events()
+        yield 'create_map', lambda: data.create_map(events)
+    yield 'map_features:zoom3', lambda: data.get_map_features(zoom=3)
+    yield 'summary', data.get_summary_statistics
+    for period in ('daily', 'weekly', 'monthly'):
+        yield f"trends:{period}", lambda period=period: data.get_trend_analysis(None, period)
+    yield 'trends:monthly+category', lambda: data.get_trend_analysis('wildfires', 'monthly')
+    yield 'trends:weekly+categories', lambda: data.get_trend_analysis(('wildfires', 'severeStorms', 'volcanoes'), 'weekly')
+    for period in (30, 365):
+        yield f"analysis:{period}d", lambda period=period: data.get_analysis_data(period=period)
+
+
+def measure(func, min_time, max_repeat):
+    """Median seconds over repeated runs after a warm-up, then peak traced memory of one more run"""
+    if max_repeat > 1:
+        # First calls pay for lazy imports and first-touch page faults
+        func()
+    timings = []
+    while len(timings) < max_repeat and (len(timings) < 3 or sum(timings) < min_time):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+        if timings[0] > min_time:
+            break
+
+    tracemalloc.start()
+    try:
+        base = tracemalloc.get_traced_memory()[0]
+        func()
+        peak = tracemalloc.get_traced_memory()[1] - base
+    finally:
+        tracemalloc.stop()
+    return {'seconds': statistics.median(timings), 'peak_bytes': peak, 'runs': len(timings)}
+
+
+def run(sizes, min_time, max_repeat, map_max_events, only=None):
+    data = EONETData()
+    data.result_cache = None
+    data.publish(categories=generate_categories())
+    results = {}
+    for size in sizes:
+        payload = generate_events(size, seed=size)
+        # The ingest case builds the index and rollup of the snapshot being measured
+        results[f"{size}:ingest"] = measure(
+            lambda: data.publish(events=payload, fetched_at=time.time()), 0, 1)
+        print(f"{size:>8} ingest {results[f'{size}:ingest']['seconds']:.2f}s", file=sys.stderr)
+        for name, func in cases(data, size, map_max_events):
+            if only and not any(pattern in name for pattern in only):
+                continue
+            results[f"{size}:{name}"] = measure(func, min_time, max_repeat)
+    return results
+
+
+def compare(results, baseline, max_time, max_memory, min_delta_seconds, min_delta_bytes):
+    """Print case by case changes and return the keys that regressed"""
+    regressions = []
+    width = max(map(len, results)) + 2
+    print(f"{'case':<{width}}{'base ms':>10}{'now ms':>10}{'time':>8}{'base MB':>9}{'now MB':>9}{'mem':>8}")
+    for key in sorted(results, key=lambda k: (int(k.split(':')[0]), k)):
+        old = baseline.get(key)
+        if old is None:
+            print(f"{key:<{width}}{'':>10}{results[key]['seconds'] * 1000:>10.2f}   (new)")
+            continue
+        new = results[key]
+        slower = (new['seconds'] > old['seconds'] * (1 + max_time)
+                  and new['seconds'] - old['seconds'] > min_delta_seconds)
+        bigger = (new['peak_bytes'] > old['peak_bytes'] * (1 + max_memory)
+                  and new['peak_bytes'] - old['peak_bytes'] > min_delta_bytes)
+        if slower or bigger:
+            regressions.append(key)
+        time_change = new['seconds'] / old['seconds'] - 1 if old['seconds'] else 0.0
+        memory_change = new['peak_bytes'] / old['peak_bytes'] - 1 if old['peak_bytes'] else 0.0
+        print(f"{key:<{width}}{old['seconds'] * 1000:>10.2f}{new['seconds'] * 1000:>10.2f}"
+              f"{time_change:>+8.0%}{old['peak_bytes'] / 1e6:>9.1f}{new['peak_bytes'] / 1e6:>9.1f}"
+              f"{memory_change:>+8.0%}{'  REGRESSION' if slower or bigger else ''}")
+    missing = sorted(set(baseline) - set(results))
+    if missing:
+        print(f"{len(missing)} baseline cases were not run")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    parser.add_argument('--only', nargs='+', help='run only cases whose name contains one of these')
+    parser.add_argument('--min-time', type=float, default=0.2,
+                        help='seconds to keep repeating a case for a stable median')
+    parser.add_argument('--max-repeat', type=int, default=50)
+    parser.add_argument('--map-max-events', type=int, default=1000,
+                        help='largest size create_map runs at, it takes ~30s for 10k markers')
+    parser.add_argument('--save', help='write the results as a JSON baseline')
+    parser.add_argument('--compare', help='baseline JSON to compare against')
+    parser.add_argument('--max-time-regression', type=float, default=0.25)
+    parser.add_argument('--max-memory-regression', type=float, default=0.25)
+    parser.add_argument('--min-delta-ms', type=float, default=1.0,
+                        help='ignore time changes smaller than this, they are noise')
+    parser.add_argument('--min-delta-mb', type=float, default=1.0,
+                        help='ignore peak memory changes smaller than this')
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.min_time, args.max_repeat, args.map_max_events, args.only)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({'meta': {'python': platform.python_version(), 'numpy': np.__version__,
+                                'machine': platform.platform(), 'cpus': os.cpu_count(),
+                                'created': time.strftime('%Y-%m-%dT%H:%M:%S')},
+                       'results': results}, f, indent=1, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.max_time_regression,
+                              args.max_memory_regression, args.min_delta_ms / 1000,
+                              args.min_delta_mb * 1e6)
+        if regressions:
+            print(f"{len(regressions)} regressions: {', '.join(regressions)}")
+            sys.exit(1)
+        print('no regressions')
+    elif not args.save:
+        width = max(map(len, results)) + 2
+        for key, result in results.items():
+            print(f"{key:<{width}}{result['seconds'] * 1000:>10.2f} ms{result['peak_bytes'] / 1e6:>9.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""Vertices and /api/tracks response sizes per zoom level, full tracks versus simplified
+
+    python -m benchmarks.bench_tracks --events 10000 --max-points 60
+"""
+import argparse
+import gzip
+import os
+import time
+
+os.environ.setdefault('EONET_OFFLINE', '1')
+os.environ.setdefault('EONET_SNAPSHOT', '')
+os.environ.setdefault('EONET_ARCHIVE', '')
+os.environ.setdefault('EONET_LOG_LEVEL', 'WARNING')
+
+from app import app, eonet_data  # noqa: E402
+from synthetic import generate_categories, generate_events  # noqa: E402
+from tracks import TRACK_ZOOMS, tolerance_for_zoom  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--events', type=int, default=10000)
+    parser.add_argument('--max-points', type=int, default=60,
+                        help='longest storm and ice tracks generated')
+    parser.add_argument('--bbox', default='-180,-90,180,90')
+    args = parser.parse_args()
+
+    payload = generate_events(args.events, seed=1, max_points=args.max_points)
+    started = time.perf_counter()
+    eonet_data.publish(events=payload, categories=generate_categories(), fetched_at=time.time())
+    ingest = time.perf_counter() - started
+    tracks = eonet_data.snapshot.index.tracks
+    eonet_data.result_cache = None
+    client = app.test_client()
+
+    print(f"events: {args.events}, {len(tracks)} points, ingest {ingest:.2f}s, bbox {args.bbox}")
+    print(f"  {'zoom':<6}{'tolerance':>11}{'vertices':>10}{'JSON MB':>9}{'gzip MB':>9}{'build ms':>10}")
+    for zoom in list(TRACK_ZOOMS) + [None]:
+        query = f"/api/tracks?bbox={args.bbox}" + (f"&zoom={zoom}" if zoom is not None else '')
+        started = time.perf_counter()
+        body = client.get(query, headers={'Accept-Encoding': 'identity'}).data
+        elapsed = time.perf_counter() - started
+        print(f"  {'full' if zoom is None else zoom:<6}{tolerance_for_zoom(zoom):>11.4f}"
+              f"{tracks.vertex_count(zoom):>10}{len(body) / 1e6:>9.2f}"
+              f"{len(gzip.compress(body, 6)) / 1e6:>9.2f}{elapsed * 1000:>10.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+"""Memory per worker and throughput for N worker processes, private copies versus a shared snapshot
+
+    python -m benchmarks.bench_workers --events 50000 --workers 1 2 4 --duration 5
+
+'standalone' workers each unpickle the snapshot into their own memory,
+'shared' workers map the files published by a fetcher. PSS splits shared
+pages between the processes mapping them, so it is the per-worker cost.
+Throughput only scales with workers on a machine with as many free cores.
+"""
+import argparse
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+from shared_snapshot import SharedSnapshotStore
+from snapshot import EventSnapshot, SnapshotStore
+from synthetic import generate_categories, generate_events
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def serve():
+    """Worker process: serve the app on a free port and report it on stdout"""
+    from werkzeug.serving import make_server
+    from app import app
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    print(server.port, flush=True)
+    server.serve_forever()
+
+
+def memory_mb(pid):
+    """RSS, its anonymous and file-backed parts, and PSS of a process in MB"""
+    fields = {}
+    for name in (f'/proc/{pid}/status', f'/proc/{pid}/smaps_rollup'):
+        try:
+            with open(name) as f:
+                for line in f:
+                    key, _, value = line.partition(':')
+                    if value.strip().endswith('kB'):
+                        fields.setdefault(key, int(value.split()[0]) / 1024)
+        except OSError:
+            pass
+    return {key: fields.get(name) for key, name in
+            (('rss', 'VmRSS'), ('anon', 'RssAnon'), ('file', 'RssFile'), ('pss', 'Pss'))}
+
+
+def start_workers(count, env):
+    workers = []
+    for _ in range(count):
+        process = subprocess.Popen([sys.executable, '-m', 'benchmarks.bench_workers', '--serve'],
+                                   cwd=ROOT, env=dict(os.environ, **env),
+                                   stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+        port = int(process.stdout.readline())
+        workers.append((process, f"http://127.0.0.1:{port}"))
+    return workers
+
+
+def drive(urls, paths, duration, threads):
+    """Send requests round robin over the workers, returning latencies and errors"""
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client(offset):
+        session = requests.Session()
+        rng = random.Random(offset)
+        n = offset
+        while time.perf_counter() < deadline:
+            url = urls[n % len(urls)] + rng.choice(paths)
+            n += 1
+            started = time.perf_counter()
+            ok = session.get(url).status_code == 200
+            with lock:
+                latencies.append(time.perf_counter() - started)
+                errors[0] += not ok
+
+    pool = [threading.Thread(target=client, args=(i,)) for i in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return latencies, errors[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--events', type=int, default=50000)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--duration', type=float, default=5.0)
+    parser.add_argument('--threads', type=int, default=8, help='concurrent client connections')
+    parser.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.serve:
+        return serve()
+
+    payload = generate_events(args.events, seed=1)
+    snapshot = EventSnapshot(events=payload, categories=generate_categories(), version=1,
+                             fetched_at=time.time())
+    ids = [event['id'] for event in random.Random(0).sample(payload['events'], 200)]
+    paths = (['/api/summary', '/api/map/features?zoom=3',
+              '/api/events?event_type=wildfires&fields=id,date,magnitude&limit=100']
+             + [f'/api/events/{event_id}' for event_id in ids])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pickle_path = os.path.join(tmp, 'snapshot.pkl')
+        SnapshotStore(pickle_path).save(snapshot)
+        SharedSnapshotStore(os.path.join(tmp, 'shared')).write(snapshot)
+        modes = {
+            'standalone': {'EONET_ROLE': 'standalone', 'EONET_OFFLINE': '1',
+                           'EONET_SNAPSHOT': pickle_path},
+            'shared': {'EONET_ROLE': 'worker', 'EONET_SNAPSHOT': '',
+                       'EONET_SHARED_DIR': os.path.join(tmp, 'shared')},
+        }
+
+        print(f"events: {args.events}, {args.threads} client threads, {args.duration:.0f}s per run, "
+              f"{os.cpu_count()} cpus")
+        print(f"  {'mode':<11}{'workers':>8}{'req/s':>9}{'p50 ms':>9}{'errors':>8}"
+              f"{'RSS MB':>9}{'anon MB':>9}{'PSS MB':>9}  (per worker)")
+        for mode, env in modes.items():
+            for count in args.workers:
+                workers = start_workers(count, dict(env, EONET_LOG_LEVEL='WARNING'))
+                try:
+                    urls = [url for _, url in workers]
+                    drive(urls, paths, 1.0, args.threads)  # warm caches and page in the data
+                    latencies, errors = drive(urls, paths, args.duration, args.threads)
+                    memory = [memory_mb(process.pid) for process, _ in workers]
+                finally:
+                    for process, _ in workers:
+                        process.terminate()
+                        process.wait()
+
+                def mean(key):
+                    values = [m[key] for m in memory if m[key] is not None]
+                    return statistics.mean(values) if values else float('nan')
+
+                print(f"  {mode:<11}{count:>8}{len(latencies) / args.duration:>9.0f}"
+                      f"{statistics.median(latencies) * 1000:>9.1f}{errors:>8}"
+                      f"{mean('rss'):>9.0f}{mean('anon'):>9.0f}{mean('pss'):>9.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,254 @@
+"""Country and macro-region of points, from boundaries bundled with the app
+
+geodata/countries.geojson is the Natural Earth 1:110m admin-0 countries
+layer (public domain), reduced to an ISO code, a name and a macro-region per
+country, with coordinates rounded to 0.001 degrees. Lookups never touch the
+network.
+"""
+import json
+import os
+import threading
+
+import numpy as np
+
+DEFAULT_BOUNDARIES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                       'geodata', 'countries.geojson')
+# Macro-regions; points outside every country are in the Ocean
+REGIONS = ['Africa', 'Antarctica', 'Asia', 'Europe', 'North America', 'Oceania',
+           'South America', 'Ocean']
+OCEAN = REGIONS.index('Ocean')
+NO_COUNTRY = -1
+# Points are looked up and cached at this many decimals, about 1 km at 2
+CACHE_DIGITS = 2
+# Cached coordinates kept before the cache starts over
+CACHE_SIZE = 1_000_000
+# Degrees per cell of the grid over ring bounding boxes
+CELL_SIZE = 5.0
+# Point x edge comparisons per block of the crossing test
+BLOCK_SIZE = 1 << 20
+
+
+class CountryLookup:
+    """Point-in-polygon lookup of countries, vectorized over arrays of points
+
+    Every ring of every country is kept as flat edge arrays. A grid over the
+    ring bounding boxes narrows each point to the few rings whose box holds
+    it, and the crossing test then runs one ring at a time over all the points
+    that reached it. A point is in a country when it is inside an odd number
+    of the country's rings, which covers holes and exclaves alike.
+
+    Answers are cached by coordinates rounded to CACHE_DIGITS, and points are
+    tested at their rounded position, so a cached answer is the one a fresh
+    test would give.
+    """
+
+    def __init__(self, features, cell_size=CELL_SIZE):
+        self.codes, self.names, regions = [], [], []
+        ring_countries, ring_sizes, points = [], [], []
+        for feature in features:
+            properties, geometry = feature['properties'], feature.get('geometry') or {}
+            polygons = geometry.get('coordinates') or []
+            if geometry.get('type') == 'Polygon':
+                polygons = [polygons]
+            rings = [np.asarray(ring, dtype=float)[:, :2] for polygon in polygons for ring in polygon]
+            rings = [ring for ring in rings if len(ring) >= 3]
+            if not rings:
+                continue
+            ring_countries.extend([len(self.codes)] * len(rings))
+            ring_sizes.extend(len(ring) for ring in rings)
+            points.extend(rings)
+            self.codes.append(properties['iso_a3'])
+            self.names.append(properties.get('name', properties['iso_a3']))
+            regions.append(REGIONS.index(properties.get('region', 'Ocean')))
+
+        self.country_regions = np.array(regions, dtype=np.int16)
+        self._code_lookup = {code: position for position, code in enumerate(self.codes)}
+        self.ring_countries = np.array(ring_countries, dtype=np.int64)
+        self.ring_starts = np.zeros(len(ring_sizes) + 1, dtype=np.int64)
+        np.cumsum(ring_sizes, out=self.ring_starts[1:])
+
+        # Edge i of a ring runs from its point i to the next, the last one back to the first
+        starts = np.concatenate(points) if points else np.empty((0, 2))
+        ends = np.concatenate([np.roll(ring, -1, axis=0) for ring in points]) if points else starts
+        self.x0, self.y0 = starts[:, 0], starts[:, 1]
+        self.y1 = ends[:, 1]
+        # Only edges straddling a point's latitude are used, never horizontal ones
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.slopes = np.where(ends[:, 1] != starts[:, 1],
+                                   (ends[:, 0] - starts[:, 0]) / (ends[:, 1] - starts[:, 1]), 0.0)
+
+        self.boxes = np.array([(ring[:, 0].min(), ring[:, 1].min(), ring[:, 0].max(), ring[:, 1].max())
+                               for ring in points]).reshape(-1, 4)
+        self._build_grid(cell_size)
+        self._cache = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int16))
+
+    @classmethod
+    def load(cls, path=DEFAULT_BOUNDARIES_PATH):
+        """Lookup over a GeoJSON FeatureCollection of Polygon and MultiPolygon countries"""
+        with open(path, encoding='utf-8') as f:
+            return cls(json.load(f)['features'])
+
+    def _build_grid(self, cell_size):
+        """Rings per grid cell, as rings sorted by cell with per-cell offsets"""
+        self.cell_size = cell_size
+        self.columns = int(np.ceil(360.0 / cell_size))
+        self.bands = int(np.ceil(180.0 / cell_size))
+        west, south = self._column(self.boxes[:, 0]), self._band(self.boxes[:, 1])
+        east, north = self._column(self.boxes[:, 2]), self._band(self.boxes[:, 3])
+        cells, rings = [], []
+        for ring, (first, last, bottom, top) in enumerate(zip(west, east, south, north)):
+            columns, bands = np.meshgrid(np.arange(first, last + 1), np.arange(bottom, top + 1))
+            cells.append((bands * self.columns + columns).ravel())
+            rings.append(np.full(columns.size, ring, dtype=np.int64))
+        cells = np.concatenate(cells) if cells else np.empty(0, dtype=np.int64)
+        rings = np.concatenate(rings) if rings else np.empty(0, dtype=np.int64)
+        order = np.argsort(cells, kind='stable')
+        self.cell_rings = rings[order]
+        self.cell_starts = np.searchsorted(cells[order], np.arange(self.columns * self.bands + 1))
+
+    def _column(self, lons):
+        return np.clip(np.floor((np.asarray(lons) + 180.0) / self.cell_size),
+                       0, self.columns - 1).astype(np.int64)
+
+    def _band(self, lats):
+        return np.clip(np.floor((np.asarray(lats) + 90.0) / self.cell_size),
+                       0, self.bands - 1).astype(np.int64)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def code(self, iso_a3):
+        """Country code of an ISO 3166 alpha-3 code, or NO_COUNTRY when unknown"""
+        return self._code_lookup.get(str(iso_a3).upper(), NO_COUNTRY)
+
+    def countries(self, lons, lats):
+        """Country codes of points, NO_COUNTRY at sea or where a coordinate is NaN"""
+        lons = np.asarray(lons, dtype=float)
+        lats = np.asarray(lats, dtype=float)
+        codes = np.full(len(lons), NO_COUNTRY, dtype=np.int16)
+        valid = ~(np.isnan(lons) | np.isnan(lats))
+        if not valid.any():
+            return codes
+        keys, inverse = np.unique(self._keys(lons[valid], lats[valid]), return_inverse=True)
+        codes[valid] = self._cached(keys)[inverse]
+        return codes
+
+    def regions(self, codes):
+        """Macro-region codes of country codes, OCEAN for NO_COUNTRY"""
+        codes = np.asarray(codes, dtype=np.int64)
+        if not len(self.country_regions):
+            return np.full(len(codes), OCEAN, dtype=np.int16)
+        return np.where(codes >= 0, self.country_regions[np.maximum(codes, 0)], OCEAN).astype(np.int16)
+
+    def _keys(self, lons, lats):
+        """Rounded coordinates packed into one int64 per point"""
+        scale = 10 ** CACHE_DIGITS
+        x = np.rint((np.clip(lons, -180.0, 180.0) + 180.0) * scale).astype(np.int64)
+        y = np.rint((np.clip(lats, -90.0, 90.0) + 90.0) * scale).astype(np.int64)
+        return x * (180 * scale + 1) + y
+
+    def _points(self, keys):
+        """(lons, lats) of packed keys, the rounded coordinates"""
+        scale = 10 ** CACHE_DIGITS
+        x, y = np.divmod(keys, 180 * scale + 1)
+        return x / scale - 180.0, y / scale - 90.0
+
+    def _cached(self, keys):
+        """Country codes of sorted unique keys, testing and caching the unseen ones"""
+        cached_keys, cached_codes = self._cache
+        position = np.searchsorted(cached_keys, keys)
+        hit = position < len(cached_keys)
+        hit[hit] = cached_keys[position[hit]] == keys[hit]
+        codes = np.empty(len(keys), dtype=np.int16)
+        codes[hit] = cached_codes[position[hit]]
+
+        missing = keys[~hit]
+        if len(missing):
+            found = self.locate(*self._points(missing))
+            codes[~hit] = found
+            if len(cached_keys) + len(missing) > CACHE_SIZE:
+                cached_keys, cached_codes = missing[:0], found[:0]
+            merged_keys = np.concatenate([cached_keys, missing])
+            order = np.argsort(merged_keys, kind='stable')
+            # Swapped in whole, so concurrent readers see one consistent cache
+            self._cache = (merged_keys[order], np.concatenate([cached_codes, found])[order])
+        return codes
+
+    def locate(self, lons, lats):
+        """Country codes of points by point-in-polygon tests, without the cache"""
+        lons = np.asarray(lons, dtype=float)
+        lats = np.asarray(lats, dtype=float)
+        codes = np.full(len(lons), NO_COUNTRY, dtype=np.int16)
+        if not len(lons) or not len(self.boxes):
+            return codes
+
+        # Candidate (point, ring) pairs: the rings listed in the point's cell...
+        cells = self._band(lats) * self.columns + self._column(lons)
+        firsts = self.cell_starts[cells]
+        counts = self.cell_starts[cells + 1] - firsts
+        points = np.repeat(np.arange(len(lons)), counts)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        rings = self.cell_rings[np.repeat(firsts, counts) + offsets]
+        # ...whose bounding box holds it
+        boxes = self.boxes[rings]
+        x, y = lons[points], lats[points]
+        held = (x >= boxes[:, 0]) & (y >= boxes[:, 1]) & (x <= boxes[:, 2]) & (y <= boxes[:, 3])
+        points, rings = points[held], rings[held]
+        if not len(points):
+            return codes
+
+        order = np.argsort(rings, kind='stable')
+        points, rings = points[order], rings[order]
+        inside = np.zeros(len(points), dtype=bool)
+        bounds = np.flatnonzero(np.diff(rings)) + 1
+        for start, end in zip(np.r_[0, bounds].tolist(), np.r_[bounds, len(rings)].tolist()):
+            selected = points[start:end]
+            inside[start:end] = self._inside_ring(rings[start], lons[selected], lats[selected])
+
+        # Odd parity over a country's rings puts the point in it
+        countries = self.ring_countries[rings[inside]]
+        pairs, parity = np.unique(points[inside] * len(self.codes) + countries, return_counts=True)
+        pairs = pairs[parity % 2 == 1]
+        codes[pairs // len(self.codes)] = pairs % len(self.codes)
+        return codes
+
+    def _inside_ring(self, ring, lons, lats):
+        """Even-odd ray casting of points against one ring, in blocks of BLOCK_SIZE comparisons"""
+        edges = slice(self.ring_starts[ring], self.ring_starts[ring + 1])
+        x0, y0, y1, slopes = self.x0[edges], self.y0[edges], self.y1[edges], self.slopes[edges]
+        inside = np.empty(len(lons), dtype=bool)
+        step = max(1, BLOCK_SIZE // len(x0))
+        for start in range(0, len(lons), step):
+            x = lons[start:start + step, None]
+            y = lats[start:start + step, None]
+            crossing = ((y0 > y) != (y1 > y)) & (x < x0 + (y - y0) * slopes)
+            inside[start:start + step] = np.count_nonzero(crossing, axis=1) % 2 == 1
+        return inside
+
+
+_lookup = None
+_lookup_lock = threading.Lock()
+
+
+def country_lookup():
+    """The CountryLookup over the bundled boundaries, loaded on first use"""
+    global _lookup
+    if _lookup is None:
+        with _lookup_lock:
+            if _lookup is None:
+                _lookup = CountryLookup.load()
+    return _lookup
+
+
+def parse_countries(value):
+    """Parse comma separated ISO alpha-3 codes into a sorted tuple, or None when missing
+
+    Raises ValueError for codes not in the bundled boundaries.
+    """
+    if not value:
+        return None
+    codes = sorted({part.strip().upper() for part in str(value).split(',') if part.strip()})
+    unknown = [code for code in codes if country_lookup().code(code) == NO_COUNTRY]
+    if unknown:
+        raise ValueError(f"unknown country: {', '.join(unknown)}")
+    return tuple(codes) or None
@@ -0,0 +1,219 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from datetime import timedelta
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Statuses worth retrying, anything else in 4xx is the caller's fault
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class CircuitOpenError(requests.RequestException):
+    """Raised without touching the network while the circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """Fail fast after repeated upstream failures, probing again after reset_timeout
+
+    Closed: requests pass and consecutive failures are counted. Open: requests
+    are refused until reset_timeout has passed. Half-open: one probe request
+    is let through, its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if self.clock() - self.opened_at >= self.reset_timeout:
+            return 'half-open'
+        return 'open'
+
+    def allow(self):
+        """Whether a request may go out now"""
+        with self._lock:
+            state = self._state()
+            if state == 'closed':
+                return True
+            if state == 'half-open' and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._probing or self.failures >= self.failure_threshold:
+                self.opened_at = self.clock()
+            self._probing = False
+
+
+def date_shards(start, end, shard_days):
+    """Split the inclusive date range start..end into inclusive windows, newest first"""
+    shards = []
+    shard_end = end
+    while shard_end >= start:
+        shard_start = max(start, shard_end - timedelta(days=shard_days - 1))
+        shards.append((shard_start, shard_end))
+        shard_end = shard_start - timedelta(days=1)
+    return shards
+
+
+def merge_shards(payloads):
+    """Concatenate shard event lists in order, keeping one copy of each event id
+
+    An event whose track spans shards is returned by each of them; the copy
+    with the longest track wins and keeps the position of the first one.
+    """
+    merged = {}
+    for payload in payloads:
+        for event in payload.get('events', []):
+            event_id = event.get('id')
+            kept = merged.get(event_id)
+            if kept is None or len(event.get('geometry') or []) > len(kept.get('geometry') or []):
+                merged[event_id] = event
+    return list(merged.values())
+
+
+def wire_size(response):
+    """Bytes of a response body as transferred, before any Content-Encoding is undone"""
+    read = getattr(response.raw, 'tell', None)
+    size = read() if callable(read) else None
+    if isinstance(size, int) and size > 0:
+        return size
+    length = response.headers.get('Content-Length', '')
+    return int(length) if length.isdigit() else len(response.content)
+
+
+class EONETClient:
+    """EONET API client with a pooled session, timeouts, retries and a circuit breaker
+
+    Event queries are split into date shards, and optionally per category,
+    fetched concurrently and merged by event id. timer(stage) may return a
+    context manager timing the 'fetch' and 'decode' stages of every attempt,
+    and on_error(endpoint, error) is called for every failed attempt.
+    """
+
+    def __init__(self, base_url, timeout=(3.05, 30.0), retries=3, backoff=0.5, max_backoff=8.0,
+                 shard_days=30, max_workers=4, breaker=None, timer=None, on_error=None,
+                 sleep=time.sleep):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.shard_days = shard_days
+        self.max_workers = max_workers
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+        self.timer = timer or (lambda stage: nullcontext())
+        self.on_error = on_error
+        self.sleep = sleep
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def close(self):
+        self.session.close()
+
+    def backoff_delay(self, attempt):
+        """Exponential backoff with full jitter for the given retry attempt"""
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def get_json(self, endpoint, params=None):
+        """GET an endpoint with retries, returning (decoded body, (wire bytes, decoded bytes))"""
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                error = CircuitOpenError(f"circuit open, not calling {endpoint}")
+                self._failed(endpoint, error)
+                raise error
+            try:
+                with self.timer('fetch'):
+                    response = self.session.get(f"{self.base_url}/{endpoint}", params=params,
+                                                timeout=self.timeout)
+                    response.raise_for_status()
+                with self.timer('decode'):
+                    payload = response.json()
+            except requests.HTTPError as e:
+                self.breaker.record_failure()
+                self._failed(endpoint, e)
+                if e.response.status_code not in RETRY_STATUSES or attempt >= self.retries:
+                    raise
+            except (requests.ConnectionError, requests.Timeout, ValueError) as e:
+                # ValueError covers truncated or otherwise undecodable bodies
+                self.breaker.record_failure()
+                self._failed(endpoint, e)
+                if attempt >= self.retries:
+                    raise
+            else:
+                self.breaker.record_success()
+                return payload, (wire_size(response), len(response.content))
+            self.sleep(self.backoff_delay(attempt))
+            attempt += 1
+
+    def _failed(self, endpoint, error):
+        if self.on_error is not None:
+            self.on_error(endpoint, error)
+
+    def categories(self):
+        """Fetch the category list"""
+        payload, _ = self.get_json('categories')
+        return payload
+
+    def events(self, start, end, status='all', categories=None):
+        """Fetch events between two dates, sharded and fetched concurrently
+
+        Returns (payload, stats) where payload has the merged 'events' and
+        stats reports shard count, bytes received over the wire and after
+        Content-Encoding was undone, and duplicates dropped.
+        Any shard failing after its retries fails the whole fetch, a partial
+        result would read as events having disappeared upstream.
+        """
+        shard_params = []
+        for shard_start, shard_end in date_shards(start, end, self.shard_days):
+            params = {'start': shard_start.strftime('%Y-%m-%d'),
+                      'end': shard_end.strftime('%Y-%m-%d'),
+                      'status': status}
+            for category in categories or [None]:
+                shard_params.append(params if category is None else dict(params, category=category))
+
+        if len(shard_params) == 1:
+            results = [self.get_json('events', shard_params[0])]
+        else:
+            workers = min(self.max_workers, len(shard_params))
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='eonet-fetch') as pool:
+                results = list(pool.map(lambda params: self.get_json('events', params),
+                                        shard_params))
+
+        payloads = [payload for payload, _ in results]
+        events = merge_shards(payloads)
+        received = sum(len(payload.get('events', [])) for payload in payloads)
+        payload = dict(payloads[0], events=events) if payloads else {'events': events}
+        return payload, {'shards': len(shard_params),
+                         'bytes': sum(wire for _, (wire, _) in results),
+                         'decoded_bytes': sum(decoded for _, (_, decoded) in results),
+                         'duplicates': received - len(events)}
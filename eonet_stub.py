@@ -0,0 +1,139 @@
+import gzip
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+def _in_window(event, start=None, end=None):
+    """EONET matches an event when any of its geometry dates falls in the window"""
+    for geo in event.get('geometry') or []:
+        date = (geo.get('date') or '')[:10]
+        if (not start or date >= start) and (not end or date <= end):
+            return True
+    return False
+
+
+class EONETStub:
+    """Local stand-in for the EONET v3 API serving canned events
+
+    latency is added to every request and latency_per_event for every event
+    returned, so large windows are slower like upstream. A share error_rate of
+    requests fail with error_status, drawn from a seeded generator. Bodies are
+    gzipped for clients accepting it unless compress is False. peak_in_flight
+    is the most requests ever served at once.
+    """
+
+    def __init__(self, events=None, categories=None, host='127.0.0.1', port=0, latency=0.0,
+                 latency_per_event=0.0, error_rate=0.0, error_status=503, seed=0, compress=True):
+        self.events = list(events or [])
+        self.compress = compress
+        self.latency = latency
+        self.latency_per_event = latency_per_event
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self._random = random.Random(seed)
+        self.categories = categories or {'title': 'EONET Event Categories', 'categories': []}
+        self.requests = []
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/api/v3"
+
+    def set_events(self, events):
+        with self._lock:
+            self.events = list(events)
+
+    def select(self, params):
+        """Apply the subset of EONET query parameters the app uses"""
+        with self._lock:
+            events = list(self.events)
+        status = params.get('status', 'open')
+        if status == 'open':
+            events = [e for e in events if not e.get('closed')]
+        elif status == 'closed':
+            events = [e for e in events if e.get('closed')]
+        if params.get('category'):
+            wanted = set(params['category'].split(','))
+            events = [e for e in events if any(c.get('id') in wanted for c in e.get('categories', []))]
+        if params.get('start') or params.get('end'):
+            events = [e for e in events if _in_window(e, params.get('start'), params.get('end'))]
+        if params.get('limit'):
+            events = events[:int(params['limit'])]
+        return {'title': 'EONET Events', 'events': events}
+
+    def respond(self, path, params):
+        """Build (status, body) for a request; subclasses may inject faults here"""
+        if self.error_rate:
+            with self._lock:
+                failed = self._random.random() < self.error_rate
+            if failed:
+                return self.error_status, {'error': 'injected failure'}
+        if path.endswith('/categories'):
+            return 200, self.categories
+        if path.endswith('/events'):
+            payload = self.select(params)
+            if self.latency_per_event:
+                time.sleep(self.latency_per_event * len(payload['events']))
+            return 200, payload
+        return 404, {'error': 'not found'}
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                params = {key: values[-1] for key, values in parse_qs(parsed.query).items()}
+                with stub._lock:
+                    stub.requests.append((parsed.path, params))
+                    stub.in_flight += 1
+                    stub.peak_in_flight = max(stub.peak_in_flight, stub.in_flight)
+                try:
+                    self.serve(parsed.path, params)
+                finally:
+                    with stub._lock:
+                        stub.in_flight -= 1
+
+            def serve(self, path, params):
+                if stub.latency:
+                    time.sleep(stub.latency)
+                status, payload = stub.respond(path, params)
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                if stub.compress and 'gzip' in self.headers.get('Accept-Encoding', ''):
+                    body = gzip.compress(body, 6)
+                    self.send_header('Content-Encoding', 'gzip')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,182 @@
+"""Flat exports of filtered events, one row per geometry point, written in chunks
+
+Every writer takes an iterable of events and yields bytes, one chunk of
+CHUNK_SIZE points at a time, so an export holds a chunk rather than the
+whole result however many events it covers.
+"""
+import csv
+import io
+import json
+import math
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # optional, no Parquet exports without it
+    pyarrow = None
+
+from event_index import geometry_point, point_magnitude
+
+EXPORT_FORMATS = ('csv', 'ndjson', 'geojson', 'parquet')
+MEDIA_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+    'geojson': 'application/geo+json',
+    'parquet': 'application/vnd.apache.parquet',
+}
+# Geometry points written per chunk
+CHUNK_SIZE = 2000
+COLUMNS = ('event_id', 'title', 'category_id', 'category', 'closed', 'point', 'date',
+           'geometry_type', 'longitude', 'latitude', 'magnitude', 'magnitude_unit', 'link')
+# Parquet column types, strings unless listed
+NUMERIC_COLUMNS = {'point': 'int32', 'longitude': 'float64', 'latitude': 'float64',
+                   'magnitude': 'float64'}
+
+
+def parse_format(value):
+    """Validate an export format, csv when missing"""
+    value = (value or 'csv').lower()
+    if value not in EXPORT_FORMATS:
+        raise ValueError(f"format must be one of {', '.join(EXPORT_FORMATS)}")
+    if value == 'parquet' and pyarrow is None:
+        raise ValueError('parquet exports need the pyarrow package')
+    return value
+
+
+def point_rows(event):
+    """Yield one row per geometry point of an event, in COLUMNS order
+
+    The magnitude is the point's own, else the event's; the unit is the one
+    that goes with it. Polygons are reduced to the mean of their outer ring.
+    An event without geometry still gets one row, with the point fields empty.
+    """
+    category = (event.get('categories') or [{}])[0] or {}
+    head = (event.get('id'), event.get('title'), category.get('id'), category.get('title'),
+            event.get('closed'))
+    root_magnitude = point_magnitude(event)
+    geometry = event.get('geometry') or []
+    if not geometry:
+        magnitude = None if math.isnan(root_magnitude) else root_magnitude
+        yield head + (None, None, None, None, None, magnitude,
+                      event.get('magnitudeUnit') if magnitude is not None else None,
+                      event.get('link'))
+        return
+    for position, geo in enumerate(geometry):
+        lon, lat = geometry_point(geo) or (None, None)
+        magnitude, unit = point_magnitude(geo), geo.get('magnitudeUnit')
+        if math.isnan(magnitude):
+            magnitude, unit = root_magnitude, event.get('magnitudeUnit')
+        if math.isnan(magnitude):
+            magnitude = unit = None
+        yield head + (position, geo.get('date'), geo.get('type'), lon, lat, magnitude, unit,
+                      event.get('link'))
+
+
+def row_chunks(events):
+    """Lists of up to CHUNK_SIZE point rows"""
+    chunk = []
+    for event in events:
+        for row in point_rows(event):
+            chunk.append(row)
+            if len(chunk) >= CHUNK_SIZE:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+
+def _dumps(value):
+    return json.dumps(value, separators=(',', ':'))
+
+
+def write_csv(events):
+    """Yield CSV with a header row; empty fields for missing values"""
+    header = True
+    for chunk in row_chunks(events):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator='\n')
+        if header:
+            writer.writerow(COLUMNS)
+            header = False
+        writer.writerows(chunk)
+        yield buffer.getvalue().encode()
+    if header:
+        yield (','.join(COLUMNS) + '\n').encode()
+
+
+def write_ndjson(events):
+    """Yield one JSON object per point and line"""
+    for chunk in row_chunks(events):
+        yield ('\n'.join(_dumps(dict(zip(COLUMNS, row))) for row in chunk) + '\n').encode()
+
+
+def write_geojson(events):
+    """Yield a FeatureCollection of Point features, null geometry where a point has none"""
+    yield b'{"type":"FeatureCollection","features":['
+    first = True
+    lon_at, lat_at = COLUMNS.index('longitude'), COLUMNS.index('latitude')
+    for chunk in row_chunks(events):
+        features = []
+        for row in chunk:
+            geometry = None
+            if row[lon_at] is not None:
+                geometry = {'type': 'Point', 'coordinates': [row[lon_at], row[lat_at]]}
+            properties = {name: value for name, value in zip(COLUMNS, row)
+                          if name not in ('longitude', 'latitude')}
+            features.append(_dumps({'type': 'Feature', 'geometry': geometry,
+                                    'properties': properties}))
+        yield (('' if first else ',') + ','.join(features)).encode()
+        first = False
+    yield b']}\n'
+
+
+class _Drain(io.RawIOBase):
+    """Write-only file whose written bytes are taken out as they arrive"""
+
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def take(self):
+        data = b''.join(self.parts)
+        self.parts = []
+        return data
+
+
+def write_parquet(events):
+    """Yield a Parquet file with one row group per chunk"""
+    schema = pyarrow.schema([(name, NUMERIC_COLUMNS.get(name, 'string')) for name in COLUMNS])
+    sink = _Drain()
+    writer = pyarrow.parquet.ParquetWriter(sink, schema, compression='zstd')
+    try:
+        for chunk in row_chunks(events):
+            columns = zip(*chunk)
+            writer.write_table(pyarrow.table(
+                [pyarrow.array(column, type=field.type) for column, field in zip(columns, schema)],
+                schema=schema))
+            data = sink.take()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.take()
+
+
+WRITERS = {'csv': write_csv, 'ndjson': write_ndjson, 'geojson': write_geojson,
+           'parquet': write_parquet}
+
+
+def export_events(events, output):
+    """Yield the events in an export format as byte chunks"""
+    return WRITERS[output](events)
@@ -0,0 +1,102 @@
+import base64
+import json
+
+import numpy as np
+
+# Raw event keys passed through as they are
+RAW_FIELDS = ('id', 'title', 'description', 'link', 'closed', 'categories', 'sources', 'geometry')
+# Compact fields read from the index columns
+DERIVED_FIELDS = ('category', 'date', 'coordinates', 'magnitude')
+# Events serialized per chunk of a streamed response
+CHUNK_SIZE = 500
+
+
+def parse_fields(value):
+    """Parse a comma separated fields= projection, or None for whole events"""
+    if not value:
+        return None
+    fields = [field.strip() for field in str(value).split(',') if field.strip()]
+    unknown = [field for field in fields if field not in RAW_FIELDS + DERIVED_FIELDS]
+    if unknown:
+        raise ValueError(f"unknown fields: {', '.join(unknown)}")
+    return tuple(dict.fromkeys(fields))
+
+
+def parse_limit(value):
+    """Parse a positive limit=, or None when missing"""
+    if not value:
+        return None
+    limit = int(value)
+    if limit < 1:
+        raise ValueError('limit must be positive')
+    return limit
+
+
+def encode_cursor(key):
+    """Opaque cursor for a (day number, id) page key"""
+    raw = json.dumps(list(key), separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(value):
+    """Page key from a cursor, or None when missing; ValueError when malformed"""
+    if not value:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(value + '=' * (-len(value) % 4))
+        day, event_id = json.loads(raw)
+        return int(day), str(event_id)
+    except Exception:
+        raise ValueError('invalid cursor')
+
+
+def project(index, row, fields):
+    """One event as a dict, whole or reduced to the requested fields"""
+    event = index.events[row]
+    if fields is None:
+        return event
+    record = {}
+    for field in fields:
+        if field == 'category':
+            record[field] = index.category_title(row)
+        elif field == 'date':
+            date = index.dates[row]
+            record[field] = None if np.isnat(date) else str(date)
+        elif field == 'coordinates':
+            lon, lat = index.lons[row], index.lats[row]
+            record[field] = None if np.isnan(lon) else [float(lon), float(lat)]
+        elif field == 'magnitude':
+            magnitude = index.magnitudes[row]
+            record[field] = None if np.isnan(magnitude) else float(magnitude)
+        else:
+            record[field] = event.get(field)
+    return record
+
+
+def _dumps(value):
+    return json.dumps(value, separators=(',', ':'))
+
+
+def _chunks(parts, fields):
+    for index, rows in parts:
+        for start in range(0, len(rows), CHUNK_SIZE):
+            yield [_dumps(project(index, row, fields)) for row in rows[start:start + CHUNK_SIZE]]
+
+
+def stream_json(parts, fields=None, next_cursor=None):
+    """Yield {"events": [...], "next_cursor": ...} in chunks of CHUNK_SIZE events
+
+    parts is an iterable of (index, rows) pairs, streamed one after the other.
+    """
+    yield '{"events":['
+    first = True
+    for chunk in _chunks(parts, fields):
+        yield ('' if first else ',') + ','.join(chunk)
+        first = False
+    yield '],"next_cursor":' + _dumps(next_cursor) + '}\n'
+
+
+def stream_ndjson(parts, fields=None):
+    """Yield one JSON event per line of the (index, rows) parts, in chunks of CHUNK_SIZE events"""
+    for chunk in _chunks(parts, fields):
+        yield '\n'.join(chunk) + '\n'
@@ -0,0 +1,314 @@
+import numpy as np
+
+from countries import country_lookup
+from event_store import EventStore
+from geo import SpatialGrid
+from tracks import Tracks
+
+
+def resolve_magnitude(event):
+    """Resolve the magnitude of an event, preferring the root value over geometries"""
+    # Try to get magnitude from event root
+    if 'magnitudeValue' in event:
+        try:
+            mag_value = event.get('magnitudeValue')
+            if mag_value is not None and str(mag_value).strip():
+                return float(mag_value)
+        except (ValueError, TypeError):
+            pass
+
+    # Try to get magnitude from geometry if not found in root
+    for geo in event.get('geometry') or []:
+        try:
+            mag_value = geo.get('magnitudeValue')
+            if mag_value is not None and str(mag_value).strip():
+                return float(mag_value)
+        except (ValueError, TypeError):
+            continue
+
+    return None
+
+
+def geometry_point(geometry):
+    """Get a representative (lon, lat) for a geometry, or None"""
+    coords = geometry.get('coordinates')
+    if not coords:
+        return None
+    try:
+        if geometry.get('type', 'Point') == 'Point':
+            return float(coords[0]), float(coords[1])
+        # Polygons are reduced to the mean of their outer ring
+        ring = np.asarray(coords[0], dtype=float)
+        return float(ring[:, 0].mean()), float(ring[:, 1].mean())
+    except (IndexError, TypeError, ValueError):
+        return None
+
+
+def point_magnitude(geo):
+    """Magnitude of one geometry point as a float, NaN when missing"""
+    try:
+        value = geo.get('magnitudeValue')
+        return float(value) if value is not None and str(value).strip() else np.nan
+    except (ValueError, TypeError):
+        return np.nan
+
+
+def parse_times(values):
+    """Parse YYYY-MM-DDTHH:MM:SS strings to datetime64[s], NaT where malformed"""
+    try:
+        return np.array(values, dtype='datetime64[s]')
+    except ValueError:
+        parsed = []
+        for value in values:
+            try:
+                parsed.append(np.datetime64(value, 's'))
+            except ValueError:
+                parsed.append(np.datetime64('NaT'))
+        return np.array(parsed, dtype='datetime64[s]')
+
+
+def parse_day(value):
+    """Parse a YYYY-MM-DD string to datetime64[D], or None when malformed"""
+    try:
+        return np.datetime64(str(value)[:10], 'D')
+    except ValueError:
+        return None
+
+
+class EventIndex:
+    """Columnar index over raw EONET events, built once per refresh
+
+    The events themselves are kept in a compact EventStore and handed out as
+    dicts rebuilt on access.
+    """
+
+    # Bumped whenever the stored columns change, so old disk snapshots are rebuilt
+    VERSION = 8
+    # Array attributes, everything a shared snapshot needs to map besides the events
+    COLUMNS = ('category_codes', 'magnitudes', 'lons', 'lats', 'dates', 'ids', 'id_order',
+               'country_rows', 'country_offsets')
+
+    def __init__(self, events):
+        events = list(events)
+        count = len(events)
+
+        self.category_ids = []
+        self.category_titles = []
+        self.category_codes = np.full(count, -1, dtype=np.int32)
+        self.magnitudes = np.full(count, np.nan)
+        self.lons = np.full(count, np.nan)
+        self.lats = np.full(count, np.nan)
+
+        codes = {}
+        dates = []
+        point_lons, point_lats, point_rows = [], [], []
+        point_dates, point_magnitudes = [], []
+        for row, event in enumerate(events):
+            geometry = event.get('geometry') or []
+            first = geometry[0] if geometry and isinstance(geometry[0], dict) else {}
+
+            date = first.get('date')
+            dates.append(date[:10] if isinstance(date, str) else 'NaT')
+
+            categories = event.get('categories') or []
+            if categories and isinstance(categories[0], dict) and 'id' in categories[0]:
+                category_id = categories[0]['id']
+                if category_id not in codes:
+                    codes[category_id] = len(self.category_ids)
+                    self.category_ids.append(category_id)
+                    self.category_titles.append(categories[0].get('title', category_id))
+                self.category_codes[row] = codes[category_id]
+
+            magnitude = resolve_magnitude(event)
+            if magnitude is not None:
+                self.magnitudes[row] = magnitude
+
+            point = geometry_point(first) if first else None
+            if point is not None:
+                self.lons[row], self.lats[row] = point
+
+            # Every geometry point goes into the spatial index and the track, not just the first
+            for geo in geometry:
+                point = geometry_point(geo) if isinstance(geo, dict) else None
+                if point is not None:
+                    point_lons.append(point[0])
+                    point_lats.append(point[1])
+                    point_rows.append(row)
+                    date = geo.get('date')
+                    point_dates.append(date[:19] if isinstance(date, str) else 'NaT')
+                    point_magnitudes.append(point_magnitude(geo))
+
+        self._category_lookup = codes
+        self.ids = np.array([str(event.get('id') or '') for event in events], dtype=str)
+        # Rows by id go through a sorted permutation rather than a dict, so the
+        # lookup is plain arrays that processes can share
+        self.id_order = np.argsort(self.ids, kind='stable')
+        self.dates = self._parse_dates(dates)
+        point_rows = np.array(point_rows, dtype=np.int64)
+        self._index_countries(point_lons, point_lats, point_rows)
+        self.spatial = SpatialGrid(point_lons, point_lats, point_rows)
+        self.tracks = Tracks(point_lons, point_lats, parse_times(point_dates), point_magnitudes,
+                             point_rows, count)
+        self.events = EventStore(events)
+
+    @classmethod
+    def from_columns(cls, events, columns, category_ids, category_titles, spatial, tracks):
+        """Rebuild an index around precomputed columns, e.g. memory-mapped ones"""
+        index = cls.__new__(cls)
+        index.events = events
+        for name in cls.COLUMNS:
+            setattr(index, name, columns[name])
+        index.category_ids = list(category_ids)
+        index.category_titles = list(category_titles)
+        index._category_lookup = {category_id: code
+                                  for code, category_id in enumerate(index.category_ids)}
+        index.spatial = spatial
+        index.tracks = tracks
+        return index
+
+    def _index_countries(self, lons, lats, rows):
+        """Rows with a geometry point in each country, as rows sorted by country with offsets"""
+        lookup = country_lookup()
+        codes = lookup.countries(lons, lats).astype(np.int64)
+        located = codes >= 0
+        pairs = np.unique(codes[located] * (len(self.ids) + 1) + rows[located])
+        self.country_rows = pairs % (len(self.ids) + 1)
+        self.country_offsets = np.searchsorted(pairs // (len(self.ids) + 1),
+                                               np.arange(len(lookup) + 1))
+
+    def country_filter_rows(self, countries):
+        """Sorted unique rows with a geometry point in any of the ISO alpha-3 codes"""
+        lookup = country_lookup()
+        codes = [lookup.code(code) for code in ((countries,) if isinstance(countries, str) else countries)]
+        slices = [self.country_rows[self.country_offsets[code]:self.country_offsets[code + 1]]
+                  for code in codes if 0 <= code < len(self.country_offsets) - 1]
+        if not slices:
+            return np.empty(0, dtype=np.int64)
+        return np.unique(np.concatenate(slices))
+
+    @staticmethod
+    def _parse_dates(dates):
+        """Vectorized date parsing, falling back per row on malformed strings"""
+        try:
+            return np.array(dates, dtype='datetime64[D]')
+        except ValueError:
+            parsed = [parse_day(date) for date in dates]
+            return np.array([np.datetime64('NaT') if d is None else d for d in parsed],
+                            dtype='datetime64[D]')
+
+    def __len__(self):
+        return len(self.events)
+
+    def row_of(self, event_id):
+        """Get the row of an event id, or None"""
+        if not isinstance(event_id, str) or not len(self.ids):
+            return None
+        position = np.searchsorted(self.ids, event_id, sorter=self.id_order)
+        if position < len(self.ids) and self.ids[self.id_order[position]] == event_id:
+            return int(self.id_order[position])
+        return None
+
+    def category_title(self, row):
+        """Category title of a row, or None when the event has no category"""
+        code = self.category_codes[row]
+        return self.category_titles[code] if code >= 0 else None
+
+    def category_code(self, category_id):
+        """Get the integer code for a category id, or -1 when unknown"""
+        return self._category_lookup.get(category_id, -1)
+
+    def mask(self, start_date=None, end_date=None, event_type=None,
+             min_magnitude=None, max_magnitude=None, rows=None):
+        """Build a boolean mask for the given filter criteria
+
+        The mask covers every event, or only the given rows when rows is set.
+        """
+        dates = self.dates if rows is None else self.dates[rows]
+        keep = np.ones(len(dates), dtype=bool)
+
+        # Apply date and type filters, events without a date never match
+        if start_date:
+            keep &= self._compare_dates(dates, start_date, np.greater_equal)
+        if end_date:
+            keep &= self._compare_dates(dates, end_date, np.less_equal)
+        if event_type:
+            code = self.category_code(event_type)
+            codes = self.category_codes if rows is None else self.category_codes[rows]
+            keep &= (codes == code) if code >= 0 else False
+
+        # Apply magnitude filters, events without magnitude are kept
+        if min_magnitude or max_magnitude:
+            magnitudes = self.magnitudes if rows is None else self.magnitudes[rows]
+            try:
+                if min_magnitude:
+                    keep &= ~(magnitudes < float(min_magnitude))
+                if max_magnitude:
+                    keep &= ~(magnitudes > float(max_magnitude))
+            except (ValueError, TypeError):
+                keep &= np.isnan(magnitudes)
+
+        return keep
+
+    def filter_rows(self, start_date=None, end_date=None, event_type=None,
+                    min_magnitude=None, max_magnitude=None, bbox=None, near=None,
+                    radius_km=None, country=None):
+        """Row numbers matching the filters, in upstream order
+
+        Spatial filters are answered by the grid first, so the remaining
+        filters only look at the nearby rows. country is one ISO alpha-3
+        code or a tuple of them, matching events with any geometry point there.
+        """
+        filters = dict(start_date=start_date, end_date=end_date, event_type=event_type,
+                       min_magnitude=min_magnitude, max_magnitude=max_magnitude)
+        if bbox is None and near is None and not country:
+            return np.flatnonzero(self.mask(**filters))
+
+        rows = self.country_filter_rows(country) if country else None
+        if bbox is not None:
+            boxed = self.spatial.query_bbox(bbox)
+            rows = boxed if rows is None else np.intersect1d(rows, boxed, assume_unique=True)
+        if near is not None:
+            nearby = self.spatial.query_radius(near[0], near[1], float(radius_km))
+            rows = nearby if rows is None else np.intersect1d(rows, nearby, assume_unique=True)
+        return rows[self.mask(rows=rows, **filters)]
+
+    def page(self, rows, limit=None, after=None):
+        """Order rows newest first by (date, id) and cut one page after a cursor key
+
+        after is the (day number, id) key of the last row already returned;
+        rows without a date sort last. Returns the page rows and the key of
+        its last row when more rows follow, otherwise None. Keys do not depend
+        on row positions, so a cursor stays valid across refreshes.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        days = self.dates[rows].astype(np.int64)  # NaT is the smallest int64
+        ids = self.ids[rows]
+        if after is not None:
+            day, event_id = after
+            keep = (days < day) | ((days == day) & (ids < event_id))
+            rows, days, ids = rows[keep], days[keep], ids[keep]
+
+        order = np.lexsort((ids, days))[::-1]
+        if limit is None or len(order) <= limit:
+            return rows[order], None
+        order = order[:limit]
+        last = order[-1]
+        return rows[order], (int(days[last]), str(ids[last]))
+
+    @staticmethod
+    def _compare_dates(dates, value, op):
+        """Compare a date column against a filter value"""
+        day = parse_day(value)
+        if day is not None:
+            return op(dates, day)
+        # Malformed filter values keep the historical string comparison
+        valid = ~np.isnat(dates)
+        return valid & op(dates.astype('U10'), str(value))
+
+    def select(self, mask):
+        """Map a row mask back to the raw events, preserving upstream order"""
+        return self.take(np.flatnonzero(mask))
+
+    def take(self, rows):
+        """Map row numbers back to the raw events"""
+        return self.events.take(rows)
@@ -0,0 +1,354 @@
+import gc
+import sys
+from collections.abc import Sequence
+from operator import attrgetter, itemgetter
+
+import numpy as np
+
+# Event keys held in EventRecord slots, anything else goes to record.extra
+ROOT_SLOTS = {
+    'id': 'id', 'title': 'title', 'description': 'description', 'link': 'link',
+    'closed': 'closed', 'categories': 'categories', 'sources': 'sources',
+    'magnitudeValue': 'magnitude_value', 'magnitudeUnit': 'magnitude_unit',
+}
+# Geometry point keys the typed arrays can hold
+POINT_ORDER = ('magnitudeValue', 'magnitudeUnit', 'date', 'type', 'coordinates')
+POINT_KEYS = frozenset(POINT_ORDER)
+
+# Point flags, set when the stored float was an int or a null upstream
+LON_INT, LAT_INT, MAGNITUDE_INT, MAGNITUDE_NONE, DATE_NONE = 1, 2, 4, 8, 16
+# Integers a float64 holds exactly
+MAX_EXACT_INT = 2 ** 53
+# Events rebuilt per batch when iterating the whole store
+ITER_CHUNK = 1000
+
+
+class EventRecord:
+    """Root fields of one event, geometry lives in the store's arrays"""
+
+    __slots__ = ('layout', 'extra') + tuple(ROOT_SLOTS.values())
+
+    def __init__(self, layout, values, extra):
+        self.layout = layout
+        self.extra = extra
+        for slot in ROOT_SLOTS.values():
+            setattr(self, slot, values.get(slot))
+
+
+def _exact_float(value):
+    """(float, is_int) for a JSON number a float64 holds exactly, otherwise None"""
+    if type(value) is float:
+        return value, False
+    if type(value) is int and -MAX_EXACT_INT <= value <= MAX_EXACT_INT:
+        return float(value), True
+    return None
+
+
+def _root_plan(layout):
+    """How to rebuild events of one key layout from their records
+
+    Returns a getter for all values in layout order, where the geometry is
+    filled in separately, the positions of extra keys and of the interned
+    category and source lists.
+    """
+    slots, geometry_at, extras, frozen = [], None, [], []
+    for at, key in enumerate(layout):
+        slot = ROOT_SLOTS.get(key)
+        if key == 'geometry':
+            geometry_at, slot = at, 'layout'
+        elif slot is None:
+            extras.append((at, key))
+            slot = 'layout'
+        elif slot in ('categories', 'sources'):
+            frozen.append(at)
+        slots.append(slot)
+    # The trailing 'layout' keeps attrgetter returning a tuple, zip drops it
+    return attrgetter(*slots, 'layout'), geometry_at, extras, frozen
+
+
+def _canonical_date(value):
+    """Whether a date looks like EONET's YYYY-MM-DDTHH:MM:SSZ"""
+    return isinstance(value, str) and len(value) == 20 and value[10] == 'T' and value[19] == 'Z'
+
+
+class EventStore(Sequence):
+    """Read-only sequence of events kept compact, rebuilt as the raw dicts on access
+
+    Root fields go into slotted EventRecords and geometry points into typed
+    arrays: lon/lat, epoch-second dates, magnitudes, unit codes and a layout
+    code per point, with offsets[row]:offsets[row + 1] giving an event's
+    points. Category and source lists, units and key layouts are interned, so
+    the events of one category share them. Points or events the arrays
+    cannot reproduce exactly are kept as they are.
+    """
+
+    def __init__(self, events=()):
+        self._interned = {}
+        self.layouts = []
+        self.units = []
+        self.records = []
+        self.raw_events = {}
+        self.raw_points = {}
+        layout_codes, unit_codes = {}, {}
+
+        offsets = [0]
+        lons, lats, magnitudes, units, point_layouts, flags = [], [], [], [], [], []
+        dates, dated, dated_points = [], [], []
+        for row, event in enumerate(events):
+            geometry = event.get('geometry', []) if isinstance(event, dict) else None
+            if not isinstance(geometry, list):
+                self.records.append(None)
+                self.raw_events[row] = event
+                offsets.append(offsets[-1])
+                continue
+
+            values, extra = {}, None
+            for key, value in event.items():
+                slot = ROOT_SLOTS.get(key)
+                if slot is not None:
+                    values[slot] = self._freeze(value) if slot in ('categories', 'sources') else value
+                elif key != 'geometry':
+                    extra = extra or {}
+                    extra[key] = value
+            self.records.append(EventRecord(self._intern(tuple(event)), values, extra))
+
+            for geo in geometry:
+                point = len(lons)
+                packed = self._pack_point(geo, unit_codes)
+                if packed is None:
+                    self.raw_points[point] = geo
+                    packed = (np.nan, np.nan, np.nan, -1, 0, None)
+                    code = -1
+                else:
+                    layout = tuple(geo)
+                    code = layout_codes.get(layout)
+                    if code is None:
+                        code = layout_codes[layout] = len(self.layouts)
+                        self.layouts.append(self._intern(layout))
+                lon, lat, magnitude, unit, flag, date = packed
+                lons.append(lon)
+                lats.append(lat)
+                magnitudes.append(magnitude)
+                units.append(unit)
+                point_layouts.append(code)
+                flags.append(flag)
+                if date is not None:
+                    dated.append(point)
+                    dates.append(date[:19])
+                    dated_points.append(geo)
+            offsets.append(len(lons))
+
+        self.offsets = np.array(offsets, dtype=np.int64)
+        self.lons = np.array(lons, dtype=np.float64)
+        self.lats = np.array(lats, dtype=np.float64)
+        self.magnitudes = np.array(magnitudes, dtype=np.float64)
+        self.unit_codes = np.array(units, dtype=np.int16)
+        self.point_layouts = np.array(point_layouts, dtype=np.int16)
+        self.flags = np.array(flags, dtype=np.uint8)
+        self.times = np.zeros(len(lons), dtype=np.int64)
+        self._set_times(np.array(dated, dtype=np.int64), dates, dated_points)
+        del self._interned
+
+    def _intern(self, value):
+        return self._interned.setdefault(value, value)
+
+    def _freeze(self, value):
+        """Interned tuple of key/value pairs for a list of flat dicts, else the value itself"""
+        if not isinstance(value, list):
+            return value
+        frozen = []
+        for item in value:
+            if not isinstance(item, dict):
+                return value
+            pairs = tuple(item.items())
+            if any(not isinstance(v, (str, int, float, type(None))) for _, v in pairs):
+                return value
+            frozen.append(pairs)
+        return self._intern(tuple(frozen))
+
+    def _pack_point(self, geo, unit_codes):
+        """(lon, lat, magnitude, unit code, flags, date) of a point, or None to keep it raw"""
+        if not isinstance(geo, dict) or not POINT_KEYS.issuperset(geo):
+            return None
+        if geo.get('type', 'Point') != 'Point':
+            return None
+        flag = 0
+        lon = lat = np.nan
+        if 'coordinates' in geo:
+            coords = geo['coordinates']
+            if not isinstance(coords, list) or len(coords) != 2:
+                return None
+            lon, lat = _exact_float(coords[0]), _exact_float(coords[1])
+            if lon is None or lat is None:
+                return None
+            flag |= LON_INT * lon[1] | LAT_INT * lat[1]
+            lon, lat = lon[0], lat[0]
+
+        magnitude = np.nan
+        value = geo.get('magnitudeValue')
+        if value is None:
+            flag |= MAGNITUDE_NONE
+        else:
+            exact = _exact_float(value)
+            if exact is None:
+                return None
+            magnitude = exact[0]
+            flag |= MAGNITUDE_INT * exact[1]
+
+        unit = geo.get('magnitudeUnit')
+        if unit is not None and not isinstance(unit, str):
+            return None
+        code = unit_codes.get(unit)
+        if code is None:
+            code = unit_codes[unit] = len(self.units)
+            self.units.append(sys.intern(unit) if unit is not None else None)
+
+        date = geo.get('date')
+        if date is None:
+            flag |= DATE_NONE
+        elif not _canonical_date(date):
+            return None
+        return lon, lat, magnitude, code, flag, date
+
+    def _set_times(self, points, dates, geos):
+        """Parse point dates to epoch seconds, keeping points whose date would not round-trip"""
+        if not len(points):
+            return
+        try:
+            parsed = np.array(dates, dtype='datetime64[s]')
+        except ValueError:
+            parsed = np.array([self._parse_date(date) for date in dates], dtype='datetime64[s]')
+        exact = np.datetime_as_string(parsed, unit='s') == np.array(dates)
+        self.times[points[exact]] = parsed[exact].astype(np.int64)
+        for position in np.flatnonzero(~exact).tolist():
+            point = int(points[position])
+            self.raw_points[point] = geos[position]
+            self.point_layouts[point] = -1
+
+    @staticmethod
+    def _parse_date(date):
+        try:
+            return np.datetime64(date, 's')
+        except ValueError:
+            return np.datetime64('NaT')
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return self.take(range(*row.indices(len(self))))
+        row = int(row)
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError('event row out of range')
+        return self.take([row])[0]
+
+    def __iter__(self):
+        for start in range(0, len(self), ITER_CHUNK):
+            yield from self.take(range(start, min(start + ITER_CHUNK, len(self))))
+
+    def take(self, rows):
+        """Rebuild the events at the given rows, converting their points in bulk"""
+        # Rebuilding allocates only containers that live on, collector passes
+        # triggered meanwhile find nothing to free and cost a third of the time
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            return self._take(np.asarray(rows, dtype=np.int64))
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+
+    def _take(self, rows):
+        starts = self.offsets[rows]
+        counts = self.offsets[rows + 1] - starts
+        points = np.arange(counts.sum()) + np.repeat(starts - (np.cumsum(counts) - counts), counts)
+        geometries = self._points(points)
+
+        events = []
+        position = 0
+        plans = {}
+        for row, count in zip(rows.tolist(), counts.tolist()):
+            record = self.records[row]
+            if record is None:
+                events.append(self.raw_events[row])
+                continue
+            plan = plans.get(record.layout)
+            if plan is None:
+                plan = plans[record.layout] = _root_plan(record.layout)
+            fetch, geometry_at, extras, frozen = plan
+            values = list(fetch(record))
+            for at in frozen:
+                if isinstance(values[at], tuple):
+                    values[at] = [dict(pairs) for pairs in values[at]]
+            for at, key in extras:
+                values[at] = record.extra[key]
+            if geometry_at is not None:
+                values[geometry_at] = geometries[position:position + count]
+            events.append(dict(zip(record.layout, values)))
+            position += count
+        return events
+
+    def _points(self, points):
+        """Geometry point dicts at the given point positions"""
+        if not len(points):
+            return []
+        coordinates = np.stack([self.lons[points], self.lats[points]], axis=1).tolist()
+        magnitudes = self.magnitudes[points].tolist()
+        dates = np.char.add(np.datetime_as_string(self.times[points].astype('datetime64[s]'),
+                                                  unit='s'), 'Z').tolist()
+        units = np.array(self.units + [None], dtype=object)[self.unit_codes[points]].tolist()
+        flags = self.flags[points]
+        for i in np.flatnonzero(flags).tolist():
+            flag = int(flags[i])
+            if flag & LON_INT:
+                coordinates[i][0] = int(coordinates[i][0])
+            if flag & LAT_INT:
+                coordinates[i][1] = int(coordinates[i][1])
+            if flag & MAGNITUDE_NONE:
+                magnitudes[i] = None
+            elif flag & MAGNITUDE_INT:
+                magnitudes[i] = int(magnitudes[i])
+            if flag & DATE_NONE:
+                dates[i] = None
+
+        # Picks each layout's keys, in its order, from the values tuple below
+        fetchers = [itemgetter(*(POINT_ORDER.index(key) for key in layout), 0)
+                    for layout in self.layouts]
+        layouts = self.layouts
+        geometry = []
+        for i, code in enumerate(self.point_layouts[points].tolist()):
+            if code < 0:
+                geometry.append(self.raw_points[int(points[i])])
+                continue
+            values = (magnitudes[i], units[i], dates[i], 'Point', coordinates[i])
+            geometry.append(dict(zip(layouts[code], fetchers[code](values))))
+        return geometry
+
+    def __getstate__(self):
+        # Records are pickled column by column, much faster to load than one object each
+        state = dict(self.__dict__)
+        records = state.pop('records')
+        state['record_columns'] = {slot: [getattr(record, slot) if record is not None else None
+                                          for record in records]
+                                   for slot in EventRecord.__slots__}
+        state['record_rows'] = [record is not None for record in records]
+        return state
+
+    def __setstate__(self, state):
+        columns = state.pop('record_columns')
+        present = state.pop('record_rows')
+        self.__dict__.update(state)
+        slots = EventRecord.__slots__
+        records = []
+        for row, values in enumerate(zip(*(columns[slot] for slot in slots))):
+            if not present[row]:
+                records.append(None)
+                continue
+            record = EventRecord.__new__(EventRecord)
+            for slot, value in zip(slots, values):
+                setattr(record, slot, value)
+            records.append(record)
+        self.records = records
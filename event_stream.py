@@ -0,0 +1,283 @@
+"""Server-Sent Events carrying what changed in each data refresh
+
+EONETData appends one delta per refresh to a DeltaLog. Clients are only
+ever positioned in the log by sequence number, so a slow client holds no
+buffered copies: it reads on from where it is once it catches up, and when
+it has fallen further behind than the log keeps, it is told to reload.
+StreamHub serves the log to any number of clients from one asyncio thread.
+"""
+import asyncio
+import json
+import threading
+import time
+from collections import deque
+from urllib.parse import parse_qs, urlsplit
+
+from time_series import parse_categories
+
+# Seconds between comment lines that keep idle connections open through proxies
+HEARTBEAT = 15.0
+# Reconnection delay suggested to EventSource, in milliseconds
+RETRY_MS = 5000
+SUMMARY_FIELDS = ('categories', 'magnitudes', 'daily_counts')
+EVENT_CHANGES = ('added', 'updated', 'closed', 'removed')
+
+
+def summary_delta(old, new):
+    """Summary counters of new that differ from old, removed keys as 0"""
+    delta = {}
+    if old.get('event_count') != new.get('event_count'):
+        delta['event_count'] = new.get('event_count', 0)
+    for field in SUMMARY_FIELDS:
+        before, after = old.get(field, {}), new.get(field, {})
+        changed = {key: value for key, value in after.items() if before.get(key) != value}
+        changed.update({key: 0 for key in before if key not in after})
+        if changed:
+            delta[field] = changed
+    return delta
+
+
+def filter_delta(delta, categories):
+    """The delta as seen by a client following only the given category ids
+
+    Event changes of other categories are dropped; summary counters are
+    always kept. Returns None when nothing is left to send.
+    """
+    if not categories:
+        return delta
+    wanted = set(categories)
+    filtered = {key: [item for item in delta[key] if item['properties']['category_id'] in wanted]
+                for key in EVENT_CHANGES if key in delta}
+    if not any(filtered.values()) and not delta.get('summary') and not delta.get('reload'):
+        return None
+    return dict(delta, **filtered)
+
+
+def format_event(event, data, event_id=None):
+    """One SSE message as bytes"""
+    lines = [f"event: {event}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"data: {json.dumps(data, separators=(',', ':'))}")
+    return ('\n'.join(lines) + '\n\n').encode()
+
+
+class DeltaEntry:
+    """A logged delta with its encoded messages per category filter"""
+
+    def __init__(self, seq, event_id, delta):
+        self.seq = seq
+        self.event_id = event_id
+        self.delta = delta
+        self._encoded = {}
+
+    def encode(self, categories=()):
+        """SSE message for clients with this filter, b'' when it has nothing for them"""
+        encoded = self._encoded.get(categories)
+        if encoded is None:
+            delta = filter_delta(self.delta, categories)
+            encoded = b'' if delta is None else format_event('delta', delta, self.event_id)
+            # Shared by every client with the same filter; a racing duplicate is harmless
+            self._encoded[categories] = encoded
+        return encoded
+
+
+class DeltaLog:
+    """Ring buffer of the last deltas, addressed by SSE event ids
+
+    Ids are '<epoch>-<seq>': the epoch is the log's creation time, so ids
+    from before a restart are recognised as unresumable rather than
+    matched against a new sequence.
+    """
+
+    def __init__(self, size=64):
+        self.epoch = f"{time.time_ns():x}"
+        self.entries = deque(maxlen=size)
+        self.seq = 0
+        self.condition = threading.Condition()
+        self.listeners = []
+
+    def append(self, delta):
+        """Log a delta and wake every waiting stream"""
+        with self.condition:
+            self.seq += 1
+            entry = DeltaEntry(self.seq, self.event_id(self.seq), delta)
+            self.entries.append(entry)
+            self.condition.notify_all()
+        for listener in list(self.listeners):
+            listener()
+        return entry
+
+    def event_id(self, seq):
+        return f"{self.epoch}-{seq}"
+
+    def position(self, last_event_id):
+        """Sequence number a client resuming after last_event_id has seen, None when unknown
+
+        Clients without an id start from now.
+        """
+        if not last_event_id:
+            return self.seq
+        epoch, _, seq = last_event_id.strip().rpartition('-')
+        if epoch != self.epoch or not seq.isdigit() or int(seq) > self.seq:
+            return None
+        return int(seq)
+
+    def after(self, seq):
+        """Entries newer than seq, or None when some of them are no longer kept"""
+        with self.condition:
+            if seq is None:
+                return None
+            if seq >= self.seq:
+                return []
+            if not self.entries or self.entries[0].seq > seq + 1:
+                return None
+            return [entry for entry in self.entries if entry.seq > seq]
+
+    def wait(self, seq, timeout):
+        """Block until there is an entry newer than seq, or timeout"""
+        with self.condition:
+            return self.condition.wait_for(lambda: self.seq > seq, timeout)
+
+    def reset_message(self):
+        """Tells a client to reload everything and resume from the latest entry"""
+        return format_event('reset', {}, self.event_id(self.seq))
+
+    def messages(self, seq, categories=()):
+        """(messages to send, new position) for a client at seq"""
+        entries = self.after(seq)
+        if entries is None:
+            return [self.reset_message()], self.seq
+        messages = [message for message in (entry.encode(categories) for entry in entries) if message]
+        return messages, entries[-1].seq if entries else seq
+
+    def stream(self, last_event_id=None, categories=(), heartbeat=HEARTBEAT):
+        """Blocking SSE generator for one client, for servers with a thread per request"""
+        seq = self.position(last_event_id)
+        yield f"retry: {RETRY_MS}\n\n".encode()
+        if seq is not None and not last_event_id:
+            yield format_event('ready', {}, self.event_id(seq))
+        while True:
+            messages, seq = self.messages(seq, categories)
+            for message in messages:
+                yield message
+            if not self.wait(seq, heartbeat):
+                yield b': keep-alive\n\n'
+
+
+class StreamHub:
+    """Serves GET /api/stream from a DeltaLog to many clients on one asyncio thread
+
+    Each client costs a coroutine and its socket buffers. Writes wait for the
+    socket to drain, so a slow client simply lags in the log; one that takes
+    longer than stall_timeout to accept a message is disconnected, and
+    EventSource reconnects it with Last-Event-ID.
+    """
+
+    PATH = '/api/stream'
+
+    def __init__(self, log, host='0.0.0.0', port=5001, heartbeat=HEARTBEAT, stall_timeout=30.0):
+        self.log = log
+        self.host = host
+        self.port = port
+        self.heartbeat = heartbeat
+        self.stall_timeout = stall_timeout
+        self.clients = set()
+        self.loop = None
+        self.server = None
+        self._thread = None
+        self._ready = threading.Event()
+
+    def start(self):
+        """Start serving in a daemon thread, returning once listening"""
+        self._thread = threading.Thread(target=self._run, name='stream-hub', daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        self.log.listeners.append(self._wake)
+        return self
+
+    def stop(self):
+        if self._wake in self.log.listeners:
+            self.log.listeners.remove(self._wake)
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._thread.join(5)
+
+    def _run(self):
+        self.loop = asyncio.new_event_loop()
+        self.server = self.loop.run_until_complete(
+            asyncio.start_server(self._handle, self.host, self.port, backlog=1024))
+        self.port = self.server.sockets[0].getsockname()[1]
+        self._ready.set()
+        try:
+            self.loop.run_forever()
+        finally:
+            self.server.close()
+            tasks = asyncio.all_tasks(self.loop)
+            for task in tasks:
+                task.cancel()
+            self.loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            self.loop.close()
+
+    def _wake(self):
+        self.loop.call_soon_threadsafe(self._notify)
+
+    def _notify(self):
+        for wake in self.clients:
+            wake.set()
+
+    async def _read_request(self, reader):
+        """(path, query, headers) of the request line and headers"""
+        head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), 10)
+        lines = head.decode('latin-1').split('\r\n')
+        method, target, _ = lines[0].split(' ', 2)
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+        url = urlsplit(target)
+        return method, url.path, parse_qs(url.query), headers
+
+    async def _handle(self, reader, writer):
+        wake = asyncio.Event()
+        try:
+            try:
+                method, path, query, headers = await self._read_request(reader)
+            except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError,
+                    ValueError):
+                return
+            if method != 'GET' or path != self.PATH:
+                writer.write(b'HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\nConnection: close\r\n\r\n')
+                await writer.drain()
+                return
+
+            self.clients.add(wake)
+            categories = parse_categories(query.get('category', []))
+            last_event_id = headers.get('last-event-id') or (query.get('lastEventId') or [None])[0]
+            writer.write(b'HTTP/1.1 200 OK\r\n'
+                         b'Content-Type: text/event-stream\r\n'
+                         b'Cache-Control: no-cache\r\n'
+                         b'X-Accel-Buffering: no\r\n'
+                         b'Connection: close\r\n\r\n')
+            writer.write(f"retry: {RETRY_MS}\n\n".encode())
+            seq = self.log.position(last_event_id)
+            if seq is not None and not last_event_id:
+                writer.write(format_event('ready', {}, self.log.event_id(seq)))
+
+            while True:
+                wake.clear()
+                messages, seq = self.log.messages(seq, categories)
+                for message in messages:
+                    writer.write(message)
+                await asyncio.wait_for(writer.drain(), self.stall_timeout)
+                if seq >= self.log.seq:
+                    try:
+                        await asyncio.wait_for(wake.wait(), self.heartbeat)
+                    except asyncio.TimeoutError:
+                        writer.write(b': keep-alive\n\n')
+        except (ConnectionError, asyncio.TimeoutError, asyncio.CancelledError):
+            # Cancelled when the hub stops; the connection is closed either way
+            pass
+        finally:
+            self.clients.discard(wake)
+            writer.close()
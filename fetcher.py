@@ -0,0 +1,39 @@
+"""Fetch EONET data for a pool of web workers
+
+One fetcher publishes the shared snapshot that any number of worker processes
+map read-only:
+
+    EONET_ROLE=fetcher python fetcher.py
+    EONET_ROLE=worker gunicorn -w 4 -b 0.0.0.0:5000 app:app
+
+Workers must not be preloaded (no gunicorn --preload), each one starts its own
+thread watching for new versions. Workers have no refreshes to report, so the
+fetcher also serves /api/stream on EONET_STREAM_PORT when it is set, for the
+proxy to route that path to.
+"""
+import os
+import signal
+import threading
+
+os.environ.setdefault('EONET_ROLE', 'fetcher')
+
+from app import eonet_data  # noqa: E402
+from event_stream import StreamHub  # noqa: E402
+
+
+def main():
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *args: stop.set())
+    signal.signal(signal.SIGINT, lambda *args: stop.set())
+    hub = None
+    if os.environ.get('EONET_STREAM_PORT'):
+        hub = StreamHub(eonet_data.delta_log, port=int(os.environ['EONET_STREAM_PORT'])).start()
+    while not stop.wait(1):
+        pass
+    if hub is not None:
+        hub.stop()
+    eonet_data.stop_refresher()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,184 @@
+import numpy as np
+
+# Zoom level from which individual events are returned instead of clusters
+CLUSTER_MAX_ZOOM = 8
+# Grid cells per 256px map tile, i.e. clusters are roughly 64px apart
+CELLS_PER_TILE = 4
+
+
+def parse_bbox(value):
+    """Parse 'west,south,east,north' into floats, or None when missing
+
+    Raises ValueError for malformed boxes. west may exceed east for boxes
+    crossing the antimeridian.
+    """
+    if not value:
+        return None
+    parts = [float(part) for part in str(value).split(',')]
+    if len(parts) != 4:
+        raise ValueError('bbox must be west,south,east,north')
+    west, south, east, north = parts
+    if south > north:
+        raise ValueError('bbox south must not exceed north')
+    return west, south, east, north
+
+
+def bbox_mask(lons, lats, bbox):
+    """Boolean mask of points inside a bbox, handling antimeridian crossing"""
+    if bbox is None:
+        return np.ones(len(lons), dtype=bool)
+    west, south, east, north = bbox
+    inside = (lats >= south) & (lats <= north)
+    if west <= east:
+        return inside & (lons >= west) & (lons <= east)
+    return inside & ((lons >= west) | (lons <= east))
+
+
+def grid_cell_size(zoom):
+    """Cluster grid cell size in degrees for a map zoom level"""
+    return 360.0 / (2 ** max(0, zoom) * CELLS_PER_TILE)
+
+
+def grid_clusters(lons, lats, magnitudes, zoom):
+    """Aggregate points into grid cells sized for the zoom level
+
+    Returns per-cluster arrays (lon, lat, count, max_magnitude, first_row),
+    where lon/lat are the mean position of the members, max_magnitude is NaN
+    when no member has one and first_row indexes the input arrays.
+    """
+    if len(lons) == 0:
+        empty = np.empty(0)
+        return empty, empty, np.empty(0, dtype=np.int64), empty, np.empty(0, dtype=np.int64)
+
+    size = grid_cell_size(zoom)
+    columns = int(np.ceil(360.0 / size)) + 1
+    cx = np.floor((lons + 180.0) / size).astype(np.int64)
+    cy = np.floor((lats + 90.0) / size).astype(np.int64)
+    cells, first_row, members = np.unique(cy * columns + cx, return_index=True,
+                                          return_inverse=True)
+
+    counts = np.bincount(members)
+    lon = np.bincount(members, weights=lons) / counts
+    lat = np.bincount(members, weights=lats) / counts
+
+    max_magnitude = np.full(len(cells), -np.inf)
+    np.maximum.at(max_magnitude, members, np.where(np.isnan(magnitudes), -np.inf, magnitudes))
+    max_magnitude[np.isneginf(max_magnitude)] = np.nan
+
+    return lon, lat, counts, max_magnitude, first_row
+
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def parse_point(value):
+    """Parse 'lat,lon' into floats, or None when missing"""
+    if not value:
+        return None
+    parts = [float(part) for part in str(value).split(',')]
+    if len(parts) != 2 or not -90 <= parts[0] <= 90:
+        raise ValueError('near must be lat,lon')
+    return parts[0], parts[1]
+
+
+def haversine_km(lat, lon, lats, lons):
+    """Great-circle distance in km from one point to arrays of points"""
+    lat1, lon1 = np.radians(lat), np.radians(lon)
+    lat2, lon2 = np.radians(lats), np.radians(lons)
+    a = (np.sin((lat2 - lat1) / 2) ** 2
+         + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+class SpatialGrid:
+    """Uniform lat/lon grid over points, each point tagged with the row it belongs to
+
+    Points are sorted by cell id so every latitude band of a box is one
+    contiguous slice; queries cost one binary search per band plus the
+    number of candidate points.
+    """
+
+    ARRAYS = ('cells', 'lons', 'lats', 'rows')
+
+    def __init__(self, lons, lats, rows, cell_size=1.0):
+        self._set_cell_size(cell_size)
+
+        lons = np.asarray(lons, dtype=float)
+        lats = np.asarray(lats, dtype=float)
+        valid = ~(np.isnan(lons) | np.isnan(lats))
+        lons, lats = lons[valid], lats[valid]
+        rows = np.asarray(rows)[valid]
+
+        cells = self._band(lats) * self.columns + self._column(lons)
+        order = np.argsort(cells, kind='stable')
+        self.cells = cells[order]
+        self.lons = lons[order]
+        self.lats = lats[order]
+        self.rows = rows[order]
+
+    @classmethod
+    def from_arrays(cls, arrays, cell_size=1.0):
+        """Grid over already sorted arrays, e.g. memory-mapped from a shared snapshot"""
+        grid = cls.__new__(cls)
+        grid._set_cell_size(cell_size)
+        for name in cls.ARRAYS:
+            setattr(grid, name, arrays[name])
+        return grid
+
+    def _set_cell_size(self, cell_size):
+        self.cell_size = cell_size
+        self.columns = int(np.ceil(360.0 / cell_size))
+        self.bands = int(np.ceil(180.0 / cell_size))
+
+    def __len__(self):
+        return len(self.cells)
+
+    def _column(self, lons):
+        return np.clip(np.floor((np.asarray(lons) + 180.0) / self.cell_size),
+                       0, self.columns - 1).astype(np.int64)
+
+    def _band(self, lats):
+        return np.clip(np.floor((np.asarray(lats) + 90.0) / self.cell_size),
+                       0, self.bands - 1).astype(np.int64)
+
+    def _candidates(self, west, south, east, north):
+        """Positions of points in cells touching the box (west > east wraps)"""
+        bands = np.arange(self._band(south), self._band(north) + 1)
+        if west <= east:
+            spans = [(self._column(west), self._column(east))]
+        else:
+            spans = [(self._column(west), self.columns - 1), (0, self._column(east))]
+
+        positions = []
+        for first, last in spans:
+            starts = np.searchsorted(self.cells, bands * self.columns + first, side='left')
+            ends = np.searchsorted(self.cells, bands * self.columns + last, side='right')
+            positions.extend(np.arange(start, end) for start, end in zip(starts, ends) if end > start)
+        if not positions:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate(positions)
+
+    def query_bbox(self, bbox):
+        """Sorted unique rows with at least one point inside the bbox"""
+        west, south, east, north = bbox
+        candidates = self._candidates(west, south, east, north)
+        inside = bbox_mask(self.lons[candidates], self.lats[candidates], bbox)
+        return np.unique(self.rows[candidates[inside]])
+
+    def query_radius(self, lat, lon, radius_km):
+        """Sorted unique rows with at least one point within radius_km of (lat, lon)"""
+        angle = radius_km / EARTH_RADIUS_KM
+        dlat = np.degrees(angle)
+        south, north = max(-90.0, lat - dlat), min(90.0, lat + dlat)
+        # Widest longitude extent of the circle; around a pole it spans them all
+        ratio = np.sin(angle) / np.cos(np.radians(lat))
+        if north >= 90.0 or south <= -90.0 or angle >= np.pi / 2 or ratio >= 1.0:
+            west, east = -180.0, 180.0
+        else:
+            dlon = np.degrees(np.arcsin(ratio))
+            west = (lon - dlon + 180.0) % 360.0 - 180.0
+            east = (lon + dlon + 180.0) % 360.0 - 180.0
+
+        candidates = self._candidates(west, south, east, north)
+        distances = haversine_km(lat, lon, self.lats[candidates], self.lons[candidates])
+        return np.unique(self.rows[candidates[distances <= radius_km]])
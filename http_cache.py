@@ -0,0 +1,93 @@
+import gzip
+import hashlib
+import threading
+import zlib
+
+try:
+    import brotli
+except ImportError:  # optional, gzip only without it
+    brotli = None
+
+# Smaller bodies are not worth the compression header and CPU
+MIN_COMPRESS_SIZE = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 6
+
+
+def normalized_query(args):
+    """Sorted (name, value) pairs of a query, ignoring blank values and surrounding spaces"""
+    pairs = []
+    for name, values in args.lists():
+        for value in values:
+            value = value.strip()
+            if value:
+                pairs.append((name, value))
+    return tuple(sorted(pairs))
+
+
+def data_etag(*parts):
+    """Strong ETag of a response from what determines its body, such as the data and the query
+
+    Computed without the body, so a revalidation is answered before any work.
+    """
+    return hashlib.blake2b(repr(parts).encode(), digest_size=16).hexdigest()
+
+
+def available_encodings():
+    """Content codings this process can produce, preferred first"""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def choose_encoding(accept_encodings, size):
+    """Best content coding the client accepts for a body of size bytes, or 'identity'
+
+    accept_encodings is a werkzeug Accept object (request.accept_encodings).
+    """
+    if size < MIN_COMPRESS_SIZE:
+        return 'identity'
+    for encoding in available_encodings():
+        if accept_encodings.quality(encoding) > 0:
+            return encoding
+    return 'identity'
+
+
+def gzip_stream(chunks, level=GZIP_LEVEL):
+    """Gzip a stream of byte chunks on the fly, holding only the compressor's window"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+class EncodedBody:
+    """A response body, compressed at most once per coding"""
+
+    __slots__ = ('body', 'content_type', '_encoded', '_lock')
+
+    def __init__(self, body, content_type):
+        self.body = body
+        self.content_type = content_type
+        self._encoded = {'identity': body}
+        self._lock = threading.Lock()
+
+    def encoded(self, encoding):
+        """Body bytes in the given content coding, compressed on first use"""
+        data = self._encoded.get(encoding)
+        if data is not None:
+            return data
+        with self._lock:
+            if encoding not in self._encoded:
+                if encoding == 'gzip':
+                    # mtime=0 keeps the compressed bytes reproducible
+                    self._encoded[encoding] = gzip.compress(self.body, GZIP_LEVEL, mtime=0)
+                elif encoding == 'br' and brotli is not None:
+                    self._encoded[encoding] = brotli.compress(self.body, quality=BROTLI_QUALITY)
+                else:
+                    raise ValueError(f"unsupported content coding {encoding}")
+            return self._encoded[encoding]
+
+    def sizes(self):
+        """Bytes held per content coding"""
+        return {encoding: len(data) for encoding, data in self._encoded.items()}
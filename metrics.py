@@ -0,0 +1,245 @@
+import bisect
+import contextvars
+import logging
+import math
+import os
+import threading
+import time
+from contextlib import nullcontext
+
+# Upper bounds in seconds, from cache hits to a slow upstream pull
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Route of the request being served; work outside a request is 'background'
+current_route = contextvars.ContextVar('current_route', default='background')
+
+_DISABLED = nullcontext()
+
+try:
+    _PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+except (AttributeError, ValueError, OSError):
+    _PAGE_SIZE = 4096
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value):
+    if isinstance(value, int):
+        return str(value)
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value))
+
+
+def _format_labels(names, values):
+    if not names:
+        return ''
+    pairs = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return '{' + pairs + '}'
+
+
+class Metric:
+    """Base of the metric families, values are kept per tuple of label values"""
+
+    type = 'untyped'
+
+    def __init__(self, registry, name, documentation, labelnames=()):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self):
+        """(suffix, label names, label values, value) for every series"""
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in sorted(items):
+            yield '', self.labelnames, key, value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}",
+                 f"# TYPE {self.name} {self.type}"]
+        for suffix, names, values, value in self.samples():
+            lines.append(f"{self.name}{suffix}{_format_labels(names, values)} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        if not self.registry.enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """Gauge read from a callback at scrape time, series with a None value are skipped"""
+
+    type = 'gauge'
+
+    def __init__(self, registry, name, documentation, function):
+        super().__init__(registry, name, documentation)
+        self.function = function
+
+    def samples(self):
+        try:
+            value = self.function()
+        except Exception:
+            value = None
+        if value is not None:
+            yield '', (), (), value
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, registry, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(registry, name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        if not self.registry.enabled:
+            return
+        key = self._key(labels)
+        position = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                # Per-bucket counts (last one is +Inf), then sum
+                series = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][position] += 1
+            series[1] += value
+
+    def time(self, **labels):
+        """Context manager observing the duration of its block"""
+        if not self.registry.enabled:
+            return _DISABLED
+        return _Timer(self, labels)
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(counts), total) for key, (counts, total) in self._values.items()]
+        names = self.labelnames + ('le',)
+        for key, counts, total in sorted(items):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                yield '_bucket', names, key + (_format_value(float(bound)),), cumulative
+            yield '_sum', self.labelnames, key, total
+            yield '_count', self.labelnames, key, cumulative
+
+
+class _Timer:
+    __slots__ = ('histogram', 'labels', 'started')
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+
+
+class Registry:
+    """Metric families exposed together in the Prometheus text format
+
+    A disabled registry keeps its metrics but turns recording into a no-op.
+    """
+
+    CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._metrics = []
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(self, name, documentation, labelnames))
+
+    def gauge(self, name, documentation, function):
+        return self._register(Gauge(self, name, documentation, function))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(self, name, documentation, labelnames, buckets))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+def resident_memory_bytes():
+    """Current resident set size of this process, or None where /proc is unavailable"""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return pages * _PAGE_SIZE
+
+
+class LogSampler(logging.Filter):
+    """Let through one record per logger and message template every interval seconds
+
+    Suppressed repeats are counted and reported on the next record let through,
+    so a failing upstream or a hot loop cannot flood the log. Records of the
+    exempt loggers, such as access logs whose messages are all different, always
+    pass. At most MAX_KEYS templates are remembered; ones not seen for an
+    interval are forgotten first.
+    """
+
+    MAX_KEYS = 1000
+
+    def __init__(self, interval=60.0, clock=time.monotonic, exempt=('werkzeug',)):
+        super().__init__()
+        self.interval = interval
+        self.clock = clock
+        self.exempt = tuple(exempt)
+        self._last = {}  # (logger, level, template) -> (emitted_at, suppressed)
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if self.interval <= 0 or record.name.split('.')[0] in self.exempt:
+            return True
+        key = (record.name, record.levelno, str(record.msg))
+        now = self.clock()
+        with self._lock:
+            if key not in self._last and len(self._last) >= self.MAX_KEYS:
+                self._prune(now)
+            emitted_at, suppressed = self._last.get(key, (None, 0))
+            if emitted_at is not None and now - emitted_at < self.interval:
+                self._last[key] = (emitted_at, suppressed + 1)
+                return False
+            self._last[key] = (now, 0)
+        if suppressed:
+            record.msg = f"{record.msg} ({suppressed} similar suppressed)"
+        return True
+
+    def _prune(self, now):
+        """Forget templates outside their interval, then the oldest half if still full"""
+        self._last = {key: entry for key, entry in self._last.items()
+                      if now - entry[0] < self.interval}
+        if len(self._last) >= self.MAX_KEYS:
+            newest = sorted(self._last.items(), key=lambda item: item[1][0])[len(self._last) // 2:]
+            self._last = dict(newest)
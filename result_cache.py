@@ -0,0 +1,140 @@
+import functools
+import inspect
+import threading
+import time
+from collections import OrderedDict
+
+
+class _Pending:
+    """A computation in flight that other callers for the same key wait on"""
+
+    __slots__ = ('done', 'value', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class ResultCache:
+    """Bounded LRU cache with a TTL, coalescing concurrent misses on the same key
+
+    Cached values are shared between callers and must be treated as read-only.
+    """
+
+    def __init__(self, maxsize=256, ttl=300, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._pending = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get_or_compute(self, key, compute):
+        """Return the cached value for key, computing it at most once concurrently"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > self.clock():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+                self.expirations += 1
+
+            pending = self._pending.get(key)
+            leader = pending is None
+            if leader:
+                pending = self._pending[key] = _Pending()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            pending.done.wait()
+            if pending.error is not None:
+                raise pending.error
+            return pending.value
+
+        try:
+            value = compute()
+        except BaseException as e:
+            pending.error = e
+            with self._lock:
+                del self._pending[key]
+            pending.done.set()
+            raise
+
+        with self._lock:
+            self._entries[key] = (self.clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            del self._pending[key]
+        pending.value = value
+        pending.done.set()
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Counters for the status endpoint"""
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
+
+
+def _normalize(value):
+    """Treat blank strings like missing parameters and ignore surrounding spaces"""
+    if isinstance(value, str):
+        value = value.strip()
+        return value or None
+    return value
+
+
+def cached_method(name):
+    """Cache a method's result in self.result_cache, keyed by its arguments and self.data_version
+
+    Calls with unhashable arguments, or on objects without a cache, are not cached.
+    """
+    def decorate(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            cache = getattr(self, 'result_cache', None)
+            if cache is None:
+                return func(self, *args, **kwargs)
+
+            bound = signature.bind(self, *args, **kwargs)
+            bound.apply_defaults()
+            params = tuple((param, _normalize(value))
+                           for param, value in list(bound.arguments.items())[1:])
+            key = (name, self.data_version, params)
+            try:
+                hash(key)
+            except TypeError:
+                return func(self, *args, **kwargs)
+            return cache.get_or_compute(key, lambda: func(self, *args, **kwargs))
+
+        return wrapper
+    return decorate
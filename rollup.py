@@ -0,0 +1,525 @@
+from datetime import date as Date
+
+import numpy as np
+
+from countries import NO_COUNTRY, REGIONS, country_lookup
+from time_series import period_labels, period_matrix
+
+# Day number used for events without a usable first-geometry date
+NO_DAY = -(2 ** 40)
+EPOCH_ORDINAL = Date(1970, 1, 1).toordinal()
+
+MAGNITUDE_BANDS = ['low', 'medium', 'high']
+SEVERITY_GROUPS = ['wildfires', 'storms', 'volcanoes', 'earthquakes']
+WEEKDAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+# Magnitudes from which a severity group's events are medium and high:
+# acres burnt, knots, volcanic explosivity index and Richter magnitude
+SEVERITY_LEVELS = {'wildfires': (100, 500), 'storms': (34, 64), 'volcanoes': (2, 4),
+                   'earthquakes': (4, 6)}
+# Severity points per group served by default, and kept by summarized rollups
+SEVERITY_POINTS = 200
+
+
+def epoch_day(date):
+    """Days since 1970-01-01 for a YYYY-MM-DD string, or None"""
+    try:
+        return Date.fromisoformat(date[:10]).toordinal() - EPOCH_ORDINAL
+    except (ValueError, TypeError):
+        return None
+
+
+def day_labels(days):
+    """YYYY-MM-DD strings for an array of day numbers"""
+    return np.asarray(days, dtype=np.int64).astype('datetime64[D]').astype(str).tolist()
+
+
+def summary_record(event):
+    """(category id, category title, day, band) as counted by the summary statistics
+
+    Returns None for events the summary skips entirely. band is -1 when the
+    event is counted but its magnitude is unreadable.
+    """
+    try:
+        category = event['categories'][0]
+        title = category['title']
+    except Exception:
+        return None
+    category_id = category.get('id', title)
+
+    try:
+        date = event['geometry'][0]['date'][:10]
+    except Exception:
+        return category_id, title, None, -1
+    day = epoch_day(date)
+
+    try:
+        magnitude = None
+        # Check in event root, then in geometry
+        if 'magnitudeValue' in event and 'magnitudeUnit' in event:
+            magnitude = float(event['magnitudeValue'])
+        elif event.get('geometry', []):
+            for geo in event['geometry']:
+                if 'magnitudeValue' in geo and 'magnitudeUnit' in geo:
+                    magnitude = float(geo['magnitudeValue'])
+                    break
+    except Exception:
+        return category_id, title, day, -1
+
+    # Events without magnitude count as low
+    if magnitude is None or magnitude < 1.5:
+        band = 0
+    elif magnitude < 5.0:
+        band = 1
+    else:
+        band = 2
+    return category_id, title, day, band
+
+
+def analysis_record(event):
+    """(day, category titles, point, severity) as counted by the analysis data
+
+    Returns None for events the analysis skips. point is the (lon, lat) of the
+    first geometry, None when unusable, in which case weekday and severity
+    are skipped too; severity is (group, event_data) or None.
+    """
+    try:
+        date = event['geometry'][0]['date'][:10]
+        titles = [cat['title'] for cat in event['categories']]
+    except Exception:
+        return None
+    day = epoch_day(date)
+    if day is None:
+        return None
+
+    try:
+        lon, lat = event['geometry'][0]['coordinates'][:2]
+        point = float(lon), float(lat)
+    except Exception:
+        return day, titles, None, None
+
+    # Magnitude from the event root first, then the first geometry carrying one
+    magnitude_value = None
+    magnitude_unit = None
+    if 'magnitudeValue' in event:
+        magnitude_value = event['magnitudeValue']
+        magnitude_unit = event.get('magnitudeUnit', '')
+    if not magnitude_value and event.get('geometry'):
+        for geo in event['geometry']:
+            if 'magnitudeValue' in geo:
+                magnitude_value = geo['magnitudeValue']
+                magnitude_unit = geo.get('magnitudeUnit', '')
+                break
+
+    severity = None
+    if magnitude_value is not None:
+        try:
+            event_data = {
+                'date': date,
+                'magnitude': float(magnitude_value),
+                'unit': magnitude_unit,
+                'title': event.get('title', ''),
+                'description': event.get('description', '')
+            }
+        except (ValueError, TypeError):
+            event_data = None
+
+        group = None
+        if event_data is None:
+            pass
+        elif any('Wildfires' in cat for cat in titles):
+            group = 0
+        elif any(storm_type in cat for cat in titles
+                 for storm_type in ['Severe Storms', 'Tropical Cyclones']):
+            group = 1
+        elif any('Volcanoes' in cat for cat in titles):
+            group = 2
+        elif any('Earthquakes' in cat for cat in titles):
+            group = 3
+        if group is not None:
+            severity = (group, event_data)
+
+    return day, titles, point, severity
+
+
+def severity_level(group, magnitude):
+    """Level of a severity group's magnitude, 0 for low to 2 for high"""
+    medium, high = SEVERITY_LEVELS[SEVERITY_GROUPS[group]]
+    return 0 if magnitude < medium else 1 if magnitude < high else 2
+
+
+def downsample_points(points, max_points):
+    """At most max_points of date-sorted severity points
+
+    The series is cut into max_points // 2 equal stretches and the lowest and
+    highest magnitude of each is kept, so peaks survive the thinning.
+    """
+    if len(points) <= max_points:
+        return points
+    magnitudes = np.array([point['magnitude'] for point in points])
+    edges = np.linspace(0, len(points), max(max_points // 2, 1) + 1).astype(np.int64)
+    kept = []
+    for start, end in zip(edges[:-1].tolist(), edges[1:].tolist()):
+        if end > start:
+            stretch = magnitudes[start:end]
+            kept.extend(sorted({start + int(stretch.argmin()), start + int(stretch.argmax())}))
+    return [points[i] for i in kept]
+
+
+class Cube:
+    """Counts keyed by rows of small integers, stored as columns"""
+
+    def __init__(self, keys, counts):
+        self.keys = keys
+        self.counts = counts
+
+    @classmethod
+    def build(cls, width, keys, weights=None):
+        """Reduce a list of key tuples (with optional +/- weights) into a cube"""
+        keys = np.asarray(keys, dtype=np.int64).reshape(-1, width)
+        if weights is None:
+            weights = np.ones(len(keys), dtype=np.int64)
+        return cls._reduce(keys, np.asarray(weights, dtype=np.int64))
+
+    @classmethod
+    def _reduce(cls, keys, weights):
+        if len(keys) == 0:
+            return cls(keys, np.empty(0, dtype=np.int64))
+        unique, inverse = np.unique(keys, axis=0, return_inverse=True)
+        counts = np.bincount(inverse.ravel(), weights=weights, minlength=len(unique))
+        counts = np.rint(counts).astype(np.int64)
+        keep = counts != 0
+        return cls(unique[keep], counts[keep])
+
+    def plus(self, other):
+        """Bucket-wise sum with another cube of the same width"""
+        return self._reduce(np.concatenate([self.keys, other.keys]),
+                            np.concatenate([self.counts, other.counts]))
+
+    def __len__(self):
+        return len(self.counts)
+
+    def column(self, position):
+        return self.keys[:, position]
+
+
+def group_sum(keys, counts):
+    """Sum counts per distinct key, returning (sorted keys, sums)"""
+    if len(keys) == 0:
+        return keys, counts
+    unique, inverse = np.unique(keys, return_inverse=True)
+    return unique, np.bincount(inverse, weights=counts).astype(np.int64)
+
+
+class Rollup:
+    """Pre-aggregated counts behind the summary, trend and analysis endpoints
+
+    Built once per data version; queries only touch buckets, which number
+    days x categories x bands (or countries) rather than events. Severity
+    points are kept per event id since the endpoint returns them one by one,
+    so the rollup can be updated; summarized and combined rollups keep at
+    most SEVERITY_POINTS thinned points per group instead.
+    """
+
+    # Bumped whenever the buckets change, so pickled rollups are rebuilt
+    VERSION = 3
+
+    def __init__(self, events=()):
+        self.version = self.VERSION
+        self.event_count = 0
+        self.category_ids = []      # summary category code -> id
+        self.category_titles = {}   # id -> title
+        self.titles = []            # analysis title code -> title
+        self._id_codes = {}
+        self._title_codes = {}
+        self.summary = Cube.build(3, [])   # (category code, day, band)
+        self.days = Cube.build(3, [])      # (day, region, country) of analysed events
+        self.categories = Cube.build(2, [])  # (day, title code) per category
+        self.levels = Cube.build(3, [])    # (day, severity group, level)
+        self.severity = {}                 # event id -> (group, day, event_data)
+        self.severity_points = None        # group -> thinned points, once summarized
+        self._apply(events, 1)
+
+    def _intern_category(self, category_id, title):
+        if category_id not in self._id_codes:
+            self._id_codes[category_id] = len(self.category_ids)
+            self.category_ids.append(category_id)
+            self.category_titles[category_id] = title
+        return self._id_codes[category_id]
+
+    def _intern_title(self, title):
+        if title not in self._title_codes:
+            self._title_codes[title] = len(self.titles)
+            self.titles.append(title)
+        return self._title_codes[title]
+
+    def _apply(self, events, sign):
+        """Add (sign=1) or remove (sign=-1) the contributions of events"""
+        summary_keys, day_keys, category_keys, level_keys, points = [], [], [], [], []
+        count = 0
+        for event in events:
+            count += 1
+            record = summary_record(event)
+            if record is None:
+                # Still counted by trends when it has a date
+                category_id, day = None, self._first_day(event)
+                summary_keys.append((-1, NO_DAY if day is None else day, -1))
+            else:
+                category_id, title, day, band = record
+                code = self._intern_category(category_id, title)
+                summary_keys.append((code, NO_DAY if day is None else day, band))
+
+            record = analysis_record(event)
+            if record is None:
+                continue
+            day, titles, point, severity = record
+            day_keys.append(day)
+            points.append((np.nan, np.nan) if point is None else point)
+            category_keys.extend((day, self._intern_title(title)) for title in titles)
+            event_id = event.get('id')
+            if severity is not None:
+                level_keys.append((day, severity[0], severity_level(severity[0], severity[1]['magnitude'])))
+                if sign > 0:
+                    self.severity[event_id] = (severity[0], day, severity[1])
+                else:
+                    self.severity.pop(event_id, None)
+
+        # Countries are looked up for all the points at once; region -1 marks no point
+        lookup = country_lookup()
+        points = np.array(points, dtype=float).reshape(-1, 2)
+        countries = lookup.countries(points[:, 0], points[:, 1])
+        regions = np.where(np.isnan(points[:, 0]), -1, lookup.regions(countries))
+        day_keys = np.column_stack([np.array(day_keys, dtype=np.int64), regions, countries])
+
+        self.event_count += sign * count
+        self.summary = self.summary.plus(Cube.build(3, summary_keys, [sign] * len(summary_keys)))
+        self.days = self.days.plus(Cube.build(3, day_keys, [sign] * len(day_keys)))
+        self.categories = self.categories.plus(
+            Cube.build(2, category_keys, [sign] * len(category_keys)))
+        self.levels = self.levels.plus(Cube.build(3, level_keys, [sign] * len(level_keys)))
+
+    @staticmethod
+    def _first_day(event):
+        try:
+            return epoch_day(event['geometry'][0]['date'])
+        except Exception:
+            return None
+
+    @classmethod
+    def combine(cls, rollups, start_day=None, end_day=None):
+        """One rollup adding up several built apart, e.g. one per archive partition
+
+        Category and title codes are interned again so they line up. With a
+        day range only the buckets of those days are kept, and events
+        without a date are dropped. Severity points are merged as they come
+        and thinned to SEVERITY_POINTS per group, so the result is bounded
+        however many rollups are combined.
+        """
+        combined = cls()
+        summaries, days, categories = [combined.summary], [combined.days], [combined.categories]
+        levels = [combined.levels]
+        points = {name: [] for name in SEVERITY_GROUPS}
+        start = NO_DAY if start_day is None else start_day
+        for rollup in rollups:
+            codes = np.array([combined._intern_category(category_id, rollup.category_titles[category_id])
+                              for category_id in rollup.category_ids] + [-1], dtype=np.int64)
+            keys = rollup.summary.keys.copy()
+            keys[:, 0] = codes[keys[:, 0]]
+            summaries.append(Cube(keys, rollup.summary.counts))
+
+            titles = np.array([combined._intern_title(title) for title in rollup.titles],
+                              dtype=np.int64)
+            keys = rollup.categories.keys.copy()
+            keys[:, 1] = titles[keys[:, 1]]
+            categories.append(Cube(keys, rollup.categories.counts))
+            days.append(rollup.days)
+            levels.append(rollup.levels)
+
+            combined.event_count += rollup.event_count
+            for name, group_points in rollup.analysis_severity(start, end_day).items():
+                merged = points[name] + group_points
+                if len(merged) > 2 * SEVERITY_POINTS:
+                    merged = downsample_points(sorted(merged, key=lambda point: point['date']),
+                                               SEVERITY_POINTS)
+                points[name] = merged
+
+        def clip(cubes, column):
+            keys = np.concatenate([cube.keys for cube in cubes])
+            counts = np.concatenate([cube.counts for cube in cubes])
+            if start_day is not None or end_day is not None:
+                day = keys[:, column]
+                keep = day != NO_DAY
+                if start_day is not None:
+                    keep &= day >= start_day
+                if end_day is not None:
+                    keep &= day <= end_day
+                keys, counts = keys[keep], counts[keep]
+            return Cube._reduce(keys, counts)
+
+        combined.summary = clip(summaries, 1)
+        combined.days = clip(days, 0)
+        combined.categories = clip(categories, 0)
+        combined.levels = clip(levels, 0)
+        combined.severity_points = {
+            name: downsample_points(sorted(group_points, key=lambda point: point['date']),
+                                    SEVERITY_POINTS)
+            for name, group_points in points.items()}
+        if start_day is not None or end_day is not None:
+            # Every counted event has exactly one summary bucket
+            combined.event_count = int(combined.summary.counts.sum())
+        return combined
+
+    def summarized(self, max_points=SEVERITY_POINTS):
+        """Copy keeping at most max_points thinned severity points per group instead of one per event
+
+        For rollups that are stored and combined but never updated, like
+        those of archive partitions.
+        """
+        rollup = Rollup.__new__(Rollup)
+        rollup.__dict__.update(self.__dict__)
+        rollup.severity = {}
+        rollup.severity_points = {name: downsample_points(points, max_points)
+                                  for name, points in self.analysis_severity(NO_DAY).items()}
+        return rollup
+
+    def updated(self, removed=(), added=()):
+        """New rollup with removed events subtracted and added events counted"""
+        rollup = Rollup.__new__(Rollup)
+        rollup.__dict__.update(self.__dict__)
+        rollup.category_ids = list(self.category_ids)
+        rollup.category_titles = dict(self.category_titles)
+        rollup.titles = list(self.titles)
+        rollup._id_codes = dict(self._id_codes)
+        rollup._title_codes = dict(self._title_codes)
+        rollup.severity = dict(self.severity)
+        rollup._apply(removed, -1)
+        rollup._apply(added, 1)
+        return rollup
+
+    def summary_statistics(self):
+        """Payload of get_summary_statistics"""
+        code, day, band = (self.summary.column(i) for i in range(3))
+        counts = self.summary.counts
+        counted = code >= 0
+
+        categories = {}
+        codes, sums = group_sum(code[counted], counts[counted])
+        for c, total in zip(codes, sums):
+            title = self.category_titles[self.category_ids[c]]
+            categories[title] = categories.get(title, 0) + int(total)
+
+        dated = counted & (day != NO_DAY)
+        days, sums = group_sum(day[dated], counts[dated])
+
+        banded = counted & (band >= 0)
+        magnitudes = np.bincount(band[banded], weights=counts[banded], minlength=3)
+
+        return {
+            'event_count': self.event_count,
+            'categories': categories,
+            'magnitudes': {name: int(total) for name, total in zip(MAGNITUDE_BANDS, magnitudes)},
+            'daily_counts': dict(zip(day_labels(days), sums.tolist()))
+        }
+
+    def trend_matrix(self, category_ids, period='monthly'):
+        """(period labels, periods x categories counts) on one gap-filled calendar
+
+        Every category's buckets are counted in a single pass and the
+        requested columns picked afterwards; None selects all dated events.
+        The calendar spans the periods the selected series have events in.
+        """
+        code, day = self.summary.column(0), self.summary.column(1)
+        dated = day != NO_DAY
+        width = len(self.category_ids) + 1
+        calendar, by_code = period_matrix(day, np.where(dated, code + 1, -1),
+                                          self.summary.counts, width, period)
+        matrix = np.zeros((len(calendar), len(category_ids)), dtype=np.int64)
+        for column, category_id in enumerate(category_ids):
+            if category_id is None:
+                matrix[:, column] = by_code.sum(axis=1)
+            elif category_id in self._id_codes:
+                matrix[:, column] = by_code[:, self._id_codes[category_id] + 1]
+
+        used = np.flatnonzero(matrix.any(axis=1))
+        if len(used) == 0:
+            return [], matrix[:0]
+        matrix = matrix[used[0]:used[-1] + 1]
+        return period_labels(calendar[used[0]:used[-1] + 1], period), matrix
+
+    def analysis_trends(self, start_day):
+        """Events per day, in total and per category title on the same days"""
+        day = self.days.column(0)
+        recent = day >= start_day
+        days, sums = group_sum(day[recent], self.days.counts[recent])
+
+        title_day, title_code = self.categories.column(0), self.categories.column(1)
+        in_range = title_day >= start_day
+        counts = np.zeros((len(self.titles), len(days)), dtype=np.int64)
+        np.add.at(counts, (title_code[in_range], np.searchsorted(days, title_day[in_range])),
+                  self.categories.counts[in_range])
+        series = {self.titles[code]: counts[code].tolist()
+                  for code in np.flatnonzero(counts.any(axis=1)).tolist()}
+        return {'labels': day_labels(days), 'values': sums.tolist(), 'series': series}
+
+    def analysis_categories(self, start_day):
+        """Events per category title"""
+        title_day, title_code = self.categories.column(0), self.categories.column(1)
+        in_range = title_day >= start_day
+        codes, title_sums = group_sum(title_code[in_range], self.categories.counts[in_range])
+        return {'labels': [self.titles[c] for c in codes], 'values': title_sums.tolist()}
+
+    def _located(self, start_day):
+        day, region, country = (self.days.column(i) for i in range(3))
+        located = (day >= start_day) & (region >= 0)
+        return day[located], region[located], country[located], self.days.counts[located]
+
+    def analysis_geographic(self, start_day):
+        """Events per macro-region of their first point"""
+        _, region, _, counts = self._located(start_day)
+        regions, region_sums = group_sum(region, counts)
+        return {REGIONS[r]: int(total) for r, total in zip(regions, region_sums)}
+
+    def analysis_countries(self, start_day, region=None):
+        """Events per country of their first point, most first, optionally of one macro-region"""
+        _, regions, country, counts = self._located(start_day)
+        selected = country != NO_COUNTRY
+        if region is not None:
+            selected &= regions == (REGIONS.index(region) if region in REGIONS else -2)
+        codes, sums = group_sum(country[selected], counts[selected])
+        order = np.lexsort((codes, -sums))
+        lookup = country_lookup()
+        return {'labels': [lookup.names[c] for c in codes[order]],
+                'codes': [lookup.codes[c] for c in codes[order]],
+                'regions': [REGIONS[lookup.country_regions[c]] for c in codes[order]],
+                'values': sums[order].tolist()}
+
+    def analysis_weekday(self, start_day):
+        """Events per weekday of their first date"""
+        day, _, _, counts = self._located(start_day)
+        weekdays = np.bincount((day + 3) % 7, weights=counts, minlength=7)
+        return {'labels': list(WEEKDAYS), 'values': [int(v) for v in weekdays]}
+
+    def analysis_severity(self, start_day, end_day=None):
+        """Magnitude points per severity group, by date
+
+        Summarized and combined rollups only have their thinned points.
+        """
+        if self.severity_points is not None:
+            return {name: [point for point in points if start_day <= epoch_day(point['date'])
+                           and (end_day is None or epoch_day(point['date']) <= end_day)]
+                    for name, points in self.severity_points.items()}
+        severity = {name: [] for name in SEVERITY_GROUPS}
+        for group, event_day, event_data in self.severity.values():
+            if event_day >= start_day and (end_day is None or event_day <= end_day):
+                severity[SEVERITY_GROUPS[group]].append(event_data)
+        for points in severity.values():
+            points.sort(key=lambda point: point['date'])
+        return severity
+
+    def analysis_severity_levels(self, start_day):
+        """Events per severity group and low, medium or high level"""
+        day, group, level = (self.levels.column(i) for i in range(3))
+        recent = day >= start_day
+        counts = np.bincount(group[recent] * 3 + level[recent], weights=self.levels.counts[recent],
+                             minlength=3 * len(SEVERITY_GROUPS)).astype(np.int64).reshape(-1, 3)
+        return {name: dict(zip(MAGNITUDE_BANDS, counts[group].tolist()))
+                for group, name in enumerate(SEVERITY_GROUPS)}
@@ -0,0 +1,180 @@
+import json
+import mmap
+import os
+import pickle
+import shutil
+import tempfile
+import time
+from collections.abc import Sequence
+
+import numpy as np
+
+from event_index import EventIndex
+from geo import SpatialGrid
+from rollup import Rollup
+from snapshot import EventSnapshot
+from tracks import Tracks
+
+
+def encode_event(event):
+    """Serialize an event the way jsonify does, so stored bytes can be served as they are"""
+    return json.dumps(event, sort_keys=True, separators=(',', ':')).encode()
+
+
+class EventBlob(Sequence):
+    """Read-only sequence of events kept as JSON in one buffer, decoded on access"""
+
+    def __init__(self, buffer, offsets):
+        self._buffer = buffer
+        self._offsets = offsets
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def raw(self, row):
+        """Stored JSON bytes of one event"""
+        return self._buffer[self._offsets[row]:self._offsets[row + 1]]
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [self[i] for i in range(*row.indices(len(self)))]
+        row = int(row)
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError('event row out of range')
+        return json.loads(self.raw(row))
+
+    def take(self, rows):
+        """Decode the events at the given rows"""
+        return [json.loads(self.raw(row)) for row in rows]
+
+
+class SharedSnapshotStore:
+    """Snapshot laid out as memory-mappable files, published by one process for many
+
+    Every published version is a directory holding the index columns, spatial
+    grid and tracks as .npy files, the events as one JSON blob with offsets,
+    and the pickled rollup. CURRENT names the latest directory and its fetch
+    time and is replaced atomically, so readers see a whole version or none. Readers map the
+    files read-only, which keeps one copy in the page cache for all of them.
+    """
+
+    FORMAT = 1
+    CURRENT = 'CURRENT'
+    # Versions kept on disk, older ones may still be mapped by slow readers
+    KEEP = 3
+
+    def __init__(self, root):
+        self.root = root
+
+    def write(self, snapshot):
+        """Write the snapshot as a new version and point CURRENT at it, returning its name"""
+        os.makedirs(self.root, exist_ok=True)
+        name = f"v{snapshot.version:08d}-{time.time_ns():x}"
+        tmp_dir = tempfile.mkdtemp(dir=self.root, prefix='.tmp-')
+        try:
+            index = snapshot.index
+            for column in EventIndex.COLUMNS:
+                np.save(os.path.join(tmp_dir, f"{column}.npy"), getattr(index, column))
+            for array in SpatialGrid.ARRAYS:
+                np.save(os.path.join(tmp_dir, f"spatial_{array}.npy"), getattr(index.spatial, array))
+            for array in Tracks.ARRAYS:
+                np.save(os.path.join(tmp_dir, f"tracks_{array}.npy"), getattr(index.tracks, array))
+
+            offsets = np.zeros(len(index.events) + 1, dtype=np.int64)
+            with open(os.path.join(tmp_dir, 'events.json'), 'wb') as f:
+                for row, event in enumerate(index.events):
+                    data = encode_event(event)
+                    f.write(data)
+                    offsets[row + 1] = offsets[row] + len(data)
+            np.save(os.path.join(tmp_dir, 'event_offsets.npy'), offsets)
+
+            with open(os.path.join(tmp_dir, 'rollup.pkl'), 'wb') as f:
+                pickle.dump(snapshot.rollup, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+            payload = {key: value for key, value in (snapshot.events or {}).items() if key != 'events'}
+            meta = {'format': self.FORMAT, 'index_version': EventIndex.VERSION,
+                    'version': snapshot.version, 'payload': payload,
+                    'categories': snapshot.categories,
+                    'category_ids': index.category_ids, 'category_titles': index.category_titles,
+                    'cell_size': index.spatial.cell_size}
+            with open(os.path.join(tmp_dir, 'meta.json'), 'w') as f:
+                json.dump(meta, f)
+            os.rename(tmp_dir, os.path.join(self.root, name))
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+        self._point(name, snapshot.fetched_at)
+        self._prune(name)
+        return name
+
+    def mark_fetched(self, fetched_at):
+        """Record a fetch that changed nothing, keeping the current version"""
+        current = self.current()
+        if current is not None:
+            self._point(current['name'], fetched_at)
+
+    def _point(self, name, fetched_at):
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix='.current-')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump({'name': name, 'fetched_at': fetched_at}, f)
+            os.replace(tmp_path, os.path.join(self.root, self.CURRENT))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def _prune(self, current_name):
+        versions = [entry for entry in os.scandir(self.root)
+                    if entry.is_dir() and entry.name.startswith('v') and entry.name != current_name]
+        versions.sort(key=lambda entry: (entry.stat().st_mtime_ns, entry.name), reverse=True)
+        # Mapped files stay readable after unlinking, so this never breaks a reader
+        for entry in versions[self.KEEP - 1:]:
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+    def current(self):
+        """{'name', 'fetched_at'} of the published version, or None"""
+        try:
+            with open(os.path.join(self.root, self.CURRENT)) as f:
+                current = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return current if isinstance(current, dict) and 'name' in current else None
+
+    def load(self, current):
+        """Map a published version read-only as an EventSnapshot, or None when unusable"""
+        path = os.path.join(self.root, current['name'])
+        try:
+            with open(os.path.join(path, 'meta.json')) as f:
+                meta = json.load(f)
+            if meta.get('format') != self.FORMAT or meta.get('index_version') != EventIndex.VERSION:
+                return None
+
+            def column(name):
+                return np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r')
+
+            with open(os.path.join(path, 'events.json'), 'rb') as f:
+                size = os.fstat(f.fileno()).st_size
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+            events = EventBlob(buffer, column('event_offsets'))
+
+            spatial = SpatialGrid.from_arrays({array: column(f"spatial_{array}")
+                                               for array in SpatialGrid.ARRAYS},
+                                              cell_size=meta['cell_size'])
+            tracks = Tracks.from_arrays({array: column(f"tracks_{array}") for array in Tracks.ARRAYS})
+            index = EventIndex.from_columns(events, {name: column(name) for name in EventIndex.COLUMNS},
+                                            meta['category_ids'], meta['category_titles'], spatial,
+                                            tracks)
+            with open(os.path.join(path, 'rollup.pkl'), 'rb') as f:
+                rollup = pickle.load(f)
+            if getattr(rollup, 'version', 1) != Rollup.VERSION:
+                rollup = None  # rebuilt from the events
+        except (OSError, ValueError, KeyError, pickle.UnpicklingError):
+            return None
+
+        return EventSnapshot(events=dict(meta['payload'], events=events), index=index,
+                             categories=meta['categories'],
+                             version=meta['version'],
+                             fetched_at=current.get('fetched_at'), rollup=rollup)
@@ -0,0 +1,222 @@
+import gc
+import logging
+import os
+import pickle
+import random
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from event_index import EventIndex
+from rollup import Rollup
+
+log = logging.getLogger(__name__)
+
+
+class EventSnapshot:
+    """Immutable view of one successful fetch, swapped in as a whole on refresh"""
+
+    __slots__ = ('events', 'index', 'categories', 'version', 'fetched_at', 'rollup')
+
+    def __init__(self, events=None, index=None, categories=None, version=0, fetched_at=None,
+                 rollup=None):
+        raw_events = (events or {}).get('events', [])
+        if index is None:
+            index = EventIndex(raw_events)
+        if events is not None and 'events' in events and events['events'] is not index.events:
+            # The payload serves the index's compact copy, the raw dicts can go
+            events = dict(events, events=index.events)
+        object.__setattr__(self, 'events', events)
+        object.__setattr__(self, 'index', index)
+        object.__setattr__(self, 'categories', categories)
+        object.__setattr__(self, 'version', version)
+        object.__setattr__(self, 'fetched_at', fetched_at)
+        object.__setattr__(self, 'rollup', rollup if rollup is not None else Rollup(raw_events))
+
+    def __setattr__(self, name, value):
+        raise AttributeError('EventSnapshot is immutable')
+
+    def __reduce__(self):
+        return EventSnapshot, tuple(getattr(self, name) for name in self.__slots__)
+
+    def replace(self, **changes):
+        """Return a copy of the snapshot with some fields replaced"""
+        fields = {name: getattr(self, name) for name in self.__slots__}
+        if 'events' in changes:
+            # Derived data is rebuilt unless the caller supplies it
+            fields['index'] = None
+            fields['rollup'] = None
+        fields.update(changes)
+        return EventSnapshot(**fields)
+
+    @property
+    def last_update(self):
+        """Wall-clock time of the fetch as a datetime, or None"""
+        return datetime.fromtimestamp(self.fetched_at) if self.fetched_at else None
+
+    def age(self):
+        """Seconds since the snapshot data was fetched, or None if never fetched"""
+        if self.fetched_at is None:
+            return None
+        return max(0.0, time.time() - self.fetched_at)
+
+
+class SnapshotStore:
+    """Last good snapshot on local disk, pickled with its columnar index"""
+
+    FORMAT = 1
+
+    def __init__(self, path):
+        self.path = path
+
+    def save(self, snapshot, **extra):
+        """Write the snapshot atomically; extra keys are stored alongside it"""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.snapshot-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump({'format': self.FORMAT, 'index_version': EventIndex.VERSION,
+                             'snapshot': snapshot, 'extra': extra},
+                            f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def load(self):
+        """Return (snapshot, extra), or (None, {}) when missing or unreadable"""
+        # The payload is hundreds of thousands of small containers, collector
+        # passes triggered while unpickling them would more than double load time
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            with open(self.path, 'rb') as f:
+                state = pickle.load(f)
+        except FileNotFoundError:
+            return None, {}
+        except Exception as e:
+            log.warning("Ignoring unreadable snapshot %s: %s", self.path, e)
+            return None, {}
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+        if not isinstance(state, dict) or state.get('format') != self.FORMAT:
+            return None, {}
+        snapshot = state['snapshot']
+        if (state.get('index_version') != EventIndex.VERSION
+                or getattr(snapshot.rollup, 'version', 1) != Rollup.VERSION):
+            # Events are still good, only the derived columns need rebuilding
+            snapshot = snapshot.replace(events=snapshot.events)
+        return snapshot, state.get('extra', {})
+
+
+class SnapshotRefresher:
+    """Daemon thread calling refresh() every interval seconds, with jitter"""
+
+    def __init__(self, refresh, interval, jitter=0.1, name='eonet-refresher'):
+        self.refresh = refresh
+        self.interval = interval
+        self.jitter = jitter
+        self.name = name
+        self._stop = threading.Event()
+        self._thread = None
+
+    def next_delay(self):
+        """Interval randomized by +/- jitter so workers don't refresh in lockstep"""
+        spread = self.interval * self.jitter
+        return max(1.0, self.interval + random.uniform(-spread, spread))
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, delay=None):
+        """Start the refresher thread, first refresh after delay (default: one interval)"""
+        if self.is_running():
+            return
+        self._stop.clear()
+        first_delay = self.next_delay() if delay is None else delay
+        self._thread = threading.Thread(target=self._run, args=(first_delay,),
+                                        name=self.name, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        """Signal the thread to stop and wait for it"""
+        self._stop.set()
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+        self._thread = None
+
+    def _run(self, delay):
+        while not self._stop.wait(delay):
+            try:
+                self.refresh()
+            except Exception as e:
+                log.exception("Error during background refresh: %s", e)
+            delay = self.next_delay()
+
+
+def last_geometry_date(event):
+    """Latest YYYY-MM-DD geometry date of an event, or None"""
+    dates = [geo['date'][:10] for geo in event.get('geometry') or []
+             if isinstance(geo.get('date'), str)]
+    return max(dates) if dates else None
+
+
+def event_changed(old, new):
+    """An event needs replacing when it was closed/reopened or its track grew"""
+    if old.get('closed') != new.get('closed'):
+        return True
+    return len(new.get('geometry') or []) > len(old.get('geometry') or [])
+
+
+def merge_events(existing, incoming, cutoff=None):
+    """Merge an incremental upstream window into existing events by id
+
+    New events are placed first (upstream lists newest first), updated events
+    keep their position, and events whose track ends before cutoff are evicted.
+    Returns the merged list, per-cycle change counts and the changed events
+    as {'added': [new], 'updated': [(old, new)], 'evicted': [old]}.
+    """
+    stats = {'added': 0, 'updated': 0, 'evicted': 0, 'unchanged': 0}
+    changes = {'added': [], 'updated': [], 'evicted': []}
+    # Compact stores rebuild their dicts on every access, do it once
+    existing = list(existing)
+    current = {event.get('id'): event for event in existing}
+
+    added = []
+    for event in incoming:
+        event_id = event.get('id')
+        old = current.get(event_id)
+        if old is None:
+            current[event_id] = event
+            added.append(event_id)
+            stats['added'] += 1
+        elif old is event:
+            continue
+        elif event_changed(old, event):
+            current[event_id] = event
+            changes['updated'].append((old, event))
+            stats['updated'] += 1
+        else:
+            stats['unchanged'] += 1
+
+    new_ids = set(added)
+    merged = []
+    for event_id in added + [event.get('id') for event in existing]:
+        event = current[event_id]
+        last_date = last_geometry_date(event)
+        if cutoff and last_date is not None and last_date < cutoff:
+            if event_id in new_ids:
+                stats['added'] -= 1
+            else:
+                stats['evicted'] += 1
+                changes['evicted'].append(event)
+            continue
+        if event_id in new_ids:
+            changes['added'].append(event)
+        merged.append(event)
+
+    return merged, stats, changes
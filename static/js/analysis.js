@@ -195,8 +195,14 @@ class EONETAnalysis {
         this.charts.categories.update();
     }
 
+    // Severity points arrive thinned to a bounded number per group
     updateSeverityChart(data) {
-        this.charts.severity.data.datasets = data.datasets;
+        const colors = { wildfires: '#FF6384', storms: '#36A2EB', volcanoes: '#FFCE56', earthquakes: '#4BC0C0' };
+        this.charts.severity.data.datasets = Object.entries(data).map(([group, points]) => ({
+            label: group,
+            backgroundColor: colors[group],
+            data: points.map(point => ({ x: point.date, y: point.magnitude, r: 5 }))
+        }));
         this.charts.severity.update();
     }
 
@@ -208,19 +214,19 @@ class EONETAnalysis {
     }
 
     async fetchGeographicData() {
-        const response = await fetch(`/api/analysis/geographic?region=${this.filters.region}`);
+        const response = await fetch(`/api/analysis/geographic?period=${this.filters.timePeriod}&region=${this.filters.region}`);
         if (!response.ok) throw new Error('Failed to fetch geographic data');
         return await response.json();
     }
 
     async fetchCategoryData() {
-        const response = await fetch('/api/analysis/categories');
+        const response = await fetch(`/api/analysis/categories?period=${this.filters.timePeriod}`);
         if (!response.ok) throw new Error('Failed to fetch category data');
         return await response.json();
     }
 
     async fetchSeverityData() {
-        const response = await fetch('/api/analysis/severity');
+        const response = await fetch(`/api/analysis/severity?period=${this.filters.timePeriod}`);
         if (!response.ok) throw new Error('Failed to fetch severity data');
         return await response.json();
     }
@@ -1,5 +1,7 @@
 
 let categoryChart, magnitudeChart, frequencyChart;
+// Last summary drawn, kept current by the deltas from /api/stream
+let summaryStats;
 
 function showLoading() {
     document.querySelector('.loading-overlay').style.display = 'flex';
@@ -15,6 +17,7 @@ async function initializeCharts() {
         const response = await fetch('/api/summary');
         if (!response.ok) throw new Error('Failed to fetch summary data');
         const stats = await response.json();
+        summaryStats = stats;
 
         console.log('Summary data:', stats); // Debug log
 
@@ -145,9 +148,15 @@ async function updateCharts() {
         const response = await fetch('/api/summary');
         if (!response.ok) throw new Error('Failed to fetch summary data');
         const stats = await response.json();
+        summaryStats = stats;
+        drawSummary(stats);
+    } catch (error) {
+        console.error('Error updating charts:', error);
+    }
+}
 
-        console.log('Update data:', stats); // Debug log
-
+function drawSummary(stats) {
+    try {
         if (categoryChart) {
             categoryChart.data.labels = Object.keys(stats.categories);
             categoryChart.data.datasets[0].data = Object.values(stats.categories);
@@ -169,7 +178,7 @@ async function updateCharts() {
             frequencyChart.update();
         }
     } catch (error) {
-        console.error('Error updating charts:', error);
+        console.error('Error drawing charts:', error);
     }
 }
 
@@ -216,25 +225,35 @@ async function loadCategories() {
     }
 }
 
+// Merge the changed summary counters of a delta, a count of 0 removes a key
+function applySummaryDelta(summary) {
+    if (!summaryStats || !summary) return;
+    ['categories', 'magnitudes', 'daily_counts'].forEach(field => {
+        Object.entries(summary[field] || {}).forEach(([key, value]) => {
+            if (value === 0 && field !== 'magnitudes') delete summaryStats[field][key];
+            else summaryStats[field][key] = value;
+        });
+    });
+    // Days arrive unordered, the frequency chart is chronological
+    summaryStats.daily_counts = Object.fromEntries(Object.entries(summaryStats.daily_counts).sort());
+    if (summary.event_count !== undefined) summaryStats.event_count = summary.event_count;
+    drawSummary(summaryStats);
+}
+
 async function updateMap() {
     showLoading();
     try {
         const slider = document.getElementById('magnitudeSlider');
         const [minMag, maxMag] = slider.noUiSlider.get();
 
-        const params = new URLSearchParams({
+        // The map fetches GeoJSON for its own viewport, see map.js
+        await window.eventMap.setFilters({
             start_date: document.getElementById('startDate').value,
             end_date: document.getElementById('endDate').value,
             event_type: document.getElementById('eventType').value,
             min_magnitude: minMag,
             max_magnitude: maxMag
         });
-
-        const response = await fetch(`/api/map?${params}`);
-        if (!response.ok) throw new Error('Failed to update map');
-
-        const mapHtml = await response.text();
-        document.querySelector('.map-container').innerHTML = mapHtml;
     } catch (error) {
         console.error('Error updating map:', error);
     } finally {
@@ -280,6 +299,15 @@ document.addEventListener('DOMContentLoaded', async () => {
 
         // Initial data load
         await refreshData();
+
+        // Later refreshes arrive as deltas instead of being polled for
+        subscribeToDeltas({
+            onDelta: delta => {
+                applySummaryDelta(delta.summary);
+                window.eventMap.applyDelta(delta);
+            },
+            onReset: refreshData
+        });
     } catch (error) {
         console.error('Error during initialization:', error);
     }
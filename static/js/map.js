@@ -0,0 +1,199 @@
+
+class EventMap {
+    constructor(elementId) {
+        this.filters = {};
+        this.details = {};
+        this.requestId = 0;
+        this.clustered = true;
+        this.markers = new Map();  // event id -> marker, when not clustered
+
+        this.map = L.map(elementId, { preferCanvas: true }).setView([20, 0], 3);
+        L.tileLayer('https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png', {
+            attribution: '&copy; OpenStreetMap contributors'
+        }).addTo(this.map);
+        this.layer = L.layerGroup().addTo(this.map);
+        this.trackLayer = L.layerGroup().addTo(this.map);
+
+        this.map.on('moveend', () => this.load());
+    }
+
+    async setFilters(filters) {
+        this.filters = filters;
+        await this.load();
+    }
+
+    // Current viewport as west,south,east,north, omitted when the whole world is visible
+    viewportBBox() {
+        const bounds = this.map.getBounds();
+        if (bounds.getEast() - bounds.getWest() >= 360) return null;
+        const wrap = lon => ((lon + 180) % 360 + 360) % 360 - 180;
+        return [
+            wrap(bounds.getWest()).toFixed(4),
+            Math.max(bounds.getSouth(), -90).toFixed(4),
+            wrap(bounds.getEast()).toFixed(4),
+            Math.min(bounds.getNorth(), 90).toFixed(4)
+        ].join(',');
+    }
+
+    async load() {
+        const params = new URLSearchParams(this.filters);
+        params.set('zoom', this.map.getZoom());
+        const bbox = this.viewportBBox();
+        if (bbox) params.set('bbox', bbox);
+
+        // Ignore responses that arrive after a newer pan or zoom
+        const requestId = ++this.requestId;
+        try {
+            const response = await fetch(`/api/map/features?${params}`);
+            if (!response.ok) throw new Error('Failed to load map features');
+            const collection = await response.json();
+            if (requestId === this.requestId) this.render(collection);
+        } catch (error) {
+            console.error('Error loading map features:', error);
+        }
+    }
+
+    render(collection) {
+        this.layer.clearLayers();
+        this.markers.clear();
+        this.clustered = collection.clustered;
+        collection.features.forEach(feature => {
+            const [lon, lat] = feature.geometry.coordinates;
+            const props = feature.properties;
+            if (props.cluster) {
+                this.layer.addLayer(this.clusterMarker(lat, lon, props));
+            } else {
+                this.addEvent(feature);
+            }
+        });
+    }
+
+    addEvent(feature) {
+        const [lon, lat] = feature.geometry.coordinates;
+        const marker = this.eventMarker(lat, lon, feature.id, feature.properties);
+        this.markers.set(feature.id, marker);
+        this.layer.addLayer(marker);
+    }
+
+    removeEvent(id) {
+        const marker = this.markers.get(id);
+        if (!marker) return;
+        this.layer.removeLayer(marker);
+        this.markers.delete(id);
+        delete this.details[id];
+    }
+
+    // Apply the changes of a data refresh from /api/stream. Single markers are
+    // patched in place; clusters are recounted by the server, so a clustered
+    // view is only reloaded when a change falls inside it.
+    applyDelta(delta) {
+        const changed = [...delta.added, ...delta.updated, ...delta.closed];
+        if (this.clustered) {
+            const bounds = this.map.getBounds();
+            const inView = changed.some(f => f.geometry &&
+                bounds.contains([f.geometry.coordinates[1], f.geometry.coordinates[0]]));
+            if (inView || delta.removed.length) this.load();
+            return;
+        }
+        delta.removed.forEach(f => this.removeEvent(f.id));
+        changed.forEach(feature => {
+            this.removeEvent(feature.id);
+            if (feature.geometry && this.matchesFilters(feature.properties)) this.addEvent(feature);
+        });
+    }
+
+    // Same filters as the server applies to /api/map/features
+    matchesFilters(props) {
+        const { start_date, end_date, event_type, min_magnitude, max_magnitude } = this.filters;
+        const date = (props.date || '').slice(0, 10);
+        if (start_date && date < start_date) return false;
+        if (end_date && date > end_date) return false;
+        if (event_type && props.category_id !== event_type) return false;
+        // Events without a magnitude pass magnitude filters
+        const magnitude = props.magnitude;
+        if (magnitude === null) return true;
+        if (min_magnitude && magnitude < Number(min_magnitude)) return false;
+        if (max_magnitude && magnitude > Number(max_magnitude)) return false;
+        return true;
+    }
+
+    clusterMarker(lat, lon, props) {
+        const marker = L.circleMarker([lat, lon], {
+            radius: Math.min(30, 8 + Math.log2(props.count) * 3),
+            color: 'black',
+            weight: 1,
+            fillColor: magnitudeColor(props.max_magnitude),
+            fillOpacity: 0.6
+        });
+        marker.bindTooltip(`${props.count} events`);
+        marker.on('click', () => this.map.setView([lat, lon], this.map.getZoom() + 2));
+        return marker;
+    }
+
+    eventMarker(lat, lon, id, props) {
+        const marker = L.circleMarker([lat, lon], {
+            radius: 8,
+            color: 'black',
+            weight: 1,
+            fillColor: magnitudeColor(props.magnitude),
+            fillOpacity: 0.7
+        });
+        marker.bindPopup('Loading...', { maxWidth: 300 });
+        marker.on('popupopen', async () => {
+            this.showTrack(id);
+            marker.setPopupContent(await this.popupContent(id, props));
+        });
+        return marker;
+    }
+
+    // Draw the path of the selected event, simplified for the current zoom
+    async showTrack(id) {
+        this.trackLayer.clearLayers();
+        const response = await fetch(`/api/events/${encodeURIComponent(id)}/track?zoom=${this.map.getZoom()}`);
+        if (!response.ok) return;
+        const track = await response.json();
+        if (!track.geometry || track.geometry.type !== 'LineString') return;
+        const latlngs = track.geometry.coordinates.map(([lon, lat]) => [lat, lon]);
+        this.trackLayer.addLayer(L.polyline(latlngs, { color: '#1565C0', weight: 3, opacity: 0.8 }));
+    }
+
+    // Event details are only fetched when a popup is opened
+    async popupContent(id, props) {
+        if (!this.details[id]) {
+            const response = await fetch(`/api/events/${encodeURIComponent(id)}`);
+            if (!response.ok) return 'Event details unavailable';
+            this.details[id] = await response.json();
+        }
+        const event = this.details[id];
+        const container = document.createElement('div');
+        container.style.width = '300px';
+        const rows = [
+            ['Category', props.category],
+            ['Date', props.date],
+            ['Magnitude', props.magnitude],
+            ['Description', event.description || 'No description available']
+        ];
+        const title = document.createElement('h4');
+        title.textContent = event.title;
+        container.appendChild(title);
+        rows.filter(([, value]) => value !== null && value !== undefined).forEach(([label, value]) => {
+            const p = document.createElement('p');
+            const b = document.createElement('b');
+            b.textContent = `${label}: `;
+            p.appendChild(b);
+            p.appendChild(document.createTextNode(value));
+            container.appendChild(p);
+        });
+        return container;
+    }
+}
+
+// Same bands as EONETData.get_magnitude_color
+function magnitudeColor(magnitude) {
+    if (!magnitude) return '#FFEB3B';
+    if (magnitude < 3) return '#FFEB3B';
+    if (magnitude < 6) return '#FF9800';
+    return '#F44336';
+}
+
+window.eventMap = new EventMap('eventMap');
@@ -0,0 +1,17 @@
+
+// Follow /api/stream: onDelta gets what each data refresh changed, onReset is
+// called when changes were missed and the page has to reload its data.
+// EventSource reconnects by itself and resumes after the last event it saw.
+function subscribeToDeltas({ categories = [], onDelta, onReset }) {
+    if (!window.EventSource) return null;
+    const params = new URLSearchParams();
+    if (categories.length) params.set('category', categories.join(','));
+    const source = new EventSource(`/api/stream?${params}`);
+    source.addEventListener('delta', event => {
+        const delta = JSON.parse(event.data);
+        if (delta.reload) onReset(delta);
+        else onDelta(delta);
+    });
+    source.addEventListener('reset', () => onReset());
+    return source;
+}
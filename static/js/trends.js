@@ -1,6 +1,7 @@
 
 let trendsChart;
 let currentPeriod = 'daily';
+let deltaSource;
 
 // Utility Functions
 function showLoading() {
@@ -11,13 +12,15 @@ function hideLoading() {
     document.querySelector('.loading').style.display = 'none';
 }
 
+// Period labels are YYYY-MM-DD (days, and the Monday of weeks), YYYY-MM or YYYY
 function formatDate(dateString) {
+    if (currentPeriod === 'annually') return dateString;
     const date = new Date(dateString);
-    return new Intl.DateTimeFormat('en-US', {
-        year: 'numeric',
-        month: 'short',
-        day: 'numeric'
-    }).format(date);
+    const options = currentPeriod === 'monthly'
+        ? { year: 'numeric', month: 'short', timeZone: 'UTC' }
+        : { year: 'numeric', month: 'short', day: 'numeric', timeZone: 'UTC' };
+    const label = new Intl.DateTimeFormat('en-US', options).format(date);
+    return currentPeriod === 'weekly' ? `Week of ${label}` : label;
 }
 
 // Initialize Chart
@@ -118,32 +121,33 @@ async function loadCategories() {
     }
 }
 
+// Line colors of the compared series
+const SERIES_COLORS = ['#007bff', '#28a745', '#fd7e14', '#6f42c1', '#20c997', '#e83e8c'];
+
 // Update Chart Data
 async function updateTrendsData() {
     showLoading();
     try {
-        const category = document.getElementById('categorySelect').value;
-        const response = await fetch(`/api/trends?category=${category}&period=${currentPeriod}`);
+        // Every selected category comes back in one response, on one calendar
+        const categories = selectedCategories();
+        const params = new URLSearchParams({ period: currentPeriod });
+        if (categories.length) params.set('category', categories.join(','));
+        const response = await fetch(`/api/trends?${params}`);
         if (!response.ok) throw new Error('Failed to fetch trend data');
-        
+
         const data = await response.json();
-        
-        // Update chart
+        const keys = categories.length ? categories : ['all'];
+
         trendsChart.data.labels = data.periods;
-        trendsChart.data.datasets[0].data = data.counts;
-        
-        // Calculate and update trend line
-        if (data.counts.length > 1) {
-            const trendLine = calculateTrendLine(data.counts);
-            trendsChart.data.datasets[1].data = trendLine;
-        }
-        
-        trendsChart.options.plugins.title.text = 
+        trendsChart.data.datasets = keys.flatMap((key, i) =>
+            seriesDatasets(data.series[key], SERIES_COLORS[i % SERIES_COLORS.length], keys.length === 1));
+
+        trendsChart.options.plugins.title.text =
             `Event Frequency (${currentPeriod.charAt(0).toUpperCase() + currentPeriod.slice(1)})`;
         trendsChart.update();
 
         // Update statistics
-        updateStatistics(data);
+        updateStatistics(data, data.series[keys[0]]);
     } catch (error) {
         console.error('Error updating trends:', error);
         showError('Failed to update trend data');
@@ -152,50 +156,79 @@ async function updateTrendsData() {
     }
 }
 
-// Calculate Trend Line
-function calculateTrendLine(data) {
-    const n = data.length;
-    if (n < 2) return data;
-
-    // Calculate the sum of x, y, xy and x^2
-    let sumX = 0;
-    let sumY = 0;
-    let sumXY = 0;
-    let sumXX = 0;
-
-    data.forEach((y, x) => {
-        sumX += x;
-        sumY += y;
-        sumXY += x * y;
-        sumXX += x * x;
-    });
+function selectedCategories() {
+    return Array.from(document.getElementById('categorySelect').selectedOptions)
+        .map(option => option.value)
+        .filter(Boolean);
+}
 
-    // Calculate slope and intercept
-    const slope = (n * sumXY - sumX * sumY) / (n * sumXX - sumX * sumX);
-    const intercept = (sumY - slope * sumX) / n;
+// Refetch the trends when a refresh changes events of the selected categories
+function followDeltas() {
+    if (deltaSource) deltaSource.close();
+    const categories = selectedCategories();
+    deltaSource = subscribeToDeltas({
+        categories,
+        onDelta: delta => {
+            const changed = ['added', 'updated', 'closed', 'removed'].some(key => delta[key].length);
+            if (changed || (!categories.length && delta.summary.event_count !== undefined)) {
+                updateTrendsData();
+            }
+        },
+        onReset: updateTrendsData
+    });
+}
 
-    // Generate trend line points
-    return data.map((_, i) => slope * i + intercept);
+// Counts with anomalies enlarged, the rolling mean and the least-squares line of one series
+function seriesDatasets(series, color, single) {
+    const datasets = [{
+        label: series.title,
+        data: series.counts,
+        borderColor: color,
+        backgroundColor: single ? 'rgba(0, 123, 255, 0.1)' : color,
+        fill: single,
+        tension: 0.4,
+        pointRadius: series.z_scores.map(z => Math.abs(z) >= 2 ? 6 : 2),
+        pointBackgroundColor: series.z_scores.map(z => Math.abs(z) >= 2 ? '#dc3545' : color)
+    }, {
+        label: `${series.title} (rolling mean)`,
+        data: series.rolling_mean,
+        borderColor: color,
+        borderWidth: 1,
+        pointRadius: 0,
+        fill: false,
+        tension: 0.4
+    }];
+    if (single) {
+        datasets.push({
+            label: 'Trend Line',
+            data: series.counts.map((_, i) => series.slope * i + series.intercept),
+            borderColor: '#dc3545',
+            borderDash: [5, 5],
+            pointRadius: 0,
+            fill: false,
+            tension: 0
+        });
+    }
+    return datasets;
 }
 
-// Update Statistics Display
-function updateStatistics(data) {
+// Update Statistics Display, for the first selected series
+function updateStatistics(data, series) {
     const avgElement = document.getElementById('averageEvents');
     const maxElement = document.getElementById('maxEvents');
     const trendElement = document.getElementById('trendValue');
     const periodsElement = document.getElementById('totalPeriods');
 
-    // Calculate statistics
-    const average = data.counts.reduce((a, b) => a + b, 0) / data.counts.length;
-    const max = Math.max(...data.counts);
-    const trend = data.trend;
-    
-    // Update display
-    avgElement.textContent = average.toFixed(1);
-    maxElement.textContent = max;
-    trendElement.textContent = `${(trend * 100).toFixed(1)}%`;
-    trendElement.style.color = trend >= 0 ? '#28a745' : '#dc3545';
-    periodsElement.textContent = data.counts.length;
+    const ci = series.slope_ci;
+    const significant = ci && (ci[0] > 0 || ci[1] < 0);
+
+    avgElement.textContent = data.average.toFixed(1);
+    maxElement.textContent = data.max;
+    trendElement.textContent = `${data.trend >= 0 ? '+' : ''}${data.trend.toFixed(2)}` +
+        (ci ? ` ± ${((ci[1] - ci[0]) / 2).toFixed(2)}` : '') + ' / period';
+    trendElement.style.color = !significant ? '#6c757d' : data.trend >= 0 ? '#28a745' : '#dc3545';
+    trendElement.title = `${series.anomalies.length} anomalous periods`;
+    periodsElement.textContent = data.periods.length;
 }
 
 // Show Error Message
@@ -233,9 +266,13 @@ document.addEventListener('DOMContentLoaded', async () => {
     initializeTrendsChart();
     await loadCategories();
     await updateTrendsData();
+    followDeltas();
 
     // Add event listeners
-    document.getElementById('categorySelect').addEventListener('change', updateTrendsData);
+    document.getElementById('categorySelect').addEventListener('change', async () => {
+        await updateTrendsData();
+        followDeltas();
+    });
 
     // Period buttons
     document.querySelectorAll('.period-button').forEach(button => {
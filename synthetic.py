@@ -0,0 +1,100 @@
+"""Deterministic EONET-shaped payloads for tests and benchmarks"""
+import random
+from datetime import datetime, timedelta, timezone
+
+CATEGORIES = [
+    ('drought', 'Drought'),
+    ('dustHaze', 'Dust and Haze'),
+    ('earthquakes', 'Earthquakes'),
+    ('floods', 'Floods'),
+    ('landslides', 'Landslides'),
+    ('manmade', 'Manmade'),
+    ('seaLakeIce', 'Sea and Lake Ice'),
+    ('severeStorms', 'Severe Storms'),
+    ('snow', 'Snow'),
+    ('tempExtremes', 'Temperature Extremes'),
+    ('volcanoes', 'Volcanoes'),
+    ('waterColor', 'Water Color'),
+    ('wildfires', 'Wildfires'),
+]
+
+# Relative frequency and magnitude unit per category, roughly like the live feed
+PROFILES = {
+    'wildfires': (60, 'acres', (10, 50000)),
+    'severeStorms': (15, 'kts', (20, 160)),
+    'seaLakeIce': (8, 'NM^2', (10, 5000)),
+    'volcanoes': (6, None, None),
+    'earthquakes': (3, 'Mw', (2.5, 8.5)),
+    'floods': (3, None, None),
+}
+
+
+def generate_categories():
+    """Build a /categories payload"""
+    return {
+        'title': 'EONET Event Categories',
+        'categories': [{'id': cid, 'title': title, 'link': '', 'description': '', 'layers': ''}
+                       for cid, title in CATEGORIES],
+    }
+
+
+def generate_events(count, seed=0, days=365, end=None, max_points=12):
+    """Build an /events payload with count events spread over the last days days
+
+    Storms and ice tracks get multi-point geometries; magnitudes appear either
+    on the geometry points or, for a minority of events, on the event root.
+    """
+    rng = random.Random(seed)
+    end = end or datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    start = end - timedelta(days=days)
+
+    weights = [PROFILES.get(cid, (1, None, None))[0] for cid, _ in CATEGORIES]
+    events = []
+    for i in range(count):
+        cid, title = rng.choices(CATEGORIES, weights)[0]
+        _, unit, bounds = PROFILES.get(cid, (1, None, None))
+
+        points = rng.randint(2, max_points) if cid in ('severeStorms', 'seaLakeIce') else 1
+        when = start + timedelta(seconds=rng.randrange(days * 86400))
+        lon, lat = rng.uniform(-180, 180), rng.uniform(-70, 75)
+
+        geometry = []
+        for _ in range(points):
+            geo = {
+                'magnitudeValue': None,
+                'magnitudeUnit': None,
+                'date': when.strftime('%Y-%m-%dT%H:%M:%SZ'),
+                'type': 'Point',
+                'coordinates': [round(lon, 4), round(lat, 4)],
+            }
+            if bounds:
+                geo['magnitudeValue'] = round(rng.uniform(*bounds), 2)
+                geo['magnitudeUnit'] = unit
+            geometry.append(geo)
+            when += timedelta(hours=rng.choice((3, 6, 12)))
+            lon = max(-180.0, min(180.0, lon + rng.uniform(-1.5, 1.5)))
+            lat = max(-89.0, min(89.0, lat + rng.uniform(-1.0, 1.0)))
+
+        closed = None
+        if rng.random() < 0.7 and when < end:
+            closed = when.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+        event = {
+            'id': f"EONET_{seed}_{i}",
+            'title': f"Synthetic {title} {i}",
+            'description': None,
+            'link': f"https://eonet.gsfc.nasa.gov/api/v3/events/EONET_{seed}_{i}",
+            'closed': closed,
+            'categories': [{'id': cid, 'title': title}],
+            'sources': [{'id': 'SYN', 'url': ''}],
+            'geometry': geometry,
+        }
+        if bounds and rng.random() < 0.1:
+            # Some feeds carry the magnitude on the event root instead
+            event['magnitudeValue'] = geometry[0].pop('magnitudeValue')
+            event['magnitudeUnit'] = geometry[0].pop('magnitudeUnit')
+            for geo in geometry[1:]:
+                geo['magnitudeValue'] = geo['magnitudeUnit'] = None
+        events.append(event)
+
+    return {'title': 'EONET Events', 'description': 'Synthetic events', 'events': events}
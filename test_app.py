@@ -1,5 +1,552 @@
+import os
+
+# Keep the suite off the network and away from any local snapshot or archive
+os.environ['EONET_OFFLINE'] = '1'
+os.environ['EONET_SNAPSHOT'] = ''
+os.environ['EONET_ARCHIVE'] = ''
+
 from app import app
 
+def test_logging_is_configured_on_the_app_loggers_only():
+    import logging
+    from app import APP_LOGGERS
+    from metrics import LogSampler
+    assert not any(isinstance(f, LogSampler) for h in logging.getLogger().handlers for f in h.filters)
+    for name in APP_LOGGERS:
+        handlers = logging.getLogger(name).handlers
+        assert any(isinstance(f, LogSampler) for h in handlers for f in h.filters)
+
 def test_home():
     response = app.test_client().get('/')
     assert response.status_code == 200
+
+def test_status_reports_published_snapshot():
+    from app import eonet_data
+    version = eonet_data.data_version
+    eonet_data.publish(events={'events': []}, fetched_at=0)
+
+    response = app.test_client().get('/api/status')
+    assert response.status_code == 200
+    assert response.json['data_version'] == version + 1
+    assert response.headers['X-Data-Version'] == str(version + 1)
+
+
+def stub_event(event_id, dates, closed=None, category='wildfires'):
+    return {
+        'id': event_id,
+        'title': f"Event {event_id}",
+        'closed': closed,
+        'categories': [{'id': category, 'title': category}],
+        'geometry': [{'date': f"{d}T00:00:00Z", 'type': 'Point', 'coordinates': [1.0, 2.0]}
+                     for d in dates],
+    }
+
+
+def test_incremental_ingest_against_stub(monkeypatch):
+    from datetime import date, timedelta
+    from app import EONETData
+    from eonet_stub import EONETStub
+
+    today = date.today()
+    day = lambda n: (today - timedelta(days=n)).isoformat()
+    events = [stub_event('old', [day(400), day(300)]),
+              stub_event('track', [day(10)]),
+              stub_event('quiet', [day(50)])]
+
+    with EONETStub(events) as stub:
+        monkeypatch.setenv('EONET_API', stub.url)
+        monkeypatch.setenv('EONET_OFFLINE', '0')
+        data = EONETData()
+        assert data.last_ingest['mode'] == 'full'
+        assert len(data.events_cache['events']) == 3
+        version = data.data_version
+
+        # Nothing changed upstream: delta cycle keeps the version
+        assert data.fetch_events()
+        assert data.last_ingest['mode'] == 'delta'
+        assert data.last_ingest['changed'] == 0
+        assert data.data_version == version
+        assert stub.requests[-1][1]['start'] >= day(2)
+
+        # A track grows, an event closes and a new one appears
+        stub.set_events([stub_event('old', [day(400), day(300)]),
+                         stub_event('track', [day(10), day(0)], closed=day(0)),
+                         stub_event('quiet', [day(50)]),
+                         stub_event('new', [day(0)])])
+        assert data.fetch_events(days=365)
+        ingest = data.last_ingest
+        assert (ingest['added'], ingest['updated'], ingest['evicted']) == (1, 1, 0)
+        assert ingest['bytes'] > 0
+        assert data.data_version > version
+        ids = [e['id'] for e in data.events_cache['events']]
+        assert ids[0] == 'new' and set(ids) == {'new', 'old', 'track', 'quiet'}
+        track = data.get_filtered_events(start_date=day(10))['events']
+        assert any(len(e['geometry']) == 2 for e in track)
+        # Open /api/stream clients are sent what changed
+        delta = data.delta_log.entries[-1].delta
+        assert [f['id'] for f in delta['added']] == ['new'] and delta['updated'] == []
+        assert [f['id'] for f in delta['closed']] == ['track']
+        assert delta['closed'][0]['properties']['closed'] == day(0)
+        assert delta['summary']['event_count'] == 4
+
+        # Shrinking the retention window evicts events that end before it
+        data.sync_days = 40
+        assert data.fetch_events(days=40)
+        assert data.last_ingest['evicted'] == 2
+        removed = data.delta_log.entries[-1].delta['removed']
+        assert sorted(f['id'] for f in removed) == ['old', 'quiet']
+        assert data.delta_log.seq == 2
+        assert {e['id'] for e in data.events_cache['events']} == {'new', 'track'}
+
+
+def test_snapshot_startup_without_network(monkeypatch, tmp_path):
+    from app import EONETData
+    from eonet_stub import EONETStub
+    from synthetic import generate_categories, generate_events
+
+    path = str(tmp_path / 'snapshot.pkl')
+    monkeypatch.setenv('EONET_SNAPSHOT', path)
+    payload = generate_events(200, seed=3)
+
+    with EONETStub(payload['events'], generate_categories()) as stub:
+        monkeypatch.setenv('EONET_API', stub.url)
+        monkeypatch.setenv('EONET_OFFLINE', '0')
+        online = EONETData()
+        assert os.path.exists(path)
+
+    monkeypatch.setenv('EONET_OFFLINE', '1')
+    offline = EONETData()
+    assert offline.initialized
+    assert offline.data_version == online.data_version
+    assert offline.categories_cache == online.categories_cache
+    assert offline.get_filtered_events(event_type='wildfires') == \
+        online.get_filtered_events(event_type='wildfires')
+    assert offline.sync_days == 365
+    assert not offline.fetch_events()
+    offline.start_refresher()
+    assert not offline.refresher.is_running()
+
+
+def test_results_are_cached_per_data_version():
+    from app import eonet_data
+    from synthetic import generate_events
+
+    eonet_data.publish(events=generate_events(50, seed=5), fetched_at=0)
+    before = eonet_data.result_cache.stats()
+    first = eonet_data.get_summary_statistics()
+    assert eonet_data.get_summary_statistics() is first
+    assert eonet_data.result_cache.stats()['hits'] == before['hits'] + 1
+
+    eonet_data.publish(events=generate_events(60, seed=5), fetched_at=0)
+    assert eonet_data.get_summary_statistics()['event_count'] == 60
+
+
+def test_map_features_cluster_at_low_zoom():
+    from app import eonet_data
+    from synthetic import generate_events
+
+    payload = generate_events(500, seed=9)
+    eonet_data.publish(events=payload, fetched_at=0)
+    client = app.test_client()
+
+    low = client.get('/api/map/features?zoom=1').json
+    assert low['clustered']
+    assert low['total'] == 500
+    assert sum(f['properties'].get('count', 1) for f in low['features']) == 500
+    assert len(low['features']) < 500
+
+    high = client.get('/api/map/features?zoom=10&bbox=-180,-90,180,90&event_type=wildfires').json
+    assert not high['clustered']
+    assert all(f['properties']['category'] == 'Wildfires' for f in high['features'])
+
+    event_id = high['features'][0]['id']
+    detail = client.get(f'/api/events/{event_id}')
+    assert detail.json['id'] == event_id
+    assert client.get('/api/events/missing').status_code == 404
+    assert client.get('/api/map/features?bbox=1,2').status_code == 400
+
+
+def test_events_spatial_filters_use_every_geometry_point():
+    from app import eonet_data
+
+    track = stub_event('track', ['2024-01-01', '2024-01-02'])
+    track['geometry'][1]['coordinates'] = [151.2, -33.9]  # ends near Sydney
+    elsewhere = stub_event('elsewhere', ['2024-01-01'])
+    eonet_data.publish(events={'events': [track, elsewhere]}, fetched_at=0)
+    client = app.test_client()
+
+    near = client.get('/api/events?near=-33.87,151.21&radius_km=50').json
+    assert [e['id'] for e in near['events']] == ['track']
+    boxed = client.get('/api/events?bbox=0,0,5,5').json
+    assert {e['id'] for e in boxed['events']} == {'track', 'elsewhere'}
+    assert client.get('/api/events?near=1,2').status_code == 400
+    assert len(client.get('/api/events').json['events']) == 2
+
+
+def test_events_filter_by_country_of_any_geometry_point():
+    from app import eonet_data
+
+    track = stub_event('track', ['2024-01-01', '2024-01-02'])
+    track['geometry'][0]['coordinates'] = [-30.0, 40.0]  # starts in the Atlantic
+    track['geometry'][1]['coordinates'] = [-8.0, 39.5]   # makes landfall in Portugal
+    paris = stub_event('paris', ['2024-01-01'])
+    paris['geometry'][0]['coordinates'] = [2.35, 48.85]
+    eonet_data.publish(events={'events': [track, paris]}, fetched_at=0)
+    client = app.test_client()
+
+    found = lambda query: [e['id'] for e in client.get(f"/api/events?{query}").json['events']]
+    assert found('country=prt') == ['track']
+    assert found('country=FRA,PRT') == ['track', 'paris']
+    assert found('country=FRA&bbox=-10,35,0,45') == []
+    assert found('country=ESP') == []
+    assert client.get('/api/events?country=XYZ').status_code == 400
+    assert eonet_data.get_region_name(2.35, 48.85) == 'Europe'
+
+
+def test_tracks_are_simplified_for_low_zoom():
+    from app import eonet_data
+    # A zigzag whose small wiggles only show at deep zoom
+    zigzag = [[i * 0.5, 0.01 * (i % 2)] for i in range(21)]
+    storm = {'id': 'storm', 'title': 'Storm', 'closed': None,
+             'categories': [{'id': 'severeStorms', 'title': 'Severe Storms'}],
+             'geometry': [{'date': f"2024-01-{i + 1:02d}T00:00:00Z", 'type': 'Point',
+                           'coordinates': point, 'magnitudeValue': 30.0 + i, 'magnitudeUnit': 'kts'}
+                          for i, point in enumerate(zigzag)]}
+    eonet_data.publish(events={'events': [storm, stub_event('fire', ['2024-01-05'])]}, fetched_at=0)
+    client = app.test_client()
+
+    full = client.get('/api/events/storm/track').json
+    assert full['geometry'] == {'type': 'LineString', 'coordinates': zigzag}
+    assert full['properties']['times'][0] == '2024-01-01T00:00:00Z'
+    assert full['properties']['magnitudes'][-1] == 50.0
+
+    low = client.get('/api/events/storm/track?zoom=3').json
+    assert low['geometry']['coordinates'] == [[0.0, 0.0], [10.0, 0.0]]
+    assert low['properties'] == dict(low['properties'], points=21, vertices=2,
+                                     times=['2024-01-01T00:00:00Z', '2024-01-21T00:00:00Z'])
+    assert client.get('/api/events/fire/track?zoom=3').json['geometry']['type'] == 'Point'
+    assert client.get('/api/events/missing/track').status_code == 404
+
+    bulk = client.get('/api/tracks?bbox=4,-1,6,1&zoom=12').json
+    assert [feature['id'] for feature in bulk['features']] == ['storm']
+    assert bulk['features'][0]['properties']['vertices'] == 21
+    assert client.get('/api/tracks?zoom=3').status_code == 400
+
+
+def test_metrics_report_stage_timings_by_route():
+    from app import eonet_data
+    from synthetic import generate_events
+
+    eonet_data.publish(events=generate_events(50, seed=4), fetched_at=0)
+    client = app.test_client()
+    client.get('/api/events?event_type=wildfires')
+    client.get('/api/summary')
+
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.content_type.startswith('text/plain; version=0.0.4')
+    body = response.get_data(as_text=True)
+    assert 'eonet_stage_duration_seconds_count{stage="filter",route="/api/events"}' in body
+    assert 'eonet_stage_duration_seconds_count{stage="serialize",route="/api/events"}' in body
+    assert 'eonet_stage_duration_seconds_count{stage="aggregate",route="/api/summary"}' in body
+    assert 'eonet_request_duration_seconds_count{route="/api/summary",status="200"}' in body
+    assert 'eonet_events 50' in body
+
+
+def test_conditional_get_and_precompressed_bytes_on_the_wire(monkeypatch):
+    import gzip
+    from app import eonet_data, response_cache
+    from synthetic import generate_events
+
+    eonet_data.publish(events=generate_events(300, seed=5), fetched_at=0)
+    client = app.test_client()
+
+    plain = client.get('/api/events?event_type=wildfires')
+    etag = plain.headers['ETag']
+    assert plain.headers['Cache-Control'] == 'public, no-cache'
+    assert 'Content-Encoding' not in plain.headers
+
+    # Blank parameters and parameter order do not change the cache entry
+    compressed = client.get('/api/events?start_date=&event_type=wildfires',
+                            headers={'Accept-Encoding': 'gzip'})
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert compressed.headers['ETag'] == etag
+    assert gzip.decompress(compressed.data) == plain.data
+
+    # Revalidation is answered from the ETag alone, without the view or a stored body
+    monkeypatch.setattr(eonet_data, 'get_filtered_events', None)
+    response_cache.clear()
+    revalidated = client.get('/api/events?event_type=wildfires', headers={'If-None-Match': etag})
+    assert revalidated.status_code == 304
+    assert revalidated.headers['ETag'] == etag
+
+    sizes = {'identity': len(plain.data), 'gzip': len(compressed.data),
+             'not modified': len(revalidated.data)}
+    assert sizes['gzip'] * 4 < sizes['identity']
+    assert sizes['not modified'] == 0
+    monkeypatch.undo()
+
+    # New data is a new ETag
+    eonet_data.publish(events=generate_events(300, seed=6), fetched_at=0)
+    changed = client.get('/api/events?event_type=wildfires', headers={'If-None-Match': etag})
+    assert changed.status_code == 200 and changed.headers['ETag'] != etag
+
+    # Bad input is answered but never stored
+    assert client.get('/api/events?bbox=1,2').status_code == 400
+
+
+def test_events_stream_pages_with_cursor_stable_across_refresh():
+    import json
+    from app import eonet_data
+    from synthetic import generate_events
+
+    payload = generate_events(120, seed=6)
+    eonet_data.publish(events=payload, fetched_at=0)
+    client = app.test_client()
+
+    first = client.get('/api/events?limit=50&fields=id,date,magnitude')
+    assert first.is_streamed
+    page = first.json
+    assert len(page['events']) == 50
+    assert set(page['events'][0]) == {'id', 'date', 'magnitude'}
+    assert first.headers['X-Next-Cursor'] == page['next_cursor']
+
+    # A refresh adds an event and drops one already returned
+    fresh = stub_event('fresh', ['2099-01-01'])
+    events = [fresh] + [e for e in payload['events'] if e['id'] != page['events'][-1]['id']]
+    eonet_data.publish(events=dict(payload, events=events), fetched_at=0)
+
+    seen = [e['id'] for e in page['events']]
+    cursor = page['next_cursor']
+    while cursor:
+        lines = client.get(f'/api/events?limit=50&fields=id&format=ndjson&cursor={cursor}')
+        assert lines.mimetype == 'application/x-ndjson'
+        seen.extend(json.loads(line)['id'] for line in lines.get_data(as_text=True).splitlines())
+        cursor = lines.headers.get('X-Next-Cursor')
+    assert sorted(seen) == sorted(e['id'] for e in payload['events'])
+
+    assert client.get('/api/events?fields=nope').status_code == 400
+    assert client.get('/api/events?cursor=%%%').status_code == 400
+    assert set(client.get('/api/events').json) == {'events'}
+
+
+def test_workers_map_the_fetchers_shared_snapshot(monkeypatch, tmp_path):
+    from datetime import date, timedelta
+    from app import EONETData
+    from eonet_stub import EONETStub
+
+    today = date.today()
+    day = lambda n: (today - timedelta(days=n)).isoformat()
+    events = [stub_event('a', [day(5)]), stub_event('b', [day(6)])]
+
+    with EONETStub(events) as stub:
+        monkeypatch.setenv('EONET_API', stub.url)
+        monkeypatch.setenv('EONET_OFFLINE', '0')
+        monkeypatch.setenv('EONET_SHARED_DIR', str(tmp_path))
+        monkeypatch.setenv('EONET_ROLE', 'worker')
+        worker = EONETData()
+        assert not worker.initialized  # nothing published yet
+
+        monkeypatch.setenv('EONET_ROLE', 'fetcher')
+        fetcher = EONETData()
+        fetched = len(stub.requests)
+        assert worker.refresh()
+        assert worker.initialized and len(worker.events_index) == 2
+        assert worker.get_event('a')['id'] == 'a'
+
+        stub.set_events(events + [stub_event('c', [day(1)])])
+        version = worker.data_version
+        assert fetcher.fetch_events()
+        assert worker.refresh()
+        assert worker.data_version > version
+        assert [e['id'] for e in worker.get_filtered_events(start_date=day(2))['events']] == ['c']
+
+        # A fetch that changes nothing only moves the fetch time
+        version = worker.data_version
+        assert fetcher.fetch_events()
+        assert worker.refresh()
+        assert worker.data_version == version
+        assert worker.snapshot.fetched_at == fetcher.snapshot.fetched_at
+
+        # Workers never call upstream themselves
+        assert len(stub.requests) == fetched + 2
+
+
+def test_trends_return_every_category_in_one_call():
+    from app import eonet_data
+    events = [stub_event('a', ['2024-01-03']), stub_event('b', ['2024-03-20']),
+              stub_event('c', ['2024-03-02'], category='volcanoes')]
+    eonet_data.publish(events={'events': events}, fetched_at=0)
+    client = app.test_client()
+
+    data = client.get('/api/trends?category=wildfires,volcanoes&period=monthly&window=2').json
+    assert data['periods'] == ['2024-01', '2024-02', '2024-03']
+    assert data['series']['wildfires']['counts'] == data['counts'] == [1, 0, 1]
+    assert data['series']['volcanoes']['counts'] == [0, 0, 1]
+    assert data['series']['volcanoes']['rolling_mean'] == [0.0, 0.0, 0.5]
+    assert data['trend'] == data['series']['wildfires']['slope'] == 0.0
+    assert client.get('/api/trends').json['series']['all']['counts'] == [1, 0, 2]
+    assert client.get('/api/trends?period=weekly').json['periods'][0] == '2024-01-01'
+    assert client.get('/api/trends?period=fortnightly').status_code == 400
+    assert client.get('/api/trends?start_date=2024-13-01').status_code == 400
+    assert client.get('/api/trends?start_date=2024-03-01').json['periods'] == ['2024-03']
+
+
+def test_stream_route_resumes_after_last_event_id():
+    from app import eonet_data
+    log = eonet_data.delta_log
+    log.append({'version': 1, 'summary': {'event_count': 1}, 'added': [], 'updated': [],
+                'closed': [], 'removed': []})
+    response = app.test_client().get('/api/stream', headers={'Last-Event-ID': log.event_id(log.seq - 1)},
+                                     buffered=False)
+    assert response.mimetype == 'text/event-stream'
+    chunks = iter(response.response)
+    assert next(chunks) == b'retry: 5000\n\n'
+    assert next(chunks).startswith(f"event: delta\nid: {log.event_id(log.seq)}\n".encode())
+    response.close()
+
+
+def test_history_beyond_the_window_comes_from_the_archive(monkeypatch, tmp_path):
+    from datetime import date, timedelta
+    from app import EONETData
+    from eonet_stub import EONETStub
+
+    today = date.today()
+    day = lambda n: (today - timedelta(days=n)).isoformat()
+    events = [stub_event('new', [day(10)]), stub_event('old', [day(400)]),
+              stub_event('older', [day(900)], category='volcanoes')]
+
+    with EONETStub(events) as stub:
+        monkeypatch.setenv('EONET_API', stub.url)
+        monkeypatch.setenv('EONET_OFFLINE', '0')
+        monkeypatch.setenv('EONET_ARCHIVE', str(tmp_path))
+        data = EONETData()
+        assert data.fetch_events(days=1000, incremental=False)
+        # Later refreshes only keep a year in memory
+        assert data.fetch_events(days=365, incremental=False)
+        assert [e['id'] for e in data.snapshot.events['events']] == ['new']
+
+        assert [e['id'] for e in data.get_filtered_events(start_date=day(1000))['events']] == \
+            ['new', 'old', 'older']
+        assert [e['id'] for e in data.get_filtered_events(start_date=day(1000), end_date=day(100),
+                                                          event_type='volcanoes')['events']] == ['older']
+        assert [e['id'] for e in data.get_filtered_events(start_date=day(30))['events']] == ['new']
+
+        analysis = data.get_analysis_data(period=1000)
+        assert sum(analysis['trends']['values']) == 3
+        assert [e['id'] for e in analysis['events']['events']] == ['new', 'old', 'older']
+        assert sum(data.get_analysis_data(period=365)['trends']['values']) == 1
+
+        trends = data.get_trend_analysis('wildfires,volcanoes', 'annually', start_date=day(1000))
+        assert sum(trends['series']['wildfires']['counts']) == 2
+        assert sum(trends['series']['volcanoes']['counts']) == 1
+        trends = data.get_trend_analysis(None, 'monthly', start_date=day(30), end_date=day(5))
+        assert trends['series']['all']['total'] == 1
+
+        # Pages of an archived range walk the same events as the whole result
+        import app as app_module
+        monkeypatch.setattr(app_module, 'eonet_data', data)
+        client = app.test_client()
+        whole = [e['id'] for e in client.get(f"/api/events?start_date={day(1000)}").json['events']]
+        paged, cursor = [], ''
+        while True:
+            page = client.get(f"/api/events?start_date={day(1000)}&limit=1&cursor={cursor}").json
+            paged += [e['id'] for e in page['events']]
+            cursor = page['next_cursor']
+            if cursor is None:
+                break
+        assert paged == whole == ['new', 'old', 'older']
+
+
+def test_export_streams_filtered_points():
+    import gzip
+    import json
+    from app import eonet_data
+    events = [stub_event('a', ['2024-01-03', '2024-01-04']), stub_event('b', ['2024-03-20']),
+              stub_event('c', ['2024-03-02'], category='volcanoes')]
+    eonet_data.publish(events={'events': events}, fetched_at=0)
+    client = app.test_client()
+
+    lines = client.get('/api/analysis/export?event_type=wildfires').data.decode().splitlines()
+    assert [line.split(',')[:2] for line in lines[1:]] == [['a', 'Event a'], ['a', 'Event a'], ['b', 'Event b']]
+
+    # The analysis page's request shape, gzipped for clients that accept it
+    response = client.post('/api/analysis/export', headers={'Accept-Encoding': 'gzip'},
+                           json={'type': 'ndjson', 'filters': {'categories': ['volcanoes', 'nope'],
+                                                               'start_date': '2024-03-01'}})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.mimetype == 'application/x-ndjson'
+    rows = [json.loads(line) for line in gzip.decompress(response.data).splitlines()]
+    assert [(row['event_id'], row['date']) for row in rows] == [('c', '2024-03-02T00:00:00Z')]
+
+    collection = client.get('/api/analysis/export?format=geojson&bbox=0,0,5,5').json
+    assert len(collection['features']) == 4
+    assert client.get('/api/analysis/export?format=xlsx').status_code == 400
+    assert client.post('/api/analysis/export', json={'filters': {'timePeriod': 'x'}}).status_code == 400
+    for filters in ([1], 'x', 3):
+        assert client.post('/api/analysis/export', json={'filters': filters}).status_code == 400
+
+
+def test_export_memory_stays_flat_as_results_grow(monkeypatch):
+    import tracemalloc
+    from datetime import date, timedelta
+    import event_export
+    from app import eonet_data
+    from synthetic import generate_events
+    monkeypatch.setattr(event_export, 'CHUNK_SIZE', 200)
+    eonet_data.publish(events=generate_events(4000, seed=4), fetched_at=0)
+    client = app.test_client()
+
+    def export(query):
+        response = client.get(f"/api/analysis/export?format=ndjson&{query}", buffered=False)
+        tracemalloc.start()
+        size = sum(len(chunk) for chunk in response.response)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        response.close()
+        return size, peak
+
+    recent = (date.today() - timedelta(days=60)).isoformat()
+    small_size, small_peak = export(f"start_date={recent}")
+    size, peak = export('')
+    assert size > 4 * small_size and size > 3_000_000
+    # Held memory is one chunk of points, whatever the size of the result
+    assert peak < size / 5 and peak < 1.5 * small_peak
+
+
+def test_analysis_facets_and_include():
+    from datetime import date, timedelta
+    from app import eonet_data
+    from synthetic import generate_events
+    eonet_data.publish(events=generate_events(3000, seed=9, days=300), fetched_at=0)
+    client = app.test_client()
+
+    full = client.get('/api/analysis/data?period=365').json
+    lean = client.get('/api/analysis/data?period=365&include=trends,severity_levels').json
+    assert set(lean) == {'trends', 'severity_levels'}
+    assert lean['trends'] == full['trends']
+    assert len(full['events']['events']) == 3000
+
+    for facet in ('trends', 'categories', 'geographic', 'countries', 'severity', 'severity_levels',
+                  'weekday'):
+        assert client.get(f"/api/analysis/{facet}?period=365").json == full[facet]
+    trends = full['trends']
+    assert all(sum(day) >= total for day, total in zip(zip(*trends['series'].values()), trends['values']))
+
+    severity = client.get('/api/analysis/severity?period=365&points=20').json
+    assert all(len(points) <= 20 for points in severity.values())
+    assert sum(full['severity_levels']['wildfires'].values()) > len(full['severity']['wildfires']) == 200
+
+    recent = client.get('/api/analysis/geographic?period=30&region=Europe').json
+    assert list(recent) == ['Europe']
+    european = client.get('/api/analysis/countries?period=365&region=Europe').json
+    assert set(european['regions']) == {'Europe'} and 'FRA' in european['codes']
+    assert sum(european['values']) == full['geographic']['Europe']
+    assert sum(full['countries']['values']) + full['geographic']['Ocean'] == sum(full['geographic'].values())
+    cutoff = (date.today() - timedelta(days=30)).isoformat()
+    assert sum(client.get('/api/analysis/trends?period=30').json['values']) == \
+        sum(1 for e in eonet_data.snapshot.events['events'] if e['geometry'][0]['date'][:10] >= cutoff)
+
+    assert client.get('/api/analysis/data?include=trends,nope').status_code == 400
+    assert client.get('/api/analysis/severity?points=1').status_code == 400
+    assert client.get('/api/analysis/unknown').status_code == 404
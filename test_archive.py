@@ -0,0 +1,164 @@
+import os
+import pickle
+
+import numpy as np
+import pytest
+
+from archive import EventArchive, first_day
+from event_index import EventIndex
+from rollup import SEVERITY_POINTS, Rollup, epoch_day
+from synthetic import generate_events
+from tests_support import trend_counts
+
+
+def ids(events):
+    return sorted(e['id'] for e in events)
+
+
+def test_queries_open_only_overlapping_partitions(tmp_path, monkeypatch):
+    events = generate_events(600, seed=5, days=3 * 365)['events']
+    archive = EventArchive(str(tmp_path))
+    assert archive.append(events) == len(events) == len(archive)
+    assert len(archive.manifest()) >= 36
+
+    opened = []
+    load = np.load
+    monkeypatch.setattr(np, 'load', lambda path, *args, **kwargs: opened.append(path) or load(path, *args, **kwargs))
+    months = sorted(archive.manifest())
+    start, end = months[10] + '-10', months[11] + '-05'
+    found = archive.filtered_events(start_date=start, end_date=end)
+    assert sorted({os.path.basename(path)[:7] for path in opened}) == months[10:12]
+    assert ids(found) == ids(e for e in events if start <= e['geometry'][0]['date'][:10] <= end)
+    days = [e['geometry'][0]['date'][:10] for e in found]
+    assert days == sorted(days, reverse=True)
+
+
+def test_filters_match_the_in_memory_index(tmp_path):
+    events = generate_events(800, seed=6, days=2 * 365)['events']
+    archive = EventArchive(str(tmp_path))
+    archive.append(events)
+    index = EventIndex(events)
+    months = sorted(archive.manifest())
+    for filters in ({'start_date': '2000-01-01'},
+                    {'start_date': months[6] + '-01', 'event_type': 'wildfires'},
+                    {'start_date': months[3] + '-01', 'end_date': months[15] + '-20', 'min_magnitude': '2'},
+                    {'start_date': months[1] + '-01', 'bbox': (-30.0, -20.0, 60.0, 50.0)},
+                    {'start_date': months[1] + '-01', 'near': (10.0, 20.0), 'radius_km': 2000},
+                    {'start_date': months[2] + '-01', 'country': ('USA', 'CAN')}):
+        assert ids(archive.filtered_events(**filters)) == ids(index.take(index.filter_rows(**filters)))
+
+
+def test_refreshes_upsert_and_rollups_fold_partitions(tmp_path):
+    events = generate_events(500, seed=7, days=2 * 365)['events']
+    archive = EventArchive(str(tmp_path))
+    archive.append(events[:300])
+    updated = [dict(e, closed='2024-01-01T00:00:00Z') for e in events[250:300]]
+    archive.append(updated + events[300:])
+    assert len(archive) == len(events)
+    latest = {e['id']: e for e in events[:250] + updated + events[300:]}
+    assert {e['id']: e for e in archive.filtered_events(start_date='1970-01-01')} == latest
+
+    # A rewrite keeps the generation it replaced for readers of the old
+    # MANIFEST, and removes any older one
+    archive.append(updated)
+    months = [name[:7] for name in os.listdir(tmp_path) if name.endswith('.npz')]
+    assert max(months.count(month) for month in months) == 2
+    assert all(os.path.exists(os.path.join(tmp_path, partition['file'] + '.npz'))
+               for partition in archive.manifest().values())
+
+    whole = Rollup(latest.values())
+    assert archive.rollup().summary_statistics() == whole.summary_statistics()
+
+    # Rollups pickled before a Rollup.VERSION bump are rebuilt from the events
+    stale = next(iter(archive.manifest().values()))['file'] + '.rollup'
+    with open(os.path.join(tmp_path, stale), 'rb') as f:
+        rollup = pickle.load(f)
+    del rollup.version
+    rollup.days = Rollup().days
+    with open(os.path.join(tmp_path, stale), 'wb') as f:
+        pickle.dump(rollup, f)
+    rebuilt = archive.rollup()
+    for facet in ('geographic', 'countries', 'weekday', 'trends'):
+        assert getattr(rebuilt, f"analysis_{facet}")(0) == getattr(whole, f"analysis_{facet}")(0)
+    with open(os.path.join(tmp_path, stale), 'rb') as f:
+        rollup = pickle.load(f)
+    # Partitions keep level counts and thinned points, not one entry per event
+    assert rollup.version == Rollup.VERSION and not rollup.severity
+    assert all(len(points) <= SEVERITY_POINTS for points in rollup.severity_points.values())
+    assert rebuilt.analysis_severity_levels(0) == whole.analysis_severity_levels(0)
+    start = epoch_day(sorted(archive.manifest())[8] + '-15')
+    assert trend_counts(archive.rollup(start), None, 'weekly') == \
+        trend_counts(Rollup.combine([whole], start), None, 'weekly')
+
+
+def test_events_moving_month_or_deleted_are_counted_once(tmp_path):
+    events = generate_events(300, seed=8, days=2 * 365)['events']
+    archive = EventArchive(str(tmp_path))
+    archive.append(events)
+    months = sorted(archive.manifest())
+
+    # The first geometry of an event is revised into another month
+    target = months[-1] if events[0]['geometry'][0]['date'].startswith(months[0]) else months[0]
+    moved = dict(events[0], geometry=[dict(events[0]['geometry'][0], date=target + '-02T00:00:00Z')]
+                 + events[0]['geometry'][1:])
+    archive.append([moved])
+    assert len(archive) == len(events)
+    found = [e for e in archive.filtered_events(start_date='1970-01-01') if e['id'] == moved['id']]
+    assert found == [moved]
+    assert archive.rollup().event_count == len(events)
+
+    assert archive.remove([events[1]['id'], 'unknown']) == 1
+    assert len(archive) == len(events) - 1
+    assert events[1]['id'] not in {e['id'] for e in archive.filtered_events(start_date='1970-01-01')}
+    # A fresh archive object reads the id map back from disk
+    assert EventArchive(str(tmp_path)).append([dict(moved)]) == 1
+    assert len(archive) == len(events) - 1
+
+
+def test_pages_walk_the_index_order_reading_only_the_partitions_needed(tmp_path, monkeypatch):
+    events = generate_events(600, seed=9, days=3 * 365)['events']
+    archive = EventArchive(str(tmp_path))
+    archive.append(events)
+    index = EventIndex(events)
+    rows, _ = index.page(index.filter_rows(start_date='1970-01-01', event_type='wildfires'))
+    expected = index.ids[rows].tolist()
+
+    paged, after = [], None
+    while True:
+        page, after = archive.page(50, after, start_date='1970-01-01', event_type='wildfires')
+        paged += [e['id'] for e in page]
+        if after is None:
+            break
+    assert paged == expected
+
+    opened = []
+    load = np.load
+    monkeypatch.setattr(np, 'load', lambda path, *args, **kwargs: opened.append(path) or load(path, *args, **kwargs))
+    page, after = archive.page(5, after=(epoch_day(sorted(archive.manifest())[20] + '-01'), ''))
+    assert len(page) == 5 and after == (first_day(page[-1]), page[-1]['id'])
+    assert len(opened) < 5
+
+    with pytest.raises(ValueError):
+        archive.filtered_events(start_date='1970-01-01', max_events=100)
+
+
+def test_refreshes_read_only_the_partitions_they_change(tmp_path, monkeypatch):
+    events = generate_events(400, seed=10, days=2 * 365)['events']
+    EventArchive(str(tmp_path)).append(events)
+    archive = EventArchive(str(tmp_path))
+    archive.append(events[:1])
+
+    reads, opened = [], []
+    read_manifest, load = archive._read_manifest, np.load
+    monkeypatch.setattr(archive, '_read_manifest', lambda: reads.append(1) or read_manifest())
+    monkeypatch.setattr(np, 'load', lambda path, *args, **kwargs: opened.append(path) or load(path, *args, **kwargs))
+    for _ in range(3):
+        archive.manifest()
+    assert not reads
+
+    changed = dict(events[1], closed='2024-01-01T00:00:00Z')
+    assert archive.append([changed]) == 1
+    month = events[1]['geometry'][0]['date'][:7]
+    assert {os.path.basename(path)[:7] for path in opened} == {month}
+    assert len(reads) == 1
+    assert len(archive) == len(events)
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from countries import NO_COUNTRY, OCEAN, REGIONS, CountryLookup, country_lookup, parse_countries
+
+
+def square(x, y, size):
+    return [[x, y], [x, y + size], [x + size, y + size], [x + size, y], [x, y]]
+
+
+def test_bundled_boundaries_name_countries_and_regions():
+    lookup = country_lookup()
+    points = {(2.35, 48.85): 'FRA', (-77.0, 38.9): 'USA', (28.2, -29.5): 'LSO',
+              (25.0, -29.0): 'ZAF', (139.7, 35.7): 'JPN', (-47.9, -15.8): 'BRA',
+              (0.0, -85.0): 'ATA', (-150.0, 0.0): None, (-30.0, 40.0): None}
+    codes = lookup.countries([lon for lon, _ in points], [lat for _, lat in points])
+    assert [lookup.codes[code] if code >= 0 else None for code in codes] == list(points.values())
+    assert [REGIONS[region] for region in lookup.regions(codes)] == [
+        'Europe', 'North America', 'Africa', 'Africa', 'Asia', 'South America', 'Antarctica',
+        'Ocean', 'Ocean']
+    assert lookup.countries([np.nan, 2.35], [0.0, np.nan]).tolist() == [NO_COUNTRY, NO_COUNTRY]
+
+
+def test_holes_and_exclaves_use_parity_over_rings():
+    # A: a square with a hole, plus an island; B: a square filling A's hole
+    features = [
+        {'properties': {'iso_a3': 'AAA', 'name': 'A', 'region': 'Europe'},
+         'geometry': {'type': 'MultiPolygon',
+                      'coordinates': [[square(0, 0, 10), square(4, 4, 2)], [square(20, 0, 1)]]}},
+        {'properties': {'iso_a3': 'BBB', 'name': 'B', 'region': 'Africa'},
+         'geometry': {'type': 'Polygon', 'coordinates': [square(4, 4, 2)]}},
+    ]
+    lookup = CountryLookup(features, cell_size=3.0)
+    lons, lats = np.array([1, 5, 20.5, 15, 9.5]), np.array([1, 5, 0.5, 5, 0.5])
+    assert lookup.locate(lons, lats).tolist() == [0, 1, 0, NO_COUNTRY, 0]
+    assert lookup.regions([0, 1, NO_COUNTRY]).tolist() == [REGIONS.index('Europe'),
+                                                          REGIONS.index('Africa'), OCEAN]
+    assert lookup.code('bbb') == 1 and lookup.code('ZZZ') == NO_COUNTRY
+
+
+def test_cached_lookups_match_fresh_point_in_polygon_tests():
+    lookup = country_lookup()
+    rng = np.random.default_rng(3)
+    lons = np.round(rng.uniform(-180, 180, 20000), 2)
+    lats = np.round(rng.uniform(-89, 89, 20000), 2)
+    codes = lookup.countries(lons, lats)
+    assert (codes == lookup.countries(lons, lats)).all()
+    assert (codes == lookup.locate(lons, lats)).all()
+    assert 0.2 < (codes >= 0).mean() < 0.4
+
+
+def test_parse_countries():
+    assert parse_countries(None) is None
+    assert parse_countries('usa, fra,USA') == ('FRA', 'USA')
+    with pytest.raises(ValueError):
+        parse_countries('FRA,XYZ')
@@ -0,0 +1,112 @@
+import time
+from datetime import date, timedelta
+
+import pytest
+import requests
+
+from eonet_client import CircuitBreaker, CircuitOpenError, EONETClient, date_shards
+from eonet_stub import EONETStub
+from synthetic import generate_events
+
+
+class FlakyStub(EONETStub):
+    """Fails the first `failures` requests with `status`"""
+
+    def __init__(self, *args, failures=0, status=503, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.failures = failures
+        self.status = status
+
+    def respond(self, path, params):
+        if self.failures > 0:
+            self.failures -= 1
+            return self.status, {'error': 'injected'}
+        return super().respond(path, params)
+
+
+def test_date_shards_cover_range_without_overlap():
+    start, end = date(2024, 1, 1), date(2024, 12, 31)
+    shards = date_shards(start, end, 30)
+    assert shards[0][1] == end and shards[-1][0] == start
+    covered = [shard_start + timedelta(days=i) for shard_start, shard_end in shards
+               for i in range((shard_end - shard_start).days + 1)]
+    assert sorted(covered) == [start + timedelta(days=i) for i in range(366)]
+
+
+def test_retries_transient_errors_with_backoff():
+    delays = []
+    with FlakyStub(failures=2) as stub:
+        client = EONETClient(stub.url, retries=3, backoff=0.1, sleep=delays.append)
+        assert client.categories()['categories'] == []
+    assert len(delays) == 2 and all(0 <= d <= 0.2 for d in delays)
+
+    with FlakyStub(failures=1, status=404) as stub:
+        client = EONETClient(stub.url, retries=3, sleep=delays.append)
+        with pytest.raises(requests.HTTPError):
+            client.categories()
+        assert len(stub.requests) == 1
+
+
+def test_read_timeout_is_enforced():
+    with EONETStub(latency=0.5) as stub:
+        client = EONETClient(stub.url, timeout=(1, 0.05), retries=1, sleep=lambda d: None)
+        started = time.perf_counter()
+        with pytest.raises(requests.Timeout):
+            client.categories()
+        assert time.perf_counter() - started < 0.5
+
+
+def test_circuit_breaker_fails_fast_then_probes():
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=lambda: now[0])
+    errors = []
+    with FlakyStub(failures=3) as stub:
+        client = EONETClient(stub.url, retries=5, breaker=breaker, sleep=lambda d: None,
+                             on_error=lambda endpoint, e: errors.append(type(e)))
+        with pytest.raises(CircuitOpenError):
+            client.categories()
+        assert len(stub.requests) == 2 and breaker.state == 'open'
+
+        now[0] = 11  # half-open: one probe, which fails and re-opens the circuit
+        with pytest.raises(CircuitOpenError):
+            client.categories()
+        assert len(stub.requests) == 3
+
+        now[0] = 22
+        assert client.categories()['categories'] == []
+        assert breaker.state == 'closed'
+    assert errors.count(CircuitOpenError) == 2
+
+
+def test_sharded_fetch_matches_single_request_under_latency_and_errors():
+    end = date.today()
+    start = end - timedelta(days=365)
+    events = generate_events(3000, seed=3, end=end)['events']
+    # A track long enough to be returned by several shards
+    events[0]['geometry'] = [dict(events[0]['geometry'][0], date=f"{end - timedelta(days=n)}T00:00:00Z")
+                             for n in (100, 50, 1)]
+
+    with EONETStub(events, latency=0.05, latency_per_event=2e-5) as stub:
+        single, stats = EONETClient(stub.url, shard_days=366).events(start, end)
+        assert stats['shards'] == 1
+
+    with EONETStub(events, latency=0.05, latency_per_event=2e-5, error_rate=0.2, seed=1) as stub:
+        client = EONETClient(stub.url, shard_days=30, max_workers=4, retries=6, backoff=0.01)
+        sharded, stats = client.events(start, end)
+
+    # Shards are fetched concurrently, never by more than max_workers at once
+    assert 1 < stub.peak_in_flight <= 4
+    assert stats['shards'] == 13 and stats['duplicates'] > 0
+    # The stub gzips like upstream; bytes counts what came over the wire
+    assert 0 < stats['bytes'] < stats['decoded_bytes'] / 2
+    assert len(stub.requests) > stats['shards']
+    assert sorted(e['id'] for e in sharded['events']) == sorted(e['id'] for e in single['events'])
+    by_id = {e['id']: e for e in single['events']}
+    assert all(e == by_id[e['id']] for e in sharded['events'])
+
+
+def test_bytes_fall_back_to_the_body_size_without_compression():
+    events = generate_events(50, seed=2)['events']
+    with EONETStub(events, compress=False) as stub:
+        _, stats = EONETClient(stub.url, shard_days=400).events(date(2000, 1, 1), date.today())
+    assert stats['bytes'] == stats['decoded_bytes'] > 0
@@ -0,0 +1,60 @@
+import csv
+import io
+import json
+
+import pytest
+
+from event_export import COLUMNS, export_events, parse_format, point_rows
+
+EVENT = {
+    'id': 'EONET_1', 'title': 'Storm "A", north', 'closed': None, 'link': 'https://example.test/1',
+    'categories': [{'id': 'severeStorms', 'title': 'Severe Storms'}],
+    'magnitudeValue': 3.5, 'magnitudeUnit': 'kts',
+    'geometry': [
+        {'date': '2024-01-01T00:00:00Z', 'type': 'Point', 'coordinates': [10.0, 20.0],
+         'magnitudeValue': 45, 'magnitudeUnit': 'kts'},
+        {'date': '2024-01-02T00:00:00Z', 'type': 'Point', 'coordinates': [11.0, 21.0]},
+        {'date': '2024-01-03T00:00:00Z', 'type': 'Polygon',
+         'coordinates': [[[0.0, 0.0], [2.0, 0.0], [2.0, 2.0], [0.0, 2.0]]]},
+    ],
+}
+
+
+def test_one_row_per_point_with_resolved_magnitude():
+    rows = [dict(zip(COLUMNS, row)) for row in point_rows(EVENT)]
+    assert [row['point'] for row in rows] == [0, 1, 2]
+    assert [(row['magnitude'], row['magnitude_unit']) for row in rows] == \
+        [(45.0, 'kts'), (3.5, 'kts'), (3.5, 'kts')]
+    assert (rows[2]['longitude'], rows[2]['latitude']) == (1.0, 1.0)
+    assert rows[0]['category'] == 'Severe Storms'
+
+    bare = dict(EVENT, geometry=[], magnitudeValue=None)
+    assert [dict(zip(COLUMNS, row))['magnitude'] for row in point_rows(bare)] == [None]
+
+
+def test_text_formats_round_trip():
+    events = [EVENT, dict(EVENT, id='EONET_2')]
+    table = list(csv.reader(io.StringIO(b''.join(export_events(events, 'csv')).decode())))
+    assert table[0] == list(COLUMNS) and len(table) == 7
+    assert table[1][COLUMNS.index('title')] == EVENT['title']
+
+    lines = b''.join(export_events(events, 'ndjson')).decode().splitlines()
+    assert [json.loads(line)['event_id'] for line in lines] == ['EONET_1'] * 3 + ['EONET_2'] * 3
+
+    collection = json.loads(b''.join(export_events(events, 'geojson')))
+    assert collection['features'][1]['geometry'] == {'type': 'Point', 'coordinates': [11.0, 21.0]}
+    assert json.loads(b''.join(export_events([], 'geojson'))) == \
+        {'type': 'FeatureCollection', 'features': []}
+    assert b''.join(export_events([], 'csv')).decode() == ','.join(COLUMNS) + '\n'
+
+    with pytest.raises(ValueError):
+        parse_format('xlsx')
+
+
+def test_parquet_has_typed_columns():
+    pyarrow = pytest.importorskip('pyarrow')
+    import pyarrow.parquet
+    data = b''.join(export_events([EVENT] * 3, 'parquet'))
+    table = pyarrow.parquet.read_table(pyarrow.BufferReader(data))
+    assert table.num_rows == 9
+    assert table.column('magnitude').to_pylist()[:3] == [45.0, 3.5, 3.5]
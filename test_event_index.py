@@ -0,0 +1,153 @@
+import itertools
+import random
+
+import numpy as np
+
+from countries import country_lookup
+from event_index import EventIndex
+from synthetic import generate_events
+
+
+def legacy_filter(events, start_date=None, end_date=None, event_type=None,
+                  min_magnitude=None, max_magnitude=None):
+    """The per-event loop EventIndex replaces, kept as the reference behaviour"""
+    filtered_events = []
+    for event in events:
+        try:
+            if start_date and event['geometry'][0]['date'][:10] < start_date:
+                continue
+            if end_date and event['geometry'][0]['date'][:10] > end_date:
+                continue
+            if event_type and event['categories'][0]['id'] != event_type:
+                continue
+
+            magnitude = None
+            if 'magnitudeValue' in event:
+                try:
+                    mag_value = event.get('magnitudeValue')
+                    if mag_value is not None and str(mag_value).strip():
+                        magnitude = float(mag_value)
+                except (ValueError, TypeError):
+                    pass
+
+            if magnitude is None and event.get('geometry'):
+                for geo in event['geometry']:
+                    try:
+                        mag_value = geo.get('magnitudeValue')
+                        if mag_value is not None and str(mag_value).strip():
+                            magnitude = float(mag_value)
+                            break
+                    except (ValueError, TypeError):
+                        continue
+
+            if magnitude is not None and (min_magnitude is not None or max_magnitude is not None):
+                if min_magnitude and magnitude < float(min_magnitude):
+                    continue
+                if max_magnitude and magnitude > float(max_magnitude):
+                    continue
+
+            filtered_events.append(event)
+        except Exception:
+            continue
+    return filtered_events
+
+
+def make_events(count=400, seed=7):
+    rng = random.Random(seed)
+    categories = ['wildfires', 'severeStorms', 'volcanoes', 'seaLakeIce']
+    events = []
+    for i in range(count):
+        geometry = []
+        for j in range(rng.randint(0, 3)):
+            geo = {
+                'date': f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T00:00:00Z",
+                'type': 'Point',
+                'coordinates': [rng.uniform(-180, 180), rng.uniform(-90, 90)],
+            }
+            roll = rng.random()
+            if roll < 0.3:
+                geo['magnitudeValue'] = round(rng.uniform(0, 12), 2)
+            elif roll < 0.35:
+                geo['magnitudeValue'] = None
+            elif roll < 0.4:
+                geo['magnitudeValue'] = ''
+            geometry.append(geo)
+        event = {
+            'id': f"EONET_{i}",
+            'title': f"Event {i}",
+            'categories': [{'id': rng.choice(categories), 'title': 'x'}] if rng.random() > 0.05 else [],
+            'geometry': geometry,
+        }
+        if rng.random() < 0.1:
+            event['magnitudeValue'] = rng.choice([3.5, '7', 'bad', None])
+        events.append(event)
+    return events
+
+
+def test_index_matches_legacy_filter():
+    events = make_events()
+    index = EventIndex(events)
+
+    options = {
+        'start_date': [None, '', '2024-03-15'],
+        'end_date': [None, '2024-09-01'],
+        'event_type': [None, 'wildfires', 'unknown'],
+        'min_magnitude': [None, 0, '0.00', '2.5', 'bad'],
+        'max_magnitude': [None, '8', '20.00'],
+    }
+    keys = list(options)
+    for values in itertools.product(*options.values()):
+        params = dict(zip(keys, values))
+        expected = legacy_filter(events, **params)
+        assert index.select(index.mask(**params)) == expected, params
+
+
+def test_index_columns():
+    events = [
+        {'id': 'a', 'categories': [{'id': 'volcanoes'}], 'magnitudeValue': '4.5',
+         'geometry': [{'date': '2024-05-01T12:00:00Z', 'type': 'Point', 'coordinates': [10.0, 20.0]}]},
+        {'id': 'b', 'categories': [], 'geometry': []},
+    ]
+    index = EventIndex(events)
+    assert str(index.dates[0]) == '2024-05-01'
+    assert index.category_ids == ['volcanoes']
+    assert index.magnitudes[0] == 4.5
+    assert (index.lons[0], index.lats[0]) == (10.0, 20.0)
+    assert index.category_codes[1] == -1
+
+
+def test_country_filter_matches_any_geometry_point():
+    events = generate_events(1500, seed=4)['events']
+    index = EventIndex(events)
+    lookup = country_lookup()
+
+    def countries(event):
+        lons, lats = zip(*(geo['coordinates'] for geo in event['geometry']))
+        return {lookup.codes[code] for code in lookup.countries(lons, lats) if code >= 0}
+
+    for country, filters in ((('USA',), {}), (('BRA', 'CAN'), {}), ('RUS', {'event_type': 'severeStorms'}),
+                             (('CHN',), {'bbox': (100.0, 20.0, 140.0, 60.0)})):
+        wanted = {country} if isinstance(country, str) else set(country)
+        expected = [event['id'] for row, event in enumerate(events)
+                    if countries(event) & wanted and row in set(index.filter_rows(**filters).tolist())]
+        assert expected
+        assert [events[row]['id'] for row in index.filter_rows(country=country, **filters)] == expected
+
+
+def test_page_walks_rows_newest_first_by_date_and_id():
+    events = make_events()
+    index = EventIndex(events)
+    rows = np.arange(len(index))
+
+    def key(row):
+        date = index.dates[row]
+        return (not np.isnat(date), date if not np.isnat(date) else 0, index.ids[row])
+
+    expected = sorted(rows, key=key, reverse=True)
+    walked, after = [], None
+    while True:
+        page, after = index.page(rows, limit=7, after=after)
+        walked.extend(page.tolist())
+        if after is None:
+            break
+    assert walked == [int(row) for row in expected]
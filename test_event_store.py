@@ -0,0 +1,59 @@
+import json
+import pickle
+
+from event_store import EventStore
+from snapshot import EventSnapshot
+from synthetic import generate_events
+
+UNUSUAL = [
+    {'id': 'poly', 'title': 'Polygon and odd points', 'extra': {'a': 1},
+     'categories': [{'id': 'floods', 'title': 'Floods', 'tags': ['nested']}],
+     'geometry': [
+         {'type': 'Polygon', 'coordinates': [[[0, 0], [1, 0], [1, 1], [0, 0]]]},
+         {'date': '2024-01-01', 'type': 'Point', 'coordinates': [1, 2]},
+         {'date': '2024-01-01T00:00:00Z', 'type': 'Point', 'coordinates': [1, 2.5],
+          'magnitudeValue': '7'},
+         {'date': '2024-13-01T00:00:00Z', 'coordinates': [1.0, 2.5]},
+         {'date': '2024-01-01T06:00:00Z', 'coordinates': [3, -2.5], 'magnitudeValue': 4,
+          'magnitudeUnit': 'kts'},
+         {'date': None, 'coordinates': [3.5, 2.5], 'extraKey': True},
+     ]},
+    {'id': 'no-geometry', 'geometry': None},
+    {'id': 'missing-geometry', 'closed': '2024-02-01T00:00:00Z'},
+    {'id': 'empty', 'geometry': []},
+]
+
+
+def test_events_rebuild_exactly():
+    events = json.loads(json.dumps(generate_events(300, seed=4)['events'])) + UNUSUAL
+    store = EventStore(events)
+
+    assert len(store) == len(events)
+    assert list(store) == events
+    # Same key order and number types, so serialized bodies and ETags do not change
+    assert [json.dumps(event) for event in store] == [json.dumps(event) for event in events]
+    assert store[-1] == events[-1] and store[1:3] == events[1:3]
+    assert len(store.raw_points) == 5
+
+
+def test_categories_are_shared_and_rebuilt_as_new_dicts():
+    store = EventStore(generate_events(50, seed=5)['events'])
+    by_category = {}
+    for record in store.records:
+        by_category.setdefault(record.categories, []).append(record)
+    assert len(by_category) <= 13
+    assert store[0]['categories'] is not store[0]['categories']
+
+
+def test_pickle_round_trip():
+    events = generate_events(100, seed=6)['events'] + UNUSUAL
+    restored = pickle.loads(pickle.dumps(EventStore(events), pickle.HIGHEST_PROTOCOL))
+    assert list(restored) == events
+
+
+def test_snapshot_payload_serves_the_compact_events():
+    payload = generate_events(20, seed=7)
+    snapshot = EventSnapshot(events=payload)
+    assert snapshot.events['events'] is snapshot.index.events
+    assert list(snapshot.events['events']) == payload['events']
+    assert snapshot.events['title'] == payload['title']
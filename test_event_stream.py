@@ -0,0 +1,109 @@
+import socket
+import threading
+import time
+
+from event_stream import DeltaLog, StreamHub, filter_delta, summary_delta
+
+
+def feature(event_id, category_id):
+    return {'type': 'Feature', 'id': event_id, 'geometry': None,
+            'properties': {'category_id': category_id}}
+
+
+def delta(version, *added, summary=None):
+    return {'version': version, 'summary': summary or {}, 'added': list(added),
+            'updated': [], 'closed': [], 'removed': []}
+
+
+def connect(hub, query='', last_event_id=None, receive_buffer=None):
+    sock = socket.socket()
+    if receive_buffer:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, receive_buffer)
+    sock.connect(('127.0.0.1', hub.port))
+    sock.settimeout(5)
+    header = f"Last-Event-ID: {last_event_id}\r\n" if last_event_id else ''
+    sock.sendall(f"GET /api/stream{query} HTTP/1.1\r\nHost: test\r\n{header}\r\n".encode())
+    return sock
+
+
+def read_until(sock, marker):
+    data = b''
+    while marker not in data:
+        chunk = sock.recv(65536)
+        assert chunk, data
+        data += chunk
+    return data
+
+
+def test_summary_and_category_filters():
+    assert summary_delta({'event_count': 2, 'categories': {'Wildfires': 2, 'Floods': 1}},
+                         {'event_count': 3, 'categories': {'Wildfires': 3}}) == \
+        {'event_count': 3, 'categories': {'Wildfires': 3, 'Floods': 0}}
+    change = delta(2, feature('a', 'wildfires'), feature('b', 'volcanoes'))
+    assert filter_delta(change, ()) is change
+    assert [f['id'] for f in filter_delta(change, ('volcanoes',))['added']] == ['b']
+    assert filter_delta(change, ('floods',)) is None
+    assert filter_delta(dict(change, summary={'event_count': 3}), ('floods',))['added'] == []
+
+
+def test_log_resumes_and_resets_clients_it_cannot_resume():
+    log = DeltaLog(size=3)
+    for version in range(5):
+        log.append(delta(version, feature(str(version), 'wildfires')))
+
+    assert log.position(None) == 5
+    assert [entry.seq for entry in log.after(log.position(log.event_id(3)))] == [4, 5]
+    assert log.after(log.position(log.event_id(1))) is None      # no longer kept
+    assert log.position('0-3') is None and log.position(log.event_id(9)) is None
+    messages, seq = log.messages(1)
+    assert seq == 5 and messages[0].startswith(b'event: reset\nid: ' + log.event_id(5).encode())
+    messages, seq = log.messages(4, ('volcanoes',))
+    assert messages == [] and seq == 5
+
+
+def test_hub_fans_out_to_many_clients_on_one_thread():
+    log = DeltaLog()
+    before = threading.active_count()
+    hub = StreamHub(log, host='127.0.0.1', port=0).start()
+    try:
+        clients = [connect(hub, '?category=volcanoes' if i % 2 else '') for i in range(200)]
+        for sock in clients:
+            read_until(sock, b'event: ready')
+        assert len(hub.clients) == 200
+        assert threading.active_count() == before + 1
+
+        first = log.append(delta(2, feature('fire', 'wildfires')))
+        last = log.append(delta(3, feature('volcano', 'volcanoes')))
+        for i, sock in enumerate(clients):
+            data = read_until(sock, last.event_id.encode())
+            assert (b'"fire"' in data) == (i % 2 == 0) and b'"volcano"' in data
+
+        # A reconnect with the last id it saw gets only what came after
+        sock = connect(hub, last_event_id=first.event_id)
+        data = read_until(sock, last.event_id.encode())
+        assert b'"volcano"' in data and b'"fire"' not in data
+        for sock in clients:
+            sock.close()
+    finally:
+        hub.stop()
+
+
+def test_slow_client_lags_without_buffering_and_is_reset():
+    log = DeltaLog(size=4)
+    hub = StreamHub(log, host='127.0.0.1', port=0).start()
+    try:
+        slow = connect(hub, receive_buffer=4096)
+        read_until(slow, b'event: ready')
+        # Each delta is far larger than the socket buffers, the client reads none of them
+        padding = 'x' * 2_000_000
+        for version in range(10):
+            log.append(delta(version, summary={'padding': padding}))
+            time.sleep(0.05)
+
+        received = b''
+        deadline = time.time() + 20
+        while b'event: reset' not in received and time.time() < deadline:
+            received = received[-64:] + slow.recv(1 << 20)
+        assert b'event: reset' in received
+    finally:
+        hub.stop()
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from geo import bbox_mask, grid_clusters, parse_bbox
+
+
+def test_parse_bbox():
+    assert parse_bbox(None) is None
+    assert parse_bbox('-10,-5,10,5') == (-10.0, -5.0, 10.0, 5.0)
+    with pytest.raises(ValueError):
+        parse_bbox('1,2,3')
+    with pytest.raises(ValueError):
+        parse_bbox('0,10,1,5')
+
+
+def test_bbox_mask_crosses_antimeridian():
+    lons = np.array([175.0, -175.0, 0.0])
+    lats = np.zeros(3)
+    assert bbox_mask(lons, lats, (170, -10, -170, 10)).tolist() == [True, True, False]
+    assert bbox_mask(lons, lats, (-10, -10, 10, 10)).tolist() == [False, False, True]
+
+
+def test_grid_clusters_counts_and_max_magnitude():
+    lons = np.array([10.0, 10.5, 11.0, -100.0])
+    lats = np.array([20.0, 20.2, 20.4, -30.0])
+    mags = np.array([1.0, np.nan, 7.5, np.nan])
+    lon, lat, counts, max_mag, first = grid_clusters(lons, lats, mags, zoom=2)
+
+    order = np.argsort(-counts)
+    assert counts[order].tolist() == [3, 1]
+    assert max_mag[order[0]] == 7.5
+    assert np.isnan(max_mag[order[1]])
+    assert lon[order[0]] == pytest.approx(10.5)
+    assert first[order[1]] == 3
+
+
+def test_spatial_grid_matches_brute_force():
+    from geo import SpatialGrid, haversine_km
+
+    rng = np.random.default_rng(1)
+    lons = rng.uniform(-180, 180, 5000)
+    lats = rng.uniform(-90, 90, 5000)
+    rows = rng.integers(0, 1500, 5000)
+    grid = SpatialGrid(lons, lats, rows, cell_size=2.0)
+
+    for bbox in [(-20, -10, 30, 45), (170, -60, -160, 60), (-180, -90, 180, 90)]:
+        expected = np.unique(rows[bbox_mask(lons, lats, bbox)])
+        assert grid.query_bbox(bbox).tolist() == expected.tolist()
+
+    for lat, lon, radius in [(10, 20, 800), (0, 179.5, 500), (88, 0, 600), (-45, -70, 3000)]:
+        expected = np.unique(rows[haversine_km(lat, lon, lats, lons) <= radius])
+        assert grid.query_radius(lat, lon, radius).tolist() == expected.tolist()
@@ -0,0 +1,34 @@
+import gzip
+
+from werkzeug.datastructures import MultiDict
+from werkzeug.http import parse_accept_header
+
+from http_cache import EncodedBody, choose_encoding, data_etag, normalized_query
+
+
+def test_normalized_query_ignores_order_and_blanks():
+    first = MultiDict([('b', '2'), ('a', ' 1 '), ('c', '')])
+    second = MultiDict([('a', '1'), ('b', '2')])
+    assert normalized_query(first) == normalized_query(second) == (('a', '1'), ('b', '2'))
+
+
+def test_choose_encoding_honours_quality_and_size():
+    accept = parse_accept_header('gzip;q=0.5, identity')
+    assert choose_encoding(accept, 10_000) == 'gzip'
+    assert choose_encoding(accept, 10) == 'identity'
+    assert choose_encoding(parse_accept_header('gzip;q=0'), 10_000) == 'identity'
+    assert choose_encoding(parse_accept_header(''), 10_000) == 'identity'
+
+
+def test_encoded_body_compresses_once():
+    body = EncodedBody(b'{"events": []}' * 200, 'application/json')
+    assert body.encoded('gzip') is body.encoded('gzip')
+    assert gzip.decompress(body.encoded('gzip')) == body.body
+    assert set(body.sizes()) == {'identity', 'gzip'}
+
+
+def test_data_etag_depends_on_every_part():
+    etag = data_etag('v1', '/api/events', (('a', '1'),))
+    assert etag == data_etag('v1', '/api/events', (('a', '1'),))
+    assert etag != data_etag('v2', '/api/events', (('a', '1'),))
+    assert etag != data_etag('v1', '/api/events', (('a', '2'),))
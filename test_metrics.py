@@ -0,0 +1,77 @@
+import logging
+
+from metrics import LogSampler, Registry
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = Registry()
+    histogram = registry.histogram('stage_seconds', 'Stage time', ('stage',), buckets=(0.1, 1.0))
+    histogram.observe(0.05, stage='filter')
+    histogram.observe(0.5, stage='filter')
+    histogram.observe(5, stage='filter')
+    registry.counter('errors_total', 'Errors', ('reason',)).inc(reason='timeout')
+    registry.gauge('events', 'Events', lambda: 3)
+    registry.gauge('rss_bytes', 'Unavailable gauge', lambda: None)
+
+    lines = registry.render().splitlines()
+    assert 'stage_seconds_bucket{stage="filter",le="0.1"} 1' in lines
+    assert 'stage_seconds_bucket{stage="filter",le="1.0"} 2' in lines
+    assert 'stage_seconds_bucket{stage="filter",le="+Inf"} 3' in lines
+    assert 'stage_seconds_sum{stage="filter"} 5.55' in lines
+    assert 'stage_seconds_count{stage="filter"} 3' in lines
+    assert 'errors_total{reason="timeout"} 1' in lines
+    assert '# TYPE events gauge' in lines and 'events 3' in lines
+    assert not any(line.startswith('rss_bytes ') for line in lines)
+
+
+def test_disabled_registry_records_nothing():
+    registry = Registry(enabled=False)
+    histogram = registry.histogram('stage_seconds', 'Stage time', ('stage',))
+    with histogram.time(stage='filter'):
+        pass
+    registry.counter('errors_total', 'Errors').inc()
+    lines = registry.render().splitlines()
+    assert all(line.startswith('#') for line in lines)
+
+
+def test_log_sampler_suppresses_repeats_within_interval():
+    clock = FakeClock()
+    sampler = LogSampler(interval=60, clock=clock)
+
+    def record(msg):
+        return logging.LogRecord('app', logging.ERROR, __file__, 1, msg, ('boom',), None)
+
+    assert sampler.filter(record('Error fetching events: %s'))
+    assert not sampler.filter(record('Error fetching events: %s'))
+    assert not sampler.filter(record('Error fetching events: %s'))
+    assert sampler.filter(record('Error saving snapshot: %s'))
+
+    clock.now = 61
+    emitted = record('Error fetching events: %s')
+    assert sampler.filter(emitted)
+    assert emitted.getMessage() == 'Error fetching events: boom (2 similar suppressed)'
+
+
+def test_log_sampler_passes_access_logs_and_stays_bounded():
+    clock = FakeClock()
+    sampler = LogSampler(interval=60, clock=clock)
+    access = lambda n: logging.LogRecord('werkzeug', logging.INFO, __file__, 1,
+                                         f'127.0.0.1 - - [01/Jan/2024 00:00:0{n}] "GET / HTTP/1.1" 200 -',
+                                         (), None)
+    assert all(sampler.filter(access(n % 10)) for n in range(5))
+    assert not sampler._last
+
+    record = lambda n: logging.LogRecord('app', logging.INFO, __file__, 1, f"event {n}", (), None)
+    for n in range(3 * LogSampler.MAX_KEYS):
+        clock.now = n
+        assert sampler.filter(record(n))
+    assert len(sampler._last) <= LogSampler.MAX_KEYS
+    assert not sampler.filter(record(3 * LogSampler.MAX_KEYS - 1))
@@ -0,0 +1,89 @@
+import threading
+
+import pytest
+
+from result_cache import ResultCache, cached_method
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_lru_eviction_and_ttl():
+    clock = FakeClock()
+    cache = ResultCache(maxsize=2, ttl=10, clock=clock)
+    cache.get_or_compute('a', lambda: 1)
+    cache.get_or_compute('b', lambda: 2)
+    assert cache.get_or_compute('a', lambda: 'stale') == 1
+    cache.get_or_compute('c', lambda: 3)  # evicts b, the least recently used
+
+    assert cache.get_or_compute('b', lambda: 'recomputed') == 'recomputed'
+    clock.now = 11
+    assert cache.get_or_compute('c', lambda: 'fresh') == 'fresh'
+
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['evictions'], stats['expirations']) == (1, 5, 2, 1)
+
+
+def test_concurrent_misses_are_coalesced():
+    cache = ResultCache()
+    release = threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        release.wait(5)
+        return 'value'
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute('k', compute)))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    while cache.stats()['coalesced'] < 7:
+        pass
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert calls == [1]
+    assert results == ['value'] * 8
+
+
+def test_errors_are_shared_but_not_cached():
+    cache = ResultCache()
+
+    def fail():
+        raise ValueError('boom')
+
+    with pytest.raises(ValueError):
+        cache.get_or_compute('k', fail)
+    assert cache.get_or_compute('k', lambda: 'ok') == 'ok'
+
+
+def test_cached_method_keys_on_version_and_normalized_arguments():
+    class Source:
+        def __init__(self):
+            self.result_cache = ResultCache()
+            self.data_version = 1
+            self.calls = 0
+
+        @cached_method('lookup')
+        def lookup(self, name=None, limit=10):
+            self.calls += 1
+            return (name, limit, self.data_version)
+
+    source = Source()
+    assert source.lookup() == source.lookup(name='') == source.lookup(None, 10)
+    assert source.calls == 1
+    source.lookup(name=' fires ')
+    source.lookup('fires')
+    assert source.calls == 2
+
+    source.data_version = 2
+    assert source.lookup()[2] == 2
+    assert source.calls == 3
@@ -0,0 +1,212 @@
+from datetime import datetime
+
+from countries import REGIONS, country_lookup
+from rollup import SEVERITY_LEVELS, SEVERITY_POINTS, Rollup, downsample_points, epoch_day
+from synthetic import generate_events
+from tests_support import analysis, trend_counts
+
+
+def legacy_summary(events):
+    """The per-event summary loop the rollup replaces"""
+    stats = {'event_count': len(events), 'categories': {},
+             'magnitudes': {'low': 0, 'medium': 0, 'high': 0}, 'daily_counts': {}}
+    for event in events:
+        try:
+            category = event['categories'][0]['title']
+            stats['categories'][category] = stats['categories'].get(category, 0) + 1
+            date = event['geometry'][0]['date'][:10]
+            stats['daily_counts'][date] = stats['daily_counts'].get(date, 0) + 1
+            magnitude = None
+            if 'magnitudeValue' in event and 'magnitudeUnit' in event:
+                magnitude = float(event['magnitudeValue'])
+            elif event.get('geometry', []):
+                for geo in event['geometry']:
+                    if 'magnitudeValue' in geo and 'magnitudeUnit' in geo:
+                        magnitude = float(geo['magnitudeValue'])
+                        break
+            if magnitude is None or magnitude < 1.5:
+                stats['magnitudes']['low'] += 1
+            elif magnitude < 5.0:
+                stats['magnitudes']['medium'] += 1
+            else:
+                stats['magnitudes']['high'] += 1
+        except Exception:
+            continue
+    return stats
+
+
+def legacy_trend(events, category=None, period='monthly'):
+    periods = {}
+    for event in events:
+        if category and (not event['categories'] or event['categories'][0]['id'] != category):
+            continue
+        date = datetime.strptime(event['geometry'][0]['date'][:10], '%Y-%m-%d')
+        key = {'monthly': '%Y-%m', 'weekly': '%Y-W%W'}.get(period, '%Y-%m-%d')
+        periods[date.strftime(key)] = periods.get(date.strftime(key), 0) + 1
+    return periods
+
+
+def legacy_analysis(events, start_date):
+    lookup = country_lookup()
+    data = {'categories': {}, 'dates': {}, 'geographic': {}, 'countries': {}, 'weekday': [0] * 7,
+            'severity': {'wildfires': [], 'storms': [], 'volcanoes': [], 'earthquakes': []}}
+    for event in events:
+        try:
+            date = event['geometry'][0]['date'][:10]
+            if date < start_date:
+                continue
+            categories = [cat['title'] for cat in event['categories']]
+            for category in categories:
+                data['categories'][category] = data['categories'].get(category, 0) + 1
+            data['dates'][date] = data['dates'].get(date, 0) + 1
+            lon, lat = event['geometry'][0]['coordinates'][:2]
+            country = lookup.countries([float(lon)], [float(lat)])
+            region = REGIONS[lookup.regions(country)[0]]
+            data['geographic'][region] = data['geographic'].get(region, 0) + 1
+            if country[0] >= 0:
+                code = lookup.codes[country[0]]
+                data['countries'][code] = data['countries'].get(code, 0) + 1
+            data['weekday'][datetime.strptime(date, '%Y-%m-%d').weekday()] += 1
+
+            magnitude_value = magnitude_unit = None
+            if 'magnitudeValue' in event:
+                magnitude_value = event['magnitudeValue']
+                magnitude_unit = event.get('magnitudeUnit', '')
+            if not magnitude_value and event.get('geometry'):
+                for geo in event['geometry']:
+                    if 'magnitudeValue' in geo:
+                        magnitude_value = geo['magnitudeValue']
+                        magnitude_unit = geo.get('magnitudeUnit', '')
+                        break
+            if magnitude_value is not None:
+                point = {'date': date, 'magnitude': float(magnitude_value), 'unit': magnitude_unit,
+                         'title': event.get('title', ''), 'description': event.get('description', '')}
+                if any('Wildfires' in cat for cat in categories):
+                    data['severity']['wildfires'].append(point)
+                elif any(s in cat for cat in categories for s in ['Severe Storms', 'Tropical Cyclones']):
+                    data['severity']['storms'].append(point)
+                elif any('Volcanoes' in cat for cat in categories):
+                    data['severity']['volcanoes'].append(point)
+                elif any('Earthquakes' in cat for cat in categories):
+                    data['severity']['earthquakes'].append(point)
+        except Exception:
+            continue
+    return data
+
+
+def sample_events():
+    events = generate_events(1500, seed=11, days=200)['events']
+    events[0]['categories'] = []
+    events[1]['geometry'] = []
+    events[2]['geometry'][0]['magnitudeValue'] = None
+    events[2]['geometry'][0]['magnitudeUnit'] = 'kts'
+    events[3]['categories'].append({'id': 'floods', 'title': 'Floods'})
+    events[4]['geometry'][0]['type'] = 'Polygon'
+    events[4]['geometry'][0]['coordinates'] = [[[0, 0], [1, 0], [1, 1], [0, 0]]]
+    return events
+
+
+def assert_matches_legacy(rollup, events):
+    assert rollup.summary_statistics() == legacy_summary(events)
+
+    dated = [e for e in events if e.get('geometry')]
+    for category in (None, 'wildfires', 'severeStorms', 'unknown'):
+        for period in ('monthly', 'weekly', 'daily'):
+            periods, counts = trend_counts(rollup, category, period)
+            assert periods == sorted(periods)
+            assert dict(zip(periods, counts)) == legacy_trend(dated, category, period)
+
+    for start_date in ('1970-01-01', sorted(e['geometry'][0]['date'] for e in dated)[len(dated) // 2][:10]):
+        expected = legacy_analysis(events, start_date)
+        data = analysis(rollup, epoch_day(start_date))
+        assert dict(zip(data['trends']['labels'], data['trends']['values'])) == expected['dates']
+        assert data['trends']['labels'] == sorted(expected['dates'])
+        assert dict(zip(data['categories']['labels'], data['categories']['values'])) == expected['categories']
+        assert data['geographic'] == expected['geographic']
+        assert dict(zip(data['countries']['codes'], data['countries']['values'])) == expected['countries']
+        assert data['countries']['values'] == sorted(data['countries']['values'], reverse=True)
+        assert data['weekday']['values'] == expected['weekday']
+        for group, points in expected['severity'].items():
+            medium, high = SEVERITY_LEVELS[group]
+            assert data['severity_levels'][group] == {
+                'low': sum(p['magnitude'] < medium for p in points),
+                'medium': sum(medium <= p['magnitude'] < high for p in points),
+                'high': sum(p['magnitude'] >= high for p in points)}
+            if rollup.severity_points is None:
+                key = lambda p: (p['date'], p['title'])
+                assert sorted(data['severity'][group], key=key) == sorted(points, key=key)
+            else:
+                # Combined rollups keep a thinned series, peaks included
+                thinned = data['severity'][group]
+                assert len(thinned) <= SEVERITY_POINTS and all(p in points for p in thinned)
+                assert max((p['magnitude'] for p in thinned), default=None) == \
+                    max((p['magnitude'] for p in points), default=None)
+
+
+def test_rollup_matches_legacy_loops():
+    events = sample_events()
+    assert_matches_legacy(Rollup(events), events)
+
+
+def test_rollup_incremental_update_matches_rebuild():
+    events = sample_events()
+    rollup = Rollup(events)
+
+    removed = events[10:60]
+    updated_old = events[60:80]
+    updated_new = [dict(e, closed='2024-01-01T00:00:00Z',
+                        geometry=e['geometry'] + [dict(e['geometry'][-1], magnitudeValue=9.0)])
+                   for e in updated_old]
+    added = generate_events(40, seed=12, days=200)['events']
+    current = added + events[:10] + updated_new + events[80:]
+
+    incremental = rollup.updated(removed=removed + updated_old, added=added + updated_new)
+    assert_matches_legacy(incremental, current)
+    # The original rollup is left untouched
+    assert rollup.summary_statistics() == legacy_summary(events)
+
+
+def test_combined_partial_rollups_match_one_rollup():
+    events = sample_events()
+    parts = [Rollup(events[i::3]) for i in range(3)]
+    assert_matches_legacy(Rollup.combine(parts), events)
+
+    dated = sorted(e['geometry'][0]['date'][:10] for e in events if e.get('geometry'))
+    start, end = dated[len(dated) // 4], dated[len(dated) // 2]
+    clipped = Rollup.combine(parts, epoch_day(start), epoch_day(end))
+    assert_matches_legacy(clipped, [e for e in events if e.get('geometry')
+                                    and start <= e['geometry'][0]['date'][:10] <= end])
+
+
+def test_analysis_facets_match_the_events():
+    events = sample_events()
+    rollup = Rollup(events)
+    start_day = epoch_day('1970-01-01')
+
+    trends = rollup.analysis_trends(start_day)
+    expected = {}
+    for event in events:
+        if not event.get('geometry'):
+            continue
+        for category in event['categories']:
+            per_day = expected.setdefault(category['title'], {})
+            date = event['geometry'][0]['date'][:10]
+            per_day[date] = per_day.get(date, 0) + 1
+    assert {title: {label: count for label, count in zip(trends['labels'], counts) if count}
+            for title, counts in trends['series'].items()} == expected
+
+    severity = rollup.analysis_severity(start_day)
+    levels = rollup.analysis_severity_levels(start_day)
+    for group, points in severity.items():
+        medium, high = SEVERITY_LEVELS[group]
+        assert levels[group] == {'low': sum(p['magnitude'] < medium for p in points),
+                                 'medium': sum(medium <= p['magnitude'] < high for p in points),
+                                 'high': sum(p['magnitude'] >= high for p in points)}
+
+    points = severity['wildfires']
+    assert len(points) > 40
+    thinned = downsample_points(points, 40)
+    assert len(thinned) <= 40
+    assert [p['date'] for p in thinned] == sorted(p['date'] for p in thinned)
+    assert max(p['magnitude'] for p in thinned) == max(p['magnitude'] for p in points)
+    assert downsample_points(points[:10], 40) == points[:10]
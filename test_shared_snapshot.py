@@ -0,0 +1,41 @@
+import os
+
+import numpy as np
+
+from shared_snapshot import EventBlob, SharedSnapshotStore
+from snapshot import EventSnapshot
+from synthetic import generate_categories, generate_events
+
+
+def test_mapped_snapshot_matches_the_written_one(tmp_path):
+    written = EventSnapshot(events=generate_events(400, seed=8), categories=generate_categories(),
+                            version=7, fetched_at=123.0)
+    store = SharedSnapshotStore(str(tmp_path))
+    name = store.write(written)
+    assert store.current() == {'name': name, 'fetched_at': 123.0}
+
+    mapped = store.load(store.current())
+    assert isinstance(mapped.events['events'], EventBlob)
+    assert isinstance(mapped.index.lons, np.memmap)
+    assert (mapped.version, mapped.fetched_at) == (7, 123.0)
+    assert mapped.categories == written.categories
+    assert list(mapped.events['events']) == list(written.events['events'])
+
+    filters = dict(start_date='2024-01-01', event_type='wildfires', bbox=(-180, -60, 0, 60))
+    assert (mapped.index.filter_rows(**filters) == written.index.filter_rows(**filters)).all()
+    event_id = written.events['events'][123]['id']
+    assert mapped.index.row_of(event_id) == written.index.row_of(event_id) == 123
+    assert mapped.index.row_of('missing') is None
+    assert mapped.rollup.summary_statistics() == written.rollup.summary_statistics()
+
+    store.mark_fetched(456.0)
+    assert store.current() == {'name': name, 'fetched_at': 456.0}
+
+
+def test_old_versions_are_pruned(tmp_path):
+    store = SharedSnapshotStore(str(tmp_path))
+    names = [store.write(EventSnapshot(events=generate_events(5, seed=v), version=v))
+             for v in range(1, 6)]
+    kept = sorted(entry for entry in os.listdir(tmp_path) if entry.startswith('v'))
+    assert kept == sorted(names[-SharedSnapshotStore.KEEP:])
+    assert store.load(store.current()).version == 5
@@ -0,0 +1,37 @@
+import threading
+
+import pytest
+
+from snapshot import EventSnapshot, SnapshotRefresher
+
+
+def test_snapshot_is_immutable():
+    snapshot = EventSnapshot({'events': [{'id': 'a', 'geometry': []}]}, version=1, fetched_at=0)
+    with pytest.raises(AttributeError):
+        snapshot.version = 2
+
+    newer = snapshot.replace(version=2)
+    assert snapshot.version == 1
+    assert newer.version == 2
+    assert newer.index is snapshot.index
+
+    rebuilt = snapshot.replace(events={'events': []})
+    assert len(rebuilt.index) == 0
+
+
+def test_refresher_runs_and_stops():
+    calls = []
+    ran = threading.Event()
+
+    def refresh():
+        calls.append(1)
+        ran.set()
+
+    refresher = SnapshotRefresher(refresh, interval=60)
+    refresher.start(delay=0)
+    assert ran.wait(5)
+    assert refresher.is_running()
+
+    refresher.stop()
+    assert not refresher.is_running()
+    assert len(calls) == 1
@@ -0,0 +1,77 @@
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from rollup import Rollup, epoch_day
+from synthetic import generate_events
+from tests_support import trend_counts
+from time_series import period_labels, period_numbers, series_statistics, t_critical
+
+
+def test_periods_match_pandas_periods():
+    days = np.arange(epoch_day('2023-12-20'), epoch_day('2025-02-10'))
+    index = pd.to_datetime(days, unit='D')
+    for period, freq, fmt in (('weekly', 'W-SUN', '%Y-%m-%d'), ('monthly', 'M', '%Y-%m'),
+                              ('annually', 'Y', '%Y')):
+        # Pandas weeks ending on Sunday start on Monday, the label used here
+        counts = pd.Series(1, index=index.to_period(freq)).groupby(level=0).sum()
+        numbers, sizes = np.unique(period_numbers(days, period), return_counts=True)
+        assert sizes.tolist() == counts.tolist()
+        assert period_labels(numbers, period) == [p.start_time.strftime(fmt) for p in counts.index]
+    assert period_labels(period_numbers([epoch_day('2024-01-07')], 'weekly'), 'weekly') == ['2024-01-01']
+
+
+def test_statistics_match_least_squares_and_zscores():
+    rng = np.random.default_rng(2)
+    matrix = rng.poisson(lam=np.linspace(5, 25, 40)[:, None] * [1, 0.5, 0], size=(40, 3))
+    matrix[17, 1] = 80
+    stats = series_statistics(matrix, window=4)
+
+    x = np.arange(40)
+    for column in range(2):
+        y = matrix[:, column]
+        slope, intercept = np.polyfit(x, y, 1)
+        assert np.isclose(stats['slope'][column], slope)
+        assert np.isclose(stats['intercept'][column], intercept)
+        residuals = y - (slope * x + intercept)
+        stderr = np.sqrt((residuals ** 2).sum() / 38 / ((x - x.mean()) ** 2).sum())
+        assert np.isclose(stats['margin'][column], t_critical(38) * stderr)
+        assert np.allclose(stats['rolling_mean'][:, column], pd.Series(y).rolling(4, min_periods=1).mean())
+        assert np.allclose(stats['z'][:, column], (y - y.mean()) / y.std())
+    assert stats['anomalous'][:, 1].nonzero()[0].tolist() == [17]
+    # A constant series has no spread, so nothing is anomalous
+    assert stats['slope'][2] == 0 and not stats['anomalous'][:, 2].any()
+    assert t_critical(1) == 12.706 and t_critical(35) == 2.042 and t_critical(500) == 1.96
+
+
+def test_trend_matrix_fills_gaps_for_every_category_at_once():
+    start = date(2024, 1, 1)
+    event = lambda i, day, category: {
+        'id': str(i), 'title': str(i), 'categories': [{'id': category, 'title': category.title()}],
+        'geometry': [{'date': (start + timedelta(days=day)).isoformat() + 'T00:00:00Z',
+                      'coordinates': [0, 0]}]}
+    events = [event(0, 0, 'wildfires'), event(1, 0, 'volcanoes'), event(2, 3, 'wildfires'),
+              event(3, 70, 'volcanoes'), {'id': 'x', 'categories': [], 'geometry': [{'date': '2024-01-02'}]}]
+    rollup = Rollup(events)
+
+    labels, matrix = rollup.trend_matrix(('wildfires', 'volcanoes', None, 'floods'), 'daily')
+    assert labels[0] == '2024-01-01' and labels[-1] == '2024-03-11' and len(labels) == 71
+    assert matrix.sum(axis=0).tolist() == [2, 2, 5, 0]
+    assert matrix[:4, 0].tolist() == [1, 0, 0, 1] and matrix[1, 2] == 1
+
+    labels, matrix = rollup.trend_matrix(('wildfires',), 'monthly')
+    assert labels == ['2024-01'] and matrix.tolist() == [[2]]
+    assert rollup.trend_matrix(('floods',), 'monthly')[0] == []
+
+    events = generate_events(800, seed=3, days=200)['events']
+    rollup = Rollup(events)
+    for period in ('daily', 'weekly', 'monthly'):
+        labels, matrix = rollup.trend_matrix((None, 'wildfires'), period)
+        assert len(labels) == len(set(labels)) and labels == sorted(labels)
+        for column, category in enumerate((None, 'wildfires')):
+            periods, counts = trend_counts(rollup, category, period)
+            assert matrix[:, column].sum() == sum(counts)
+            if period != 'weekly':
+                filled = dict(zip(labels, matrix[:, column].tolist()))
+                assert {label: filled[label] for label in periods} == dict(zip(periods, counts))
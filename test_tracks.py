@@ -0,0 +1,55 @@
+import math
+
+import numpy as np
+
+from tracks import TRACK_ZOOMS, Tracks, simplification_importance, tolerance_for_zoom
+
+
+def douglas_peucker(points, tolerance):
+    """Textbook recursive Douglas-Peucker, returning the kept indices"""
+    def distance(p, a, b):
+        (x, y), (x1, y1), (x2, y2) = p, a, b
+        dx, dy = x2 - x1, y2 - y1
+        length = dx * dx + dy * dy
+        t = 0.0 if not length else min(1.0, max(0.0, ((x - x1) * dx + (y - y1) * dy) / length))
+        return math.hypot(x - x1 - t * dx, y - y1 - t * dy)
+
+    def simplify(first, last):
+        if last - first < 2:
+            return []
+        far = max(range(first + 1, last), key=lambda i: distance(points[i], points[first], points[last]))
+        if distance(points[far], points[first], points[last]) <= tolerance:
+            return []
+        return simplify(first, far) + [far] + simplify(far, last)
+
+    return [0] + simplify(0, len(points) - 1) + [len(points) - 1]
+
+
+def test_importance_matches_douglas_peucker_at_every_tolerance():
+    rng = np.random.default_rng(3)
+    for _ in range(20):
+        points = np.cumsum(rng.normal(size=(int(rng.integers(3, 40)), 2)), axis=0).tolist()
+        importance = np.array(simplification_importance([p[0] for p in points],
+                                                        [p[1] for p in points]))
+        for tolerance in (0.05, 0.3, 1.0, 3.0):
+            assert np.flatnonzero(importance > tolerance).tolist() == douglas_peucker(points, tolerance)
+
+
+def test_zoom_levels():
+    assert tolerance_for_zoom(None) == 0.0
+    assert tolerance_for_zoom(0) == tolerance_for_zoom(TRACK_ZOOMS[0])
+    assert tolerance_for_zoom(TRACK_ZOOMS[-1] + 1) == 0.0
+    tolerances = [tolerance_for_zoom(zoom) for zoom in TRACK_ZOOMS]
+    assert tolerances == sorted(tolerances, reverse=True)
+
+
+def test_tracks_split_points_by_row():
+    times = np.array(['2024-01-01T00:00:00', 'NaT', '2024-01-02T06:00:00'], dtype='datetime64[s]')
+    tracks = Tracks([1.0, 2.0, 3.0], [4.0, 5.0, 6.0], times, [np.nan, 2.0, 3.0], [0, 2, 2], 4)
+    assert tracks.offsets.tolist() == [0, 1, 1, 3, 3]
+    assert tracks.line(1)['geometry'] is None
+    line = tracks.line(2)
+    assert line['geometry'] == {'type': 'LineString', 'coordinates': [[2.0, 5.0], [3.0, 6.0]]}
+    assert line['times'] == [None, '2024-01-02T06:00:00Z']
+    assert tracks.line(0)['magnitudes'] == [None]
+    assert [line['points'] for line in tracks.lines([3, 2, 0], zoom=2)] == [0, 2, 1]
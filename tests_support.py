@@ -0,0 +1,37 @@
+"""Reference readings of a Rollup shared by the tests, kept out of the Rollup itself"""
+from datetime import datetime
+
+from rollup import NO_DAY, day_labels, group_sum
+
+
+def trend_counts(rollup, category_id=None, period='monthly'):
+    """Chronological (period labels, counts) for one category id or all events, read off the summary cube"""
+    code, day = rollup.summary.column(0), rollup.summary.column(1)
+    selected = day != NO_DAY
+    if category_id:
+        selected &= code == rollup._id_codes.get(category_id, -2)
+    days, sums = group_sum(day[selected], rollup.summary.counts[selected])
+
+    if period == 'monthly':
+        labels = days.astype('datetime64[D]').astype('datetime64[M]').astype(str).tolist()
+    elif period == 'weekly':
+        labels = [datetime.strptime(label, '%Y-%m-%d').strftime('%Y-W%W')
+                  for label in day_labels(days)]
+    else:
+        labels = day_labels(days)
+
+    periods, counts = [], []
+    for label, total in zip(labels, sums.tolist()):
+        if periods and periods[-1] == label:
+            counts[-1] += total
+        else:
+            periods.append(label)
+            counts.append(total)
+    return periods, counts
+
+
+def analysis(rollup, start_day):
+    """Every analysis facet of the events on or after start_day"""
+    return {facet: getattr(rollup, f"analysis_{facet}")(start_day)
+            for facet in ('trends', 'categories', 'geographic', 'countries', 'severity',
+                          'severity_levels', 'weekday')}
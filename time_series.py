@@ -0,0 +1,141 @@
+import math
+
+import numpy as np
+
+PERIODS = ('daily', 'weekly', 'monthly', 'annually')
+# Trailing rolling-mean window per period, in periods
+ROLLING_WINDOWS = {'daily': 7, 'weekly': 4, 'monthly': 3, 'annually': 3}
+ANOMALY_Z = 2.0
+
+# Two-sided 95% Student t critical values by degrees of freedom; the
+# largest tabulated df not above the actual one is used, 1.96 beyond 120
+T_95 = {1: 12.706, 2: 4.303, 3: 3.182, 4: 2.776, 5: 2.571, 6: 2.447, 7: 2.365, 8: 2.306,
+        9: 2.262, 10: 2.228, 11: 2.201, 12: 2.179, 13: 2.160, 14: 2.145, 15: 2.131,
+        16: 2.120, 17: 2.110, 18: 2.101, 19: 2.093, 20: 2.086, 22: 2.074, 24: 2.064,
+        26: 2.056, 28: 2.048, 30: 2.042, 40: 2.021, 60: 2.000, 120: 1.980}
+
+
+def parse_period(value):
+    """Validate a period=, monthly when missing"""
+    if not value:
+        return 'monthly'
+    if value not in PERIODS:
+        raise ValueError(f"period must be one of {', '.join(PERIODS)}")
+    return value
+
+
+def parse_categories(values):
+    """Category ids from one or more category= values, comma separated, () for all events"""
+    ids = [part.strip() for value in values if value for part in str(value).split(',')]
+    return tuple(dict.fromkeys(part for part in ids if part))
+
+
+def t_critical(df):
+    """Two-sided 95% t value for df degrees of freedom"""
+    if df >= 121:
+        return 1.96
+    return T_95[max(key for key in T_95 if key <= df)]
+
+
+def period_numbers(days, period):
+    """Period number of each day number: days, Monday-based weeks, months or years since 1970"""
+    days = np.asarray(days, dtype=np.int64)
+    if period == 'daily':
+        return days
+    if period == 'weekly':
+        # 1970-01-01 was a Thursday, so day -3 starts week 0
+        return (days + 3) // 7
+    unit = 'M' if period == 'monthly' else 'Y'
+    return days.astype('datetime64[D]').astype(f'datetime64[{unit}]').astype(np.int64)
+
+
+def period_labels(numbers, period):
+    """Labels of period numbers: YYYY-MM-DD for days and the Monday of weeks, YYYY-MM, YYYY"""
+    numbers = np.asarray(numbers, dtype=np.int64)
+    if period == 'weekly':
+        numbers = numbers * 7 - 3
+    unit = {'monthly': 'M', 'annually': 'Y'}.get(period, 'D')
+    return numbers.astype(f'datetime64[{unit}]').astype(str).tolist()
+
+
+def period_matrix(days, columns, counts, width, period):
+    """(calendar of period numbers, periods x width count matrix) in one bincount
+
+    columns gives the matrix column of each (day, count) bucket, -1 to skip
+    it. The calendar runs from the first to the last period holding any
+    counted bucket, with every period in between, so empty ones are zeros.
+    """
+    columns = np.asarray(columns, dtype=np.int64)
+    keep = columns >= 0
+    numbers = period_numbers(np.asarray(days)[keep], period)
+    if len(numbers) == 0:
+        return np.empty(0, dtype=np.int64), np.zeros((0, width), dtype=np.int64)
+    first = numbers.min()
+    calendar = np.arange(first, numbers.max() + 1)
+    cells = (numbers - first) * width + columns[keep]
+    matrix = np.bincount(cells, weights=np.asarray(counts)[keep], minlength=len(calendar) * width)
+    return calendar, np.rint(matrix).astype(np.int64).reshape(len(calendar), width)
+
+
+def series_statistics(matrix, window, threshold=ANOMALY_Z):
+    """Rolling means, least-squares fits and z-scores of every column of a count matrix at once
+
+    The slope is in events per period with a 95% confidence interval from
+    the residual standard error; it needs three periods. Periods whose
+    count is threshold or more standard deviations from the series mean
+    are anomalies.
+    """
+    periods, width = matrix.shape
+    values = matrix.astype(float)
+    # Trailing means from a running sum, like pandas rolling(window, min_periods=1)
+    totals = np.vstack([np.zeros((1, width)), np.cumsum(values, axis=0)])
+    ends = np.arange(1, periods + 1)
+    starts = np.maximum(ends - window, 0)
+    rolling = (totals[ends] - totals[starts]) / (ends - starts)[:, None]
+
+    slope = np.zeros(width)
+    intercept = values.mean(axis=0) if periods else np.zeros(width)
+    margin = np.full(width, np.nan)
+    if periods > 1:
+        x = np.arange(periods, dtype=float)
+        centred = x - x.mean()
+        sxx = centred @ centred
+        slope = centred @ values / sxx
+        intercept = values.mean(axis=0) - slope * x.mean()
+        if periods > 2:
+            residuals = values - (intercept + np.outer(x, slope))
+            stderr = np.sqrt((residuals ** 2).sum(axis=0) / (periods - 2) / sxx)
+            margin = t_critical(periods - 2) * stderr
+
+    std = values.std(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        z = np.where(std > 0, (values - values.mean(axis=0)) / std, 0.0)
+
+    return {'rolling_mean': rolling, 'slope': slope, 'intercept': intercept,
+            'margin': margin, 'z': z, 'anomalous': np.abs(z) >= threshold}
+
+
+def trend_series(labels, matrix, names, window, threshold=ANOMALY_Z):
+    """Per-column JSON payloads of series_statistics, keyed by names"""
+    stats = series_statistics(matrix, window, threshold)
+    series = {}
+    for column, (key, title) in enumerate(names):
+        counts = matrix[:, column].tolist()
+        z = stats['z'][:, column]
+        slope, margin = float(stats['slope'][column]), float(stats['margin'][column])
+        series[key] = {
+            'title': title,
+            'counts': counts,
+            'total': sum(counts),
+            'average': sum(counts) / len(counts) if counts else 0,
+            'max': max(counts) if counts else 0,
+            'min': min(counts) if counts else 0,
+            'rolling_mean': np.round(stats['rolling_mean'][:, column], 3).tolist(),
+            'slope': slope,
+            'intercept': float(stats['intercept'][column]),
+            'slope_ci': None if math.isnan(margin) else [slope - margin, slope + margin],
+            'z_scores': np.round(z, 3).tolist(),
+            'anomalies': [{'period': labels[i], 'count': counts[i], 'z': round(float(z[i]), 3)}
+                          for i in np.flatnonzero(stats['anomalous'][:, column]).tolist()]
+        }
+    return series
@@ -0,0 +1,144 @@
+import math
+
+import numpy as np
+
+# Map zoom levels tracks are simplified for, deeper zooms get every point
+TRACK_ZOOMS = (2, 5, 8)
+
+
+def tolerance_for_zoom(zoom):
+    """Simplification tolerance in degrees for a zoom level, 0 for the full track
+
+    A level's tolerance is one 256px tile pixel at that zoom, the largest
+    error nobody can see. Zooms in between use the next deeper level.
+    """
+    if zoom is None:
+        return 0.0
+    for level in TRACK_ZOOMS:
+        if zoom <= level:
+            return 360.0 / (256 * 2 ** level)
+    return 0.0
+
+
+def segment_distance(lon, lat, lon1, lat1, lon2, lat2):
+    """Planar distance in degrees from a point to the segment (lon1, lat1)-(lon2, lat2)"""
+    dx, dy = lon2 - lon1, lat2 - lat1
+    length = dx * dx + dy * dy
+    if length:
+        t = min(1.0, max(0.0, ((lon - lon1) * dx + (lat - lat1) * dy) / length))
+        lon1, lat1 = lon1 + t * dx, lat1 + t * dy
+    return math.hypot(lon - lon1, lat - lat1)
+
+
+def simplification_importance(lons, lats):
+    """Largest Douglas-Peucker tolerance at which each point of a track survives
+
+    Running Douglas-Peucker once without a tolerance and capping every
+    point's split distance by its parent's gives, for any tolerance t, the
+    same points as a run with t: those with importance > t. Endpoints are
+    always kept. Tracks are short, plain floats beat numpy calls per segment.
+    """
+    count = len(lons)
+    importance = [math.inf] * count
+    stack = [(0, count - 1, math.inf)]
+    while stack:
+        first, last, bound = stack.pop()
+        if last - first < 2:
+            continue
+        lon1, lat1, lon2, lat2 = lons[first], lats[first], lons[last], lats[last]
+        farthest, distance = first + 1, -1.0
+        for i in range(first + 1, last):
+            d = segment_distance(lons[i], lats[i], lon1, lat1, lon2, lat2)
+            if d > distance:
+                farthest, distance = i, d
+        importance[farthest] = min(distance, bound)
+        stack.append((first, farthest, importance[farthest]))
+        stack.append((farthest, last, importance[farthest]))
+    return importance
+
+
+class Tracks:
+    """Every positioned geometry point of every event, in row order, with its simplification importance
+
+    offsets[row]:offsets[row + 1] are the points of a row. Importance is
+    computed at ingest, so simplifying a track for any zoom is a comparison.
+    """
+
+    ARRAYS = ('offsets', 'lons', 'lats', 'times', 'magnitudes', 'importance')
+
+    def __init__(self, lons, lats, times, magnitudes, rows, count):
+        self.lons = np.asarray(lons, dtype=float)
+        self.lats = np.asarray(lats, dtype=float)
+        self.times = np.asarray(times, dtype='datetime64[s]')
+        self.magnitudes = np.asarray(magnitudes, dtype=float)
+        rows = np.asarray(rows, dtype=np.int64)
+        self.offsets = np.searchsorted(rows, np.arange(count + 1), side='left').astype(np.int64)
+
+        self.importance = np.full(len(self.lons), np.inf)
+        all_lons, all_lats = self.lons.tolist(), self.lats.tolist()
+        offsets = self.offsets.tolist()
+        for row in np.flatnonzero(np.diff(self.offsets) > 2).tolist():
+            start, stop = offsets[row], offsets[row + 1]
+            self.importance[start:stop] = simplification_importance(all_lons[start:stop],
+                                                                    all_lats[start:stop])
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        """Tracks over precomputed arrays, e.g. memory-mapped from a shared snapshot"""
+        tracks = cls.__new__(cls)
+        for name in cls.ARRAYS:
+            setattr(tracks, name, arrays[name])
+        return tracks
+
+    def __len__(self):
+        return len(self.lons)
+
+    def vertex_count(self, zoom=None):
+        """Points kept over all tracks at a zoom level"""
+        tolerance = tolerance_for_zoom(zoom)
+        return int(np.count_nonzero(self.importance > tolerance)) if tolerance else len(self)
+
+    def line(self, row, zoom=None):
+        """GeoJSON geometry of a row's track with per-vertex times and magnitudes"""
+        return self.lines([row], zoom)[0]
+
+    def lines(self, rows, zoom=None):
+        """Tracks of many rows, simplified for a zoom level, converted in bulk
+
+        Each is {'geometry', 'times', 'magnitudes', 'points'}, coordinates
+        rounded to the precision the level can show. Tracks of one point are
+        a Point, empty ones have no geometry.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        starts = self.offsets[rows]
+        totals = self.offsets[rows + 1] - starts
+        points = np.arange(totals.sum()) + np.repeat(starts - (np.cumsum(totals) - totals), totals)
+        counts = totals
+        tolerance = tolerance_for_zoom(zoom)
+        lons, lats = self.lons[points], self.lats[points]
+        if tolerance:
+            keep = self.importance[points] > tolerance
+            counts = np.bincount(np.repeat(np.arange(len(rows)), totals)[keep], minlength=len(rows))
+            points, lons, lats = points[keep], lons[keep], lats[keep]
+            decimals = max(1, math.ceil(-math.log10(tolerance)) + 1)
+            lons, lats = np.round(lons, decimals), np.round(lats, decimals)
+
+        coordinates = np.stack([lons, lats], axis=1).tolist()
+        times = [None if value == 'NaT' else value + 'Z'
+                 for value in np.datetime_as_string(self.times[points], unit='s').tolist()]
+        magnitudes = [None if math.isnan(value) else value
+                      for value in self.magnitudes[points].tolist()]
+
+        lines = []
+        end = 0
+        for count, total in zip(counts.tolist(), totals.tolist()):
+            begin, end = end, end + count
+            if count > 1:
+                geometry = {'type': 'LineString', 'coordinates': coordinates[begin:end]}
+            elif count == 1:
+                geometry = {'type': 'Point', 'coordinates': coordinates[begin]}
+            else:
+                geometry = None
+            lines.append({'geometry': geometry, 'times': times[begin:end],
+                          'magnitudes': magnitudes[begin:end], 'points': total})
+        return lines